@@ -3,18 +3,45 @@ logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
 from . import gamestate, map, army, formation, commander, culture
+from .rng import RNGStreams
 
 COPPERCOAST_NODES_PATH = os.path.join(os.path.dirname(__file__), "mapdata", "coppercoast_strongholds.json")
 COPPERCOAST_ROADS_PATH = os.path.join(os.path.dirname(__file__), "mapdata", "coppercoast_roads.json")
 
-def getStartingState() -> gamestate.GameState:
+_STARTING_TEMPLATE = None
+
+def getStartingState(fromTemplate:bool=True, seed:int=None) -> gamestate.GameState:
+    """Return a new game of the Copper Coast scenario
+
+    The scenario is built once and kept as a template; each call returns an
+    independent clone of it. Stronghold defaults rolled when the map is
+    built (supply, loot) are therefore shared by every game stamped from
+    the template. Pass fromTemplate=False to build from scratch instead.
+
+    Each game draws random numbers from streams derived from seed, or from
+    fresh entropy if seed is None. For a fully reproducible game, including
+    the stronghold defaults, also pass fromTemplate=False.
+    """
+    global _STARTING_TEMPLATE
+    if not fromTemplate:
+        return buildStartingState(seed=seed)
+    if _STARTING_TEMPLATE is None:
+        _STARTING_TEMPLATE = buildStartingState()
+    state = _STARTING_TEMPLATE.clone()
+    state.reseed(seed)
+    return state
+
+def buildStartingState(seed:int=None) -> gamestate.GameState:
+    """Build the Copper Coast scenario from the map files"""
     assert os.path.exists(COPPERCOAST_NODES_PATH)
     assert os.path.exists(COPPERCOAST_ROADS_PATH)
+    rngs = RNGStreams(seed)
     coppercoast = map.Map()
+    coppercoast.rng = rngs.get("map")
     coppercoast.addNodesFromFile(COPPERCOAST_NODES_PATH)
     coppercoast.addEdgesFromFile(COPPERCOAST_ROADS_PATH)
 
-    state = gamestate.GameState(coppercoast, "1410-05-20")
+    state = gamestate.GameState(coppercoast, "1410-05-20", rngs=rngs)
 
     # Allakia
     cmdr_giubrin = commander.Commander(name="Giubrin",age=31,title="Prince", culture=culture.ALLAKIAN, commanderTraits=["Beloved","Crusader","Spartan"])
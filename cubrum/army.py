@@ -2,15 +2,87 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
+import math
 import numpy as np
 from collections import Counter
 
 from .map import Map
 from .commander import Commander
 from .formation import Formation
+from .formationtable import FormationTable
+from .casualties import getArmyRows, getWeighting, distributeCasualties
+from .dice import rollDice
 from .position import PointPosition, ColumnPosition
 from .decisionpoint import DecisionPoint
 from .exceptions import InvalidActionError
+from .rng import getGenerator
+
+MAX_MORALE = 12
+
+
+class FormationList(list):
+    """The formations of an Army; any change to the list bumps the army's version"""
+    def __init__(self, army:"Army", formations=()):
+        super().__init__(formations)
+        self._army = army
+        for formation in self:
+            formation._army = army
+
+    def _changed(self) -> None:
+        for formation in self:
+            formation._army = self._army
+        self._army._syncFormationTable()
+        self._army.version += 1
+
+    def append(self, formation:Formation) -> None:
+        super().append(formation)
+        self._changed()
+
+    def extend(self, formations) -> None:
+        super().extend(formations)
+        self._changed()
+
+    def insert(self, index:int, formation:Formation) -> None:
+        super().insert(index, formation)
+        self._changed()
+
+    def remove(self, formation:Formation) -> None:
+        super().remove(formation)
+        formation._army = None
+        self._changed()
+
+    def pop(self, index:int=-1) -> Formation:
+        formation = super().pop(index)
+        formation._army = None
+        self._changed()
+        return formation
+
+    def clear(self) -> None:
+        for formation in self:
+            formation._army = None
+        super().clear()
+        self._changed()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._changed()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._changed()
+
+    def __iadd__(self, formations):
+        self.extend(formations)
+        return self
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._changed()
+
 
 class Army:
     """Defines a force of formations led by a commander
@@ -29,6 +101,9 @@ class Army:
         isGarrison:bool
         isEncamped:bool 
         forcedMarchDays:int
+        version:int
+        formationTable:cubrum.formationtable.FormationTable
+        rng:numpy.random.Generator
         
     Methods:
         getForces() -> dict
@@ -40,18 +115,40 @@ class Army:
         getSupplyCapacity() -> int
         getSupplyConsumption() -> int
         isSupplyLow() -> bool
+        consumeSupply() -> int
+        getHoursToSupplyExhaustion() -> int
         getNoncombattantCount() -> int
         getValidDestinations() -> list[str]
         getDestination() -> str
         setDestination() -> None
         march() -> DecisionPoint
+        getHoursToArrival() -> int
+        reachable() -> dict
         getValidBypasses() -> list[str]
-        applyCasualties() -> None
+        applyCasualties() -> numpy.ndarray
+        applyCasualtyCounts() -> None
         raiseMorale() -> None
         lowerMorale() -> None 
         checkMorale() -> int
         toGarrison() -> dict
+        tabulate() -> None
+        clone() -> Army
+
+    Random draws come from rng, set when the army joins a GameState; an
+    army without one draws from the global np.random state.
+
+    Totals computed from the formations (strength, length, supply, troop
+    counts) are cached, and recomputed only after the version counter has
+    been bumped by a change to a formation, to the list of formations, or
+    to noncombattantPercent.
+
+    An army created with tabulate=True keeps its formations' troop counts
+    in a FormationTable, so those totals are computed as array sums. This
+    pays off for armies of many formations.
     """
+    rng = None
+    _supplyRemainder = 0 # supply eaten but not yet deducted, in 24ths of a unit
+
     @staticmethod 
     def fromGarrison(garrison:dict, map:Map, stronghold:str, allegience:str=None) -> "Army":
         """Parse stronghold garrison to Army object"""
@@ -69,12 +166,18 @@ class Army:
         return garrisonArmy
 
 
-    def __init__(self, name:str, allegience:str, formations:list, commander:Commander, supply:int, startingStronghold:str, map:Map, morale:int=7, noncombattantPercent:int=25, isGarrison=False):
+    def __init__(self, name:str, allegience:str, formations:list, commander:Commander, supply:int, startingStronghold:str, map:Map, morale:int=7, noncombattantPercent:int=25, isGarrison=False, tabulate:bool=False):
+        self.version = 0
+        self._cache = {}
+        self._cacheVersion = self.version
+        self.formationTable = None
         self.name = str(name)
         self.allegience=allegience
         self.map = map
         self.commander = commander
         self.formations = list(formations)
+        if tabulate:
+            self.tabulate()
         self.supply=int(supply)
         self.morale=int(morale)
         self.noncombattantPercent = int(noncombattantPercent)
@@ -94,8 +197,57 @@ class Army:
         # return repr_string
         return self.name
         
+    @property
+    def formations(self) -> FormationList:
+        return self._formations
+
+    @formations.setter
+    def formations(self, formations:list) -> None:
+        self._formations = FormationList(self, formations)
+        self._syncFormationTable()
+        self.version += 1
+
+    def tabulate(self, enabled:bool=True) -> None:
+        """Start (or with enabled=False, stop) keeping formations in a FormationTable"""
+        if self.formationTable is not None:
+            self.formationTable.release()
+            self.formationTable = None
+        if enabled:
+            self.formationTable = FormationTable(self.formations)
+        self.version += 1
+
+    def _syncFormationTable(self) -> None:
+        """Rebuild the FormationTable, if any, after the list of formations changed"""
+        if self.formationTable is not None:
+            self.formationTable.release()
+            self.formationTable = FormationTable(self.formations)
+
+    @property
+    def noncombattantPercent(self) -> int:
+        return self._noncombattantPercent
+
+    @noncombattantPercent.setter
+    def noncombattantPercent(self, percent:int) -> None:
+        self._noncombattantPercent = int(percent)
+        self.version += 1
+
+    def _getCached(self, key, compute):
+        """Return a cached total, computing it if the army has changed since it was stored"""
+        if self._cacheVersion != self.version:
+            self._cache.clear()
+            self._cacheVersion = self.version
+        try:
+            return self._cache[key]
+        except KeyError:
+            value = compute()
+            self._cache[key] = value
+            return value
+
     def getForces(self) -> dict:
         """Return dictionary counting each type of troop within army"""
+        return dict(self._getCached("forces", self._computeForces))
+
+    def _computeForces(self) -> dict:
         forces = Counter()
         for formation in self.formations:
             forces[formation.getDescription()] += formation.warriorCount
@@ -103,6 +255,12 @@ class Army:
         return dict(forces)
     
     def countInfantry(self) -> int:
+        return self._getCached("infantry", self._computeInfantry)
+
+    def _computeInfantry(self) -> int:
+        if self.formationTable is not None:
+            rows = self.formationTable.rows
+            return int(rows["warriorCount"][~rows["cavalry"]].sum())
         count_infantry = 0
         for formation in self.formations:
             if not formation.cavalry:
@@ -110,6 +268,12 @@ class Army:
         return count_infantry
 
     def countCavalry(self) -> int:
+        return self._getCached("cavalry", self._computeCavalry)
+
+    def _computeCavalry(self) -> int:
+        if self.formationTable is not None:
+            rows = self.formationTable.rows
+            return int(rows["warriorCount"][rows["cavalry"]].sum())
         count_cavalry = 0
         for formation in self.formations:
             if formation.cavalry:
@@ -119,6 +283,11 @@ class Army:
     def getStrength(self, setting:str="FIELD") -> int:
         """Calculate effective strength of this army in a given setting"""
         assert setting in ["FIELD", "SIEGEATTACK", "SIEGEDEFEND"], "'setting' must be one of FIELD, SIEGEATTACK, or SIEGEDEFEND, got '{}'".format(setting)
+        return self._getCached(("strength", setting), lambda: self._computeStrength(setting))
+
+    def _computeStrength(self, setting:str) -> int:
+        if self.formationTable is not None:
+            return int(self.formationTable.getStrength(setting).sum())
         strength_total = 0
         for formation in self.formations:
             strength_total += formation.getStrength(setting=setting)
@@ -126,13 +295,19 @@ class Army:
     
     def getTravelDistance(self, hours:int, forced:bool=False) -> float:
         """Returns the travel diatance for the slowest formation in the army over a number of hours"""
+        return self._getCached(("travel", hours, forced), lambda: self._computeTravelDistance(hours, forced))
+
+    def _computeTravelDistance(self, hours:int, forced:bool) -> float:
         leagues = -1
-        for formation in self.formations:
-            formation_leagues = formation.getTravelDistance(hours, forced)
-            if leagues==-1:
-                leagues=formation_leagues
-            elif formation_leagues < leagues:
-                leagues = formation_leagues
+        if (self.formationTable is not None) and (len(self.formationTable) > 0):
+            leagues = float(self.formationTable.getTravelDistance(hours, forced).min())
+        else:
+            for formation in self.formations:
+                formation_leagues = formation.getTravelDistance(hours, forced)
+                if leagues==-1:
+                    leagues=formation_leagues
+                elif formation_leagues < leagues:
+                    leagues = formation_leagues
         if self.getLength()>2: # armies longer than 2 leagues move slower
             if forced:
                 slow_speed = 12/18
@@ -144,25 +319,42 @@ class Army:
     
     def getLength(self) -> float:
         """Calculate length in leagues of the army on the march"""
+        return self._getCached("length", self._computeLength)
+
+    def _computeLength(self) -> float:
         length_warriors = 0
-        for formation in self.formations:
-            length_warriors += formation.getLength()
+        if self.formationTable is not None:
+            length_warriors = float(self.formationTable.getLength().sum())
+        else:
+            for formation in self.formations:
+                length_warriors += formation.getLength()
         length_noncombattants = (self.getNoncombattantCount()/5000)/3
         army_length = length_warriors + length_noncombattants
         return round(army_length, 2)
     
     def getSupplyCapacity(self) -> int:
         """Calculate maximum quantity of supply the army can carry"""
+        return self._getCached("supplyCapacity", self._computeSupplyCapacity)
+
+    def _computeSupplyCapacity(self) -> int:
         capacity_warriors = 0
-        for formation in self.formations:
-            capacity_warriors += formation.getSupplyCapacity()
+        if self.formationTable is not None:
+            capacity_warriors = int(self.formationTable.getSupplyCapacity().sum())
+        else:
+            for formation in self.formations:
+                capacity_warriors += formation.getSupplyCapacity()
         capacity_noncombattants = self.getNoncombattantCount() * 15
         return capacity_warriors + capacity_noncombattants
         
     def getSupplyConsumption(self, days:int=1) -> int:
+        return self._getCached("supplyConsumption", self._computeSupplyConsumption) * days
+
+    def _computeSupplyConsumption(self) -> int:
+        if self.formationTable is not None:
+            return int(self.formationTable.getSupplyConsumption(days=1).sum())
         total_consumption = 0
         for formation in self.formations:
-            total_consumption += formation.getSupplyConsumption(days=days)
+            total_consumption += formation.getSupplyConsumption(days=1)
         return total_consumption
     
     def isSupplyLow(self, days_threshold:int=1) -> bool:
@@ -174,11 +366,37 @@ class Army:
         else:
             return False
         
+    def consumeSupply(self, hours:int) -> int:
+        """Deduct supply eaten over a number of hours and return the amount consumed
+
+        The fraction of a unit of supply left over is carried to the next
+        call, so the total eaten over a day is the same however the day is
+        split into steps.
+        """
+        eaten = self.getSupplyConsumption(days=1)*hours + self._supplyRemainder # in 24ths of a unit
+        consumed = min(self.supply, eaten//24)
+        self._supplyRemainder = (eaten % 24) if consumed < self.supply else 0
+        self.supply -= consumed
+        return consumed
+
+    def getHoursToSupplyExhaustion(self) -> int:
+        """Returns hours until supply runs out at the current rate, or None if nothing is consumed"""
+        hourly_consumption = self.getSupplyConsumption(days=1)/24
+        if hourly_consumption <= 0:
+            return None
+        return math.ceil(self.supply/hourly_consumption)
+
     def getNoncombattantCount(self) -> int:
         """Calculate current number of noncombattants attached to the army"""
+        return self._getCached("noncombattants", self._computeNoncombattantCount)
+
+    def _computeNoncombattantCount(self) -> int:
         count_warriors = 0
-        for formation in self.formations:
-            count_warriors += formation.warriorCount
+        if self.formationTable is not None:
+            count_warriors = int(self.formationTable.rows["warriorCount"].sum())
+        else:
+            for formation in self.formations:
+                count_warriors += formation.warriorCount
         count_noncombattants = int(count_warriors * (self.noncombattantPercent/100))
         return count_noncombattants
     
@@ -225,6 +443,71 @@ class Army:
         except AssertionError as e:
             raise InvalidActionError(e)
         
+    def getHoursToArrival(self, forced:bool=False) -> int:
+        """Returns whole hours until the van reaches the next node on its route, or None if not marching"""
+        if self.position.getMotion()!="marching":
+            return None
+        van_position = self.position.vanPosition
+        if van_position.getPositionType()=="node":
+            remaining_distance = self.map.edges[(van_position.mapLocation, van_position.orientation)]['distance']
+        else:
+            remaining_distance = van_position.distanceToDestination
+        hourly_distance = self.getTravelDistance(hours=1, forced=forced)
+        if hourly_distance <= 0:
+            return None
+        return max(math.ceil(remaining_distance/hourly_distance), 1)
+
+    def reachable(self, hours:float, forced:bool=False, exclusion_function=None) -> dict:
+        """Return everywhere the van could be within a number of hours, and how soon
+
+        Runs one shortest-path search from the van's position, bounded by how
+        far the slowest formation travels in the time given. The van may set
+        out toward either end of the road it is on.
+
+        ***
+
+        Parameters:
+            hours: how long the army may march
+            forced: default False. Whether this is a forced march
+            exclusion_function: default None. As in Map.getShortestPath(),
+                for roads the army may not take
+
+        Returns:
+            dict with keys:
+                nodes: dict of each reachable node to the earliest hour the
+                    van could arrive there
+                roads: list of dicts, one for each stretch of road the van
+                    could march along, with keys road (a tuple of the nodes
+                    it runs from and toward), fromLeagues and toLeagues (the
+                    stretch's start and end, in leagues from the road's first
+                    node) and arrival (the earliest hour at the start of the
+                    stretch). The van could pass each point x of the stretch
+                    at arrival + (x-fromLeagues)/speed hours at the earliest
+                speed: leagues the van marches per hour
+        """
+        leagues = max(self.getTravelDistance(hours=hours, forced=forced), 0) if hours > 0 else 0
+        speed = leagues/hours if leagues > 0 else 0.0
+        van_position = self.position.vanPosition
+        start = van_position.getEndpointDistances()
+        distance_field = self.map.getDistanceField(start, exclusion_function=exclusion_function, cutoff=leagues)
+        reachable = {'nodes':{}, 'roads':[], 'speed':speed}
+        for node, distance in distance_field.items():
+            reachable['nodes'][node] = round(distance/speed, 2) if distance > 0 else 0.0
+        if (van_position.getPositionType()=="edge") and (leagues > 0):
+            road_length = van_position.getDescription()['distance']
+            for road in [(van_position.getOrigin(), van_position.orientation), (van_position.orientation, van_position.getOrigin())]:
+                from_leagues = road_length - start[road[1]] # the van's place, measured from road[0]
+                reachable['roads'].append({'road':road, 'fromLeagues':round(from_leagues, 2), 'toLeagues':round(float(min(road_length, from_leagues+leagues)), 2), 'arrival':0.0})
+        for node, distance in distance_field.items():
+            remaining = leagues - distance
+            if remaining <= 0:
+                continue
+            for neighbor, d in self.map._adj[node].items():
+                if (exclusion_function is not None) and exclusion_function(self.map.nodes[node], self.map.nodes[neighbor], d):
+                    continue
+                reachable['roads'].append({'road':(node, neighbor), 'fromLeagues':0.0, 'toLeagues':round(float(min(d['distance'], remaining)), 2), 'arrival':reachable['nodes'][node]})
+        return reachable
+
     def retreat(self, hours:float=None, distance:float=None, awayFrom:"Army"=None) -> None:
         """
         Docstring for retreat
@@ -289,31 +572,47 @@ class Army:
     def bypassTo(self, bypass_name) -> None:
         self.position.bypassTo(bypass_name)
     
-    def applyCasualties(self, count:int=None, percent:int=None) -> None:
+    def applyCasualties(self, count:int=None, percent:int=None, weighting=None, rng:np.random.Generator=None) -> np.ndarray:
+        """Inflict casualties spread over the formations and return the casualties of each
+
+        ***
+
+        Parameters:
+            count: number of casualties. Exactly one of count or percent must be set
+            percent: casualties as a percentage of the army's warriors
+            weighting: default None. Name in cubrum.casualties.CASUALTY_WEIGHTINGS
+                or a weighting callable; None weights formations by warriors
+            rng: default None. Generator to draw from instead of the army's
+        """
         try:
             assert (count is None) ^ (percent is None), "exactly one of count or percent must be set"
             if count is None:
                 count = int((self.countInfantry()+self.countCavalry())*(percent/100))
-            weights = []
-            for formation in self.formations:
-                # TODO: more sophisticated weighting
-                weights.append(formation.warriorCount)
-            indices = np.random.choice(len(weights), size=count, p = np.array(weights)/sum(weights))
-            counts_by_formation = np.bincount(indices, minlength=len(weights))
-            for i in range(len(self.formations)):
-                self.formations[i].applyCasualties(count=counts_by_formation[i])
+            weights = getWeighting(weighting)(getArmyRows(self))
+            counts_by_formation = distributeCasualties(count, weights, rng=(self.rng if rng is None else rng))
+            self.applyCasualtyCounts(counts_by_formation)
+            return counts_by_formation
         except AssertionError as e:
             raise ValueError(e)
+
+    def applyCasualtyCounts(self, counts) -> None:
+        """Remove counts[i] warriors from the i-th formation"""
+        if self.formationTable is not None:
+            self.formationTable.applyCasualties(counts)
+            self.version += 1
+        else:
+            for formation, formation_count in zip(self.formations, counts):
+                formation.applyCasualties(count=int(formation_count))
         
     def raiseMorale(self, amount:int=1):
-        self.morale = min(self.morale+amount, 12)
+        self.morale = min(self.morale+amount, MAX_MORALE)
 
     def lowerMorale(self, amount:int=1):
         self.morale = max(self.morale-amount, 0)
         
-    def checkMorale(self) -> int:
+    def checkMorale(self, rng:np.random.Generator=None) -> int:
         """Returns 0 on a success, else roll result"""
-        die_result = np.random.randint(1,7)+np.random.randint(1,7)
+        die_result = rollDice("2d6", rng=self.rng if rng is None else rng)
         if die_result <= self.morale:
             return 0
         else:
@@ -327,3 +626,67 @@ class Army:
         g['infantryCount'] = self.countInfantry()
         g['cavalryCount'] = self.countCavalry()
         return g
+
+    def clone(self, map:Map=None) -> "Army":
+        """Return an independent copy of this army
+
+        ***
+
+        Parameters:
+            map: default None. If set, the copy is placed on this map, which
+                must have the same topology as the original's
+        """
+        new_army = self.__class__.__new__(self.__class__)
+        new_army.__dict__.update(self.__dict__)
+        new_army.map = self.map if map is None else map
+        new_army.commander = self.commander.clone()
+        new_army._cache = {}
+        new_army.formationTable = None
+        new_army.formations = [formation.clone() for formation in self.formations]
+        if self.formationTable is not None:
+            new_army.tabulate()
+        new_army.position = self.position.copy(new_army.map)
+        return new_army
+
+
+def getMoraleValues(armies:list) -> np.ndarray:
+    """Return the morale of each army as an array"""
+    return np.fromiter((army.morale for army in armies), dtype=np.int64, count=len(armies))
+
+
+def changeMoraleBatch(armies:list, amount) -> np.ndarray:
+    """Raise (or with negative amounts lower) the morale of many armies at once
+
+    ***
+
+    Parameters:
+        armies: the Army objects to change
+        amount: change for every army, or one change per army
+
+    Returns:
+        array of each army's new morale, kept within 0 and MAX_MORALE as by
+            raiseMorale and lowerMorale
+    """
+    morale = np.clip(getMoraleValues(armies) + np.broadcast_to(np.asarray(amount, dtype=np.int64), (len(armies),)), 0, MAX_MORALE)
+    for army, value in zip(armies, morale.tolist()):
+        army.morale = value
+    return morale
+
+
+def checkMoraleBatch(armies:list, rng:np.random.Generator=None) -> np.ndarray:
+    """Check the morale of many armies at once, as Army.checkMorale
+
+    ***
+
+    Parameters:
+        armies: the Army objects to check
+        rng: default None. Generator to roll with; None uses the first
+            army's, or failing that the global np.random state
+
+    Returns:
+        array with 0 for each army that passed, else its 2d6 roll
+    """
+    if (rng is None) and armies:
+        rng = armies[0].rng
+    rolls = rollDice("2d6", size=len(armies), rng=getGenerator(rng))
+    return np.where(rolls <= getMoraleValues(armies), 0, rolls)
@@ -2,11 +2,40 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
+import bisect
 import numpy as np
 
 from .weather import Weather
 from .exceptions import InvalidActionError, InvalidBattleError
 from .decisionpoint import DecisionPoint, BattleResolved
+from .casualties import applyCasualtiesBatch
+from .rng import getGenerator
+from .dice import rollDice, getDistribution, getProbabilityAbove
+
+TWO_D6_PROBABILITIES = getDistribution("2d6")[1] # P(2d6 = 2, 3, ..., 12)
+TWO_D6_DIFFERENCE_PROBABILITIES = getDistribution("2d6-2d6")[1] # P(2d6 - 2d6 = -10, -9, ..., 10)
+ROUT_SUPPLY_LOST_PERCENTS = [10, 20, 30, 40, 50, 60] # equally likely
+CONSEQUENCE_MARGINS = [0, 1, 3, 5] # largest margin of each row of the consequences table; larger margins share one last row
+SIEGE_DEFENDER_BONUS = {"town":3, "city":4, "fortress":5}
+
+
+def getMoraleFailureProbability(morale:int) -> float:
+    """Return the probability that Army.checkMorale fails, i.e. 2d6 rolls above morale"""
+    return getProbabilityAbove("2d6", morale)
+
+
+def getModifierValues(strength:np.ndarray, morale:np.ndarray, surprised:np.ndarray, outOfFormation:np.ndarray, supplyLow:np.ndarray, siegeModifier:np.ndarray) -> np.ndarray:
+    """Vectorized total of Battle.getModifiers
+
+    Every argument has shape (2, n): one row per side of n battles.
+    """
+    other_strength = strength[::-1]
+    advantage = np.maximum(strength - other_strength, 0)
+    values = np.floor_divide(advantage, other_strength, out=np.zeros(strength.shape, dtype=np.int64), where=other_strength>0)
+    values += np.maximum(morale - morale[::-1], 0)
+    values -= np.asarray(surprised, dtype=np.int64) + 2*np.asarray(outOfFormation, dtype=np.int64) + np.asarray(supplyLow, dtype=np.int64)
+    values += siegeModifier
+    return values
 
 
 class Battle:
@@ -17,15 +46,22 @@ class Battle:
         isSiege:bool
         weather:Weather
         belligerents:dict
+        rng:numpy.random.Generator
     Methods:
         addBelligerent() -> None
+        getSetting() -> str
+        getSiegeModifier() -> int
         getStrengths() -> dict
         getModifiers() -> dict
         generateResult() -> BattleResult
+        getOutcomeDistribution() -> list
+        getOdds() -> dict
     """
-    def __init__(self, weather:Weather, isSiege:bool=False, strongholdType:str=None):
+    _outcomeTable = None # (sides and defending flags, table) of _getOutcomeTable
+    def __init__(self, weather:Weather, isSiege:bool=False, strongholdType:str=None, rng:np.random.Generator=None):
         try:
             self.weather = weather 
+            self.rng = rng
             self.isSiege = isSiege 
             self.strongholdType=strongholdType
             if self.isSiege:
@@ -48,17 +84,26 @@ class Battle:
         except AssertionError as e:
             raise InvalidBattleError(e)
 
+    def getSetting(self, side:str) -> str:
+        """Return the setting in which side's strength is counted"""
+        if self.isSiege:
+            if self.belligerents[side]['defending']:
+                return "SIEGEDEFEND"
+            return "SIEGEATTACK"
+        return "FIELD"
+
+    def getSiegeModifier(self, side:str) -> int:
+        """Return the modifier side gets for attacking or defending a stronghold"""
+        if not self.isSiege:
+            return 0
+        if self.belligerents[side]['defending']:
+            return SIEGE_DEFENDER_BONUS.get(self.strongholdType, 0)
+        return -1
+
     def getStrengths(self) -> dict:
         strengths = {}
         for side, belligerent in self.belligerents.items():
-            if self.isSiege:
-                if belligerent['defending']:
-                    setting = "SIEGEDEFEND"
-                else:
-                    setting = "SIEGEATTACK"
-            else:
-                setting="FIELD"
-            strengths[side] = belligerent['army'].getStrength(setting=setting)
+            strengths[side] = belligerent['army'].getStrength(setting=self.getSetting(side))
         return strengths
     
     def getModifiers(self) -> dict:
@@ -97,12 +142,12 @@ class Battle:
                 descriptions.append("supplies low: -1")
                 values.append(-1)
             # siege attacker
-            if self.isSiege and not belligerent.defending:
+            if self.isSiege and not belligerent['defending']:
                 descriptions.append("siege attacker: -1")
-                values.append(-1)
+                values.append(self.getSiegeModifier(allegience))
             # siege defender
-            if self.isSiege and belligerent.defending:
-                siege_bonus = {"town":3,"city":4,"fortress":5}.get(self.strongholdType, 0)
+            if self.isSiege and belligerent['defending']:
+                siege_bonus = self.getSiegeModifier(allegience)
                 descriptions.append("siege defender ({}): +{}".format(self.strongholdType, siege_bonus))
                 values.append(siege_bonus)
             modifiers[allegience] = {
@@ -115,36 +160,50 @@ class Battle:
         self.validate()
         modifiers = self.getModifiers()
         side1, side2 = list(modifiers.keys())
-        rolls = {side:np.random.randint(1,7)+np.random.randint(1,7)+modifiers[side]['value'] for side in modifiers.keys()}
-        margin = abs(rolls[side1]-rolls[side2])
+        rng = getGenerator(self.rng)
+        rolls = {side:int(roll)+modifiers[side]['value'] for side, roll in zip(modifiers.keys(), rollDice("2d6", size=2, rng=rng))}
+        difference = rolls[side1]-rolls[side2]
+        victoriousSide, defeatedSide = self._getVictor(side1, side2, difference)
+        supplyLostPercent = None
+        if defeatedSide:
+            # check rout
+            if self.belligerents[defeatedSide]['army'].checkMorale(rng=self.rng)>0:
+                supplyLostPercent=rollDice("1d6", rng=rng)*10
+        consequences = self._getConsequences(side1, side2, difference, supplyLostPercent)
+        return BattleResult(victoriousSide=victoriousSide, consequences=consequences, belligerents=self.belligerents, isSiege=self.isSiege)
+
+    def _getVictor(self, side1:str, side2:str, difference:int) -> tuple:
+        """Return (victoriousSide, defeatedSide) when side1 rolls difference more than side2; both None on a draw"""
+        if difference > 0:
+            return side1, side2
+        if difference < 0:
+            return side2, side1
+        # equal rolls
+        if self.belligerents[side1]['defending'] and not self.belligerents[side2]['defending']:
+            return side1, side2
+        if self.belligerents[side2]['defending'] and not self.belligerents[side1]['defending']:
+            return side2, side1
+        return None, None
+
+    def _getConsequences(self, side1:str, side2:str, difference:int, supplyLostPercent:int=None) -> dict:
+        """Return the consequences for each side when side1 rolls difference more than side2
+
+        supplyLostPercent is set if the defeated side routed, and is the
+        share of its supply it lost.
+        """
+        victoriousSide, defeatedSide = self._getVictor(side1, side2, difference)
+        margin = abs(difference)
         consequences = {side1:{}, side2:{}}
-        if rolls[side1]>rolls[side2]:
-            victoriousSide=side1 
-            defeatedSide=side2
-        elif rolls[side2]>rolls[side1]:
-            victoriousSide=side2
-            defeatedSide=side1
-        else: # equal rolls
-            if self.belligerents[side1]['defending'] and not self.belligerents[side2]['defending']:
-                victoriousSide=side1
-                defeatedSide=side2
-                consequences[side2]['moraleChange']=-1
-            elif self.belligerents[side2]['defending'] and not self.belligerents[side1]['defending']:
-                victoriousSide=side2
-                defeatedSide=side1
-                consequences[side1]['moraleChange']=-1
-            else:
-                victoriousSide=None
-                defeatedSide=None
+        if margin==0:
+            if defeatedSide:
+                consequences[defeatedSide]['moraleChange']=-1
             consequences[side1]['casualtyPercent']=5
             consequences[side2]['casualtyPercent']=5
         if defeatedSide:
             consequences[defeatedSide]['retreatDistance']=1
-            # check rout
-            if self.belligerents[defeatedSide]['army'].checkMorale()>0:
+            if supplyLostPercent is not None:
                 consequences[defeatedSide]['rout']=True
                 consequences[defeatedSide]['retreatDistance']=2
-                supplyLostPercent=int(np.random.randint(1,7)*10)
                 consequences[defeatedSide]['supplyLostPercent'] = supplyLostPercent
             # table of consequences
             if margin==0: # already resolved above 
@@ -168,7 +227,107 @@ class Battle:
                 consequences[defeatedSide]['casualtyPercent']=20
                 consequences[victoriousSide]['moraleChange']=2
                 consequences[defeatedSide]['moraleChange']=-2
-        return BattleResult(victoriousSide=victoriousSide, consequences=consequences, belligerents=self.belligerents, isSiege=self.isSiege)
+        return consequences
+
+    def _getOutcomeTable(self, side1:str, side2:str) -> dict:
+        """Return the result of each difference between -max and +max margin, with and without a rout
+
+        Differences in the same row of the consequences table share one
+        (victoriousSide, defeatedSide, consequences, routConsequences) tuple,
+        where routConsequences holds one entry per ROUT_SUPPLY_LOST_PERCENTS.
+        The table depends only on which side is defending, and is kept
+        until that changes.
+        """
+        key = (side1, side2, bool(self.belligerents[side1]['defending']), bool(self.belligerents[side2]['defending']))
+        if (self._outcomeTable is None) or (self._outcomeTable[0]!=key):
+            largest = CONSEQUENCE_MARGINS[-1]+1
+            rows = {}
+            table = {}
+            for difference in range(-largest, largest+1):
+                row_key = ((difference > 0) - (difference < 0), bisect.bisect_left(CONSEQUENCE_MARGINS, abs(difference)))
+                if row_key not in rows:
+                    victoriousSide, defeatedSide = self._getVictor(side1, side2, difference)
+                    rout_consequences = [self._getConsequences(side1, side2, difference, percent) for percent in ROUT_SUPPLY_LOST_PERCENTS] if defeatedSide else []
+                    rows[row_key] = (victoriousSide, defeatedSide, self._getConsequences(side1, side2, difference), rout_consequences)
+                table[difference] = rows[row_key]
+            self._outcomeTable = (key, table)
+        return self._outcomeTable[1]
+
+    def getOutcomeDistribution(self) -> list:
+        """Return every possible result of generateResult with its exact probability
+
+        The difference of the two 2d6 rolls is distributed as the
+        convolution of 2d6 with its mirror image, shifted by the difference
+        in modifiers; each value gives a victor and a row of the
+        consequences table, and a defeated side routs with the probability
+        that its morale check fails. No army is changed.
+
+        ***
+
+        Returns:
+            list of dicts with keys probability, victoriousSide, consequences,
+            most likely first. Results with identical consequences are merged.
+        """
+        self.validate()
+        modifiers = self.getModifiers()
+        side1, side2 = list(modifiers.keys())
+        offset = modifiers[side1]['value'] - modifiers[side2]['value']
+        rout_probabilities = {side:getMoraleFailureProbability(self.belligerents[side]['army'].morale) for side in [side1, side2]}
+        table = self._getOutcomeTable(side1, side2)
+        largest = CONSEQUENCE_MARGINS[-1]+1
+        row_probabilities = {} # id of each row of the table -> [row, probability]
+        for index, probability in enumerate(TWO_D6_DIFFERENCE_PROBABILITIES.tolist()):
+            row = table[min(max(index - 10 + offset, -largest), largest)]
+            entry = row_probabilities.setdefault(id(row), [row, 0.0])
+            entry[1] += probability
+        outcomes = []
+        for (victoriousSide, defeatedSide, consequences, rout_consequences), probability in row_probabilities.values():
+            rout_probability = rout_probabilities[defeatedSide] if defeatedSide else 0.0
+            branches = [(probability*(1-rout_probability), consequences)]
+            branches += [(probability*rout_probability/len(rout_consequences), c) for c in rout_consequences]
+            for branch_probability, branch_consequences in branches:
+                if branch_probability > 0:
+                    outcomes.append({'probability':branch_probability, 'victoriousSide':victoriousSide, 'consequences':{side:dict(c) for side, c in branch_consequences.items()}})
+        return sorted(outcomes, key=lambda outcome: -outcome['probability'])
+
+    def getOdds(self) -> dict:
+        """Summarize the exact distribution of results for each side
+
+        ***
+
+        Returns:
+            dict of side to a dict with keys:
+                victory: probability of winning
+                draw: probability of neither side winning
+                rout: probability of being routed
+                casualtyPercent: dict of casualty percentage to probability
+                moraleChange: dict of morale change to probability
+                expectedCasualtyPercent: mean casualty percentage
+        """
+        self.validate()
+        modifiers = self.getModifiers()
+        side1, side2 = list(modifiers.keys())
+        offset = modifiers[side1]['value'] - modifiers[side2]['value']
+        rout_probabilities = {side:getMoraleFailureProbability(self.belligerents[side]['army'].morale) for side in [side1, side2]}
+        odds = {side:{'victory':0.0, 'draw':0.0, 'rout':0.0, 'casualtyPercent':{}, 'moraleChange':{}, 'expectedCasualtyPercent':0.0} for side in [side1, side2]}
+        for index, probability in enumerate(TWO_D6_DIFFERENCE_PROBABILITIES.tolist()):
+            difference = index - 10 + offset
+            victoriousSide, defeatedSide = self._getVictor(side1, side2, difference)
+            # a rout changes supply and retreat only, so one row covers both branches
+            consequences = self._getConsequences(side1, side2, difference)
+            for side, side_odds in odds.items():
+                consequence = consequences[side]
+                if victoriousSide==side:
+                    side_odds['victory'] += probability
+                elif victoriousSide is None:
+                    side_odds['draw'] += probability
+                elif defeatedSide==side:
+                    side_odds['rout'] += probability*rout_probabilities[side]
+                for key in ['casualtyPercent', 'moraleChange']:
+                    value = consequence.get(key, 0)
+                    side_odds[key][value] = side_odds[key].get(value, 0.0) + probability
+                side_odds['expectedCasualtyPercent'] += probability*consequence.get('casualtyPercent', 0)
+        return odds
 
 
 class BattleResult:
@@ -182,7 +341,9 @@ class BattleResult:
         belligerents:dict
 
     Methods:
-        apply() -> None
+        apply() -> DecisionPoint
+        getEnemy() -> Army
+        getDecisionPoint() -> DecisionPoint
     """
     def __init__(self, victoriousSide:str, consequences:dict, belligerents:dict, isSiege:bool):
         self.victoriousSide=victoriousSide
@@ -218,24 +379,126 @@ class BattleResult:
         for side, consequence_dict in self.consequences.items():
             # casualties 
             self.belligerents[side]['army'].applyCasualties(percent=consequence_dict.get("casualtyPercent", 0))
-            # morale
-            morale_change = consequence_dict.get("moraleChange", 0)
-            if morale_change > 0:
-                self.belligerents[side]['army'].raiseMorale(morale_change)
-            elif morale_change < 0:
-                self.belligerents[side]['army'].lowerMorale(-1*morale_change)
-            # lost supply
-            supplyLostPercent = consequence_dict.get("supplyLostPercent", 0)
-            if supplyLostPercent > 0:
-                supplyRemainingPercent = 100-supplyLostPercent
-                self.belligerents[side]['army'].supply = int(self.belligerents[side]['army'].supply * (supplyRemainingPercent/100))
-
+            self._applyMoraleAndSupply(side)
             # retreat
             retreat_distance = consequence_dict.get("retreatDistance", 0)
             if retreat_distance > 0:
-                try:
-                    enemy_army = [self.belligerents[enemy_side]['army'] for enemy_side in self.belligerents.keys() if enemy_side!=side][0]
-                except IndexError:
-                    raise InvalidBattleError("unable to find enemy army for side '{}' among belligerents".format(side))
-                self.belligerents[side]['army'].retreat(distance=retreat_distance, awayFrom=enemy_army)
-        return BattleResolved(belligerents=self.belligerents, victoriousSide=self.victoriousSide, rout=self.rout, consequences=self.consequences, isSiege=self.isSiege)
\ No newline at end of file
+                self.belligerents[side]['army'].retreat(distance=retreat_distance, awayFrom=self.getEnemy(side))
+        return self.getDecisionPoint()
+
+    def _applyMoraleAndSupply(self, side:str) -> None:
+        consequence_dict = self.consequences[side]
+        # morale
+        morale_change = consequence_dict.get("moraleChange", 0)
+        if morale_change > 0:
+            self.belligerents[side]['army'].raiseMorale(morale_change)
+        elif morale_change < 0:
+            self.belligerents[side]['army'].lowerMorale(-1*morale_change)
+        # lost supply
+        supplyLostPercent = consequence_dict.get("supplyLostPercent", 0)
+        if supplyLostPercent > 0:
+            supplyRemainingPercent = 100-supplyLostPercent
+            self.belligerents[side]['army'].supply = int(self.belligerents[side]['army'].supply * (supplyRemainingPercent/100))
+
+    def getEnemy(self, side:str):
+        """Return the Army fighting against side"""
+        try:
+            return [self.belligerents[enemy_side]['army'] for enemy_side in self.belligerents.keys() if enemy_side!=side][0]
+        except IndexError:
+            raise InvalidBattleError("unable to find enemy army for side '{}' among belligerents".format(side))
+
+    def getDecisionPoint(self) -> DecisionPoint:
+        return BattleResolved(belligerents=self.belligerents, victoriousSide=self.victoriousSide, rout=self.rout, consequences=self.consequences, isSiege=self.isSiege)
+
+
+def resolveBattles(battles:list, rng:np.random.Generator=None) -> list:
+    """Generate the results of many battles at once, as Battle.generateResult
+
+    Modifiers, battle rolls, morale checks of the defeated and rout supply
+    losses are computed as arrays over all battles; only the lookup in the
+    consequences table is done battle by battle.
+
+    ***
+
+    Parameters:
+        battles: list of Battle
+        rng: default None. Generator to draw from; None uses the first
+            battle's, or failing that the global np.random state
+
+    Returns:
+        list of BattleResult, in the order of battles
+    """
+    for battle in battles:
+        battle.validate()
+    if (rng is None) and battles:
+        rng = battles[0].rng
+    rng = getGenerator(rng)
+    n = len(battles)
+    sides = [list(battle.belligerents.keys()) for battle in battles]
+    belligerents = [[battle.belligerents[side] for side in battle_sides] for battle, battle_sides in zip(battles, sides)]
+    def sideArray(getValue, dtype=np.int64):
+        return np.array([[getValue(battles[i], sides[i][j], belligerents[i][j]) for i in range(n)] for j in range(2)], dtype=dtype).reshape(2, n)
+    modifiers = getModifierValues(
+        strength=sideArray(lambda battle, side, b: b['army'].getStrength(setting=battle.getSetting(side))),
+        morale=sideArray(lambda battle, side, b: b['army'].morale),
+        surprised=sideArray(lambda battle, side, b: b['surprised'], bool),
+        outOfFormation=sideArray(lambda battle, side, b: b['outOfFormation'], bool),
+        supplyLow=sideArray(lambda battle, side, b: b['army'].isSupplyLow(), bool),
+        siegeModifier=sideArray(lambda battle, side, b: battle.getSiegeModifier(side))
+    )
+    rolls = rollDice("2d6", size=(2, n), rng=rng) + modifiers
+    differences = (rolls[0] - rolls[1]).tolist()
+    morale_rolls = rollDice("2d6", size=n, rng=rng).tolist()
+    supply_lost_percents = (rollDice("1d6", size=n, rng=rng) * 10).tolist()
+    results = []
+    for i, battle in enumerate(battles):
+        side1, side2 = sides[i]
+        victoriousSide, defeatedSide = battle._getVictor(side1, side2, differences[i])
+        supplyLostPercent = None
+        if defeatedSide and (morale_rolls[i] > battle.belligerents[defeatedSide]['army'].morale):
+            supplyLostPercent = supply_lost_percents[i]
+        consequences = battle._getConsequences(side1, side2, differences[i], supplyLostPercent)
+        results.append(BattleResult(victoriousSide=victoriousSide, consequences=consequences, belligerents=battle.belligerents, isSiege=battle.isSiege))
+    return results
+
+
+def applyBattleResults(results:list, rng:np.random.Generator=None) -> list:
+    """Apply many BattleResults at once and return their decision points
+
+    Casualties for every army are drawn together with
+    cubrum.casualties.applyCasualtiesBatch, then morale and supply are
+    changed in the order of results. Retreats come last, once all other
+    consequences are in place: an army that must retreat from more than one
+    battle retreats once, by the longest distance, away from the enemy of
+    the first battle that demanded it.
+
+    ***
+
+    Parameters:
+        results: list of BattleResult
+        rng: default None. Generator to draw casualties from; None uses
+            the first army's, or failing that the global np.random state
+
+    Returns:
+        list of BattleResolved, in the order of results
+    """
+    armies = []
+    percents = []
+    retreats = {}
+    for result in results:
+        for side, consequence_dict in result.consequences.items():
+            army = result.belligerents[side]['army']
+            armies.append(army)
+            percents.append(consequence_dict.get("casualtyPercent", 0))
+            retreat_distance = consequence_dict.get("retreatDistance", 0)
+            if retreat_distance > 0:
+                if (id(army) not in retreats) or (retreat_distance > retreats[id(army)][1]):
+                    enemy_army = retreats[id(army)][2] if id(army) in retreats else result.getEnemy(side)
+                    retreats[id(army)] = (army, retreat_distance, enemy_army)
+    applyCasualtiesBatch(armies, percent=percents, rng=rng)
+    for result in results:
+        for side in result.consequences.keys():
+            result._applyMoraleAndSupply(side)
+    for army, retreat_distance, enemy_army in retreats.values():
+        army.retreat(distance=retreat_distance, awayFrom=enemy_army)
+    return [result.getDecisionPoint() for result in results]
\ No newline at end of file
@@ -0,0 +1,185 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import numpy as np
+
+from .battle import Battle, getModifierValues
+from .weather import Weather
+from .rng import getGenerator
+from .dice import rollDice
+from .army import MAX_MORALE
+
+MAX_TABLE_MARGIN = 6 # margins from here up share the last row of the consequences table
+
+
+class BattleSimulator:
+    """Monte Carlo simulation of a Battle and the engagements that follow it
+
+    Every trial is one row of a set of NumPy arrays holding each side's
+    warriors, morale and supply, so a whole batch of trials is rolled and
+    resolved with a few array operations per engagement. No BattleResult is
+    built and the armies themselves are never changed.
+
+    A trial goes on to a further engagement between the same armies unless
+    a side routed (breaking contact), a side has no warriors left, or the
+    given number of engagements has been fought. Surprise and being out of
+    formation count in the first engagement only. Strength and supply
+    consumption are scaled with the warriors remaining, as if every
+    formation lost the same share of its warriors.
+
+    ***
+
+    Attributes:
+        battle:Battle
+        sides:list
+        rng:numpy.random.Generator
+
+    Methods:
+        fromArmies() -> BattleSimulator
+        run() -> dict
+        summarize() -> dict
+    """
+    @staticmethod
+    def fromArmies(army1, army2, defending:int=None, isSiege:bool=False, strongholdType:str=None, weather:Weather=None, rng:np.random.Generator=None) -> "BattleSimulator":
+        """Set up a simulation of a battle between two armies
+
+        ***
+
+        Parameters:
+            army1, army2: the belligerents
+            defending: default None. 1 or 2 if that army is defending
+            isSiege, strongholdType: as for Battle
+            weather: default None, for fair weather
+            rng: default None. Generator for the trials
+        """
+        battle = Battle(weather or Weather(), isSiege=isSiege, strongholdType=strongholdType)
+        battle.addBelligerent(army1, defending=(defending==1))
+        battle.addBelligerent(army2, defending=(defending==2))
+        return BattleSimulator(battle, rng=rng)
+
+    def __init__(self, battle:Battle, rng:np.random.Generator=None):
+        battle.validate()
+        self.battle = battle
+        self.rng = battle.rng if rng is None else rng
+        self.sides = list(battle.belligerents.keys())
+        self._buildTable()
+
+    def __repr__(self):
+        return "<BattleSimulator: {}>".format(" vs. ".join(self.sides))
+
+    def _buildTable(self) -> None:
+        """Tabulate Battle's consequences for each roll difference, from -MAX_TABLE_MARGIN to MAX_TABLE_MARGIN"""
+        side1, side2 = self.sides
+        differences = range(-MAX_TABLE_MARGIN, MAX_TABLE_MARGIN+1)
+        self._victor = np.zeros(len(differences), dtype=np.int8) # 0 if side1 won, 1 if side2 won, -1 on a draw
+        self._casualtyPercent = np.zeros((2, len(differences)), dtype=np.int64)
+        self._moraleChange = np.zeros((2, len(differences)), dtype=np.int64)
+        for column, difference in enumerate(differences):
+            victoriousSide, _ = self.battle._getVictor(side1, side2, difference)
+            self._victor[column] = -1 if victoriousSide is None else self.sides.index(victoriousSide)
+            consequences = self.battle._getConsequences(side1, side2, difference)
+            for i, side in enumerate(self.sides):
+                self._casualtyPercent[i, column] = consequences[side].get('casualtyPercent', 0)
+                self._moraleChange[i, column] = consequences[side].get('moraleChange', 0)
+
+    def _getModifiers(self, strength:np.ndarray, morale:np.ndarray, supplyLow:np.ndarray, first:bool) -> np.ndarray:
+        """Return each side's roll modifier in each trial, as Battle.getModifiers"""
+        belligerents = [self.battle.belligerents[side] for side in self.sides]
+        return getModifierValues(
+            strength=strength,
+            morale=morale,
+            surprised=np.array([[first and b['surprised']] for b in belligerents]),
+            outOfFormation=np.array([[first and b['outOfFormation']] for b in belligerents]),
+            supplyLow=supplyLow,
+            siegeModifier=np.array([[self.battle.getSiegeModifier(side)] for side in self.sides])
+        )
+
+    def run(self, trials:int=100000, engagements:int=1, rng:np.random.Generator=None) -> dict:
+        """Simulate trials of the battle and any engagements that follow it
+
+        ***
+
+        Parameters:
+            trials: default 100000. Number of independent trials
+            engagements: default 1. Most engagements fought in a trial
+            rng: default None. Generator to draw from instead of the
+                simulator's, e.g. one of GameState.spawnRNG() per worker
+
+        Returns:
+            dict with key engagements, an array of the engagements fought in
+            each trial, and for each side a dict of arrays with one value
+            per trial:
+                casualties: warriors lost
+                morale: morale after the last engagement
+                supplyLost: supply lost to routs
+                retreatDistance: leagues retreated
+                victories: engagements won
+                routed: whether the side routed
+        """
+        rng = getGenerator(self.rng if rng is None else rng)
+        armies = [self.battle.belligerents[side]['army'] for side in self.sides]
+        start_warriors = np.array([army.countInfantry() + army.countCavalry() for army in armies], dtype=np.int64)
+        start_strength = np.array([army.getStrength(self.battle.getSetting(side)) for side, army in zip(self.sides, armies)], dtype=np.int64)
+        start_consumption = np.array([army.getSupplyConsumption(days=1) for army in armies], dtype=np.int64)
+        start_supply = np.array([army.supply for army in armies], dtype=np.int64)
+        warriors = np.repeat(start_warriors[:, None], trials, axis=1)
+        morale = np.repeat(np.array([army.morale for army in armies], dtype=np.int64)[:, None], trials, axis=1)
+        supply = np.repeat(start_supply[:, None], trials, axis=1)
+        retreat = np.zeros((2, trials), dtype=np.int64)
+        victories = np.zeros((2, trials), dtype=np.int64)
+        routed = np.zeros((2, trials), dtype=bool)
+        fought = np.zeros(trials, dtype=np.int64)
+        active = np.ones(trials, dtype=bool)
+        scale = np.divide(1, start_warriors, out=np.zeros(2), where=start_warriors>0)[:, None]
+        for engagement in range(engagements):
+            index = np.flatnonzero(active & (warriors > 0).all(axis=0))
+            if len(index)==0:
+                break
+            n = len(index)
+            share = warriors[:, index] * scale
+            strength = (start_strength[:, None] * share).astype(np.int64)
+            supply_low = (start_consumption[:, None] * share) >= supply[:, index]
+            modifiers = self._getModifiers(strength, morale[:, index], supply_low, first=(engagement==0))
+            rolls = rollDice("2d6", size=(2, n), rng=rng) + modifiers
+            column = np.clip(rolls[0] - rolls[1], -MAX_TABLE_MARGIN, MAX_TABLE_MARGIN) + MAX_TABLE_MARGIN
+            victor = self._victor[column]
+            decided = victor >= 0
+            defeated = np.where(decided, 1 - victor, 0)
+            # morale check of the defeated side, before this engagement's morale changes
+            rout = decided & (rollDice("2d6", size=n, rng=rng) > morale[defeated, index])
+            supply_lost_percent = np.where(rout, rollDice("1d6", size=n, rng=rng) * 10, 0)
+            for i in range(2):
+                is_defeated = decided & (defeated==i)
+                warriors[i, index] -= np.minimum((warriors[i, index] * (self._casualtyPercent[i, column]/100)).astype(np.int64), warriors[i, index])
+                morale[i, index] = np.clip(morale[i, index] + self._moraleChange[i, column], 0, MAX_MORALE)
+                side_routed = is_defeated & rout
+                supply[i, index] = np.where(side_routed, (supply[i, index] * ((100 - supply_lost_percent)/100)).astype(np.int64), supply[i, index])
+                retreat[i, index] += np.where(side_routed, 2, np.where(is_defeated, 1, 0))
+                victories[i, index] += decided & (victor==i)
+                routed[i, index] |= side_routed
+            fought[index] += 1
+            active[index[rout]] = False
+        results = {'engagements':fought}
+        for i, side in enumerate(self.sides):
+            results[side] = {
+                'casualties':start_warriors[i] - warriors[i],
+                'morale':morale[i],
+                'supplyLost':start_supply[i] - supply[i],
+                'retreatDistance':retreat[i],
+                'victories':victories[i],
+                'routed':routed[i]
+            }
+        return results
+
+    def summarize(self, results:dict, quantiles:tuple=(0.05, 0.5, 0.95)) -> dict:
+        """Return the mean and quantiles of each result of run() for each side"""
+        summary = {'engagements':{'mean':float(results['engagements'].mean())}}
+        for side in self.sides:
+            summary[side] = {}
+            for key, values in results[side].items():
+                values = values.astype(np.float64)
+                summary[side][key] = {'mean':float(values.mean())}
+                for q, value in zip(quantiles, np.quantile(values, quantiles)):
+                    summary[side][key][q] = float(value)
+        return summary
@@ -0,0 +1,173 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import numpy as np
+
+from .formationtable import getFormationRows
+from .rng import getGenerator
+
+# A weighting is any callable taking the FORMATION_DTYPE rows of an army, in
+# marching order from van to rear, and returning one non-negative weight per
+# formation. Each casualty falls on a formation with probability in proportion
+# to its weight.
+
+
+def weightByWarriors(rows:np.ndarray) -> np.ndarray:
+    """Default weighting: every warrior is equally likely to be a casualty"""
+    return rows["warriorCount"].astype(np.float64)
+
+
+class ExposureWeighting:
+    """Weight formations by warriors, scaled by how exposed their type is
+
+    ***
+
+    Attributes:
+        cavalry:float
+        heavy:float
+    """
+    def __init__(self, cavalry:float=1.0, heavy:float=1.0):
+        self.cavalry = float(cavalry)
+        self.heavy = float(heavy)
+
+    def __repr__(self):
+        return "ExposureWeighting(cavalry={}, heavy={})".format(self.cavalry, self.heavy)
+
+    def __call__(self, rows:np.ndarray) -> np.ndarray:
+        exposure = np.where(rows["cavalry"], self.cavalry, 1.0) * np.where(rows["heavy"], self.heavy, 1.0)
+        return rows["warriorCount"] * exposure
+
+
+class RearguardWeighting:
+    """Weight formations by warriors, rising linearly from the van to bias times as much at the rear
+
+    Suited to casualties taken in a retreat, which fall hardest on the
+    formations covering it.
+
+    ***
+
+    Attributes:
+        bias:float
+    """
+    def __init__(self, bias:float=2.0):
+        self.bias = float(bias)
+
+    def __repr__(self):
+        return "RearguardWeighting(bias={})".format(self.bias)
+
+    def __call__(self, rows:np.ndarray) -> np.ndarray:
+        return rows["warriorCount"] * np.linspace(1.0, self.bias, len(rows))
+
+
+CASUALTY_WEIGHTINGS = {
+    "warriors":weightByWarriors,
+    "exposure":ExposureWeighting(cavalry=0.75, heavy=0.5),
+    "rearguard":RearguardWeighting()
+}
+
+
+def getWeighting(weighting=None):
+    """Return a weighting callable from a name in CASUALTY_WEIGHTINGS, a callable, or None for the default"""
+    if weighting is None:
+        return weightByWarriors
+    if callable(weighting):
+        return weighting
+    assert weighting in CASUALTY_WEIGHTINGS, "weighting must be callable or one of {}, got '{}'".format(list(CASUALTY_WEIGHTINGS.keys()), weighting)
+    return CASUALTY_WEIGHTINGS[weighting]
+
+
+def getArmyRows(army) -> np.ndarray:
+    """Return the FORMATION_DTYPE rows of an army's formations"""
+    if army.formationTable is not None:
+        return army.formationTable.rows
+    return getFormationRows(army.formations)
+
+
+def distributeCasualties(count:int, weights, rng:np.random.Generator=None) -> np.ndarray:
+    """Split count casualties among formations with one multinomial draw
+
+    Drawing each casualty's formation separately and counting them gives
+    the same distribution, at a cost in proportion to count.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    total = weights.sum()
+    if (count <= 0) or (total <= 0):
+        return np.zeros(len(weights), dtype=np.int64)
+    return getGenerator(rng).multinomial(int(count), weights/total).astype(np.int64)
+
+
+def distributeCasualtiesBatch(counts, weights:list, rng:np.random.Generator=None) -> list:
+    """Split casualties among the formations of many armies at once
+
+    ***
+
+    Parameters:
+        counts: casualties for each army
+        weights: for each army, an array of formation weights
+        rng: default None. Generator to draw from; None uses the global
+            np.random state
+
+    Returns:
+        list of arrays, the casualties of each formation of each army
+
+    Each army's split is multinomial, drawn as a chain of binomials: the
+    first formation's share of the army's casualties, then the next
+    formation's share of those left, and so on. Each link of the chain is
+    drawn for every army at once, so the number of draws grows with the
+    largest army rather than with the number of armies.
+    """
+    rng = getGenerator(rng)
+    counts = np.asarray(counts, dtype=np.int64)
+    assert len(counts)==len(weights), "got {} counts for {} armies".format(len(counts), len(weights))
+    widths = [len(w) for w in weights]
+    padded = np.zeros((len(weights), max(widths, default=0)))
+    for i, army_weights in enumerate(weights):
+        padded[i, :widths[i]] = army_weights
+    remaining_weight = np.cumsum(padded[:, ::-1], axis=1)[:, ::-1] # weight of this formation and all after it
+    probabilities = np.divide(padded, remaining_weight, out=np.zeros_like(padded), where=remaining_weight>0)
+    remaining = np.where(padded.sum(axis=1) > 0, np.maximum(counts, 0), 0)
+    drawn = np.zeros(padded.shape, dtype=np.int64)
+    for column in range(padded.shape[1]):
+        drawn[:, column] = rng.binomial(remaining, np.clip(probabilities[:, column], 0, 1))
+        remaining = remaining - drawn[:, column]
+    return [drawn[i, :widths[i]] for i in range(len(weights))]
+
+
+def getCasualtyCounts(armies:list, count=None, percent=None) -> np.ndarray:
+    """Return the casualties of each army, from counts or percentages of its warriors"""
+    assert (count is None) ^ (percent is None), "exactly one of count or percent must be set"
+    if count is not None:
+        return np.broadcast_to(np.asarray(count, dtype=np.int64), (len(armies),)).copy()
+    warriors = np.array([army.countInfantry() + army.countCavalry() for army in armies], dtype=np.int64)
+    percents = np.broadcast_to(np.asarray(percent, dtype=np.float64), (len(armies),))
+    return (warriors * (percents/100)).astype(np.int64)
+
+
+def applyCasualtiesBatch(armies:list, count=None, percent=None, weighting=None, rng:np.random.Generator=None) -> list:
+    """Apply casualties to many armies at once and return the casualties of each formation of each army
+
+    ***
+
+    Parameters:
+        armies: the Army objects to take casualties
+        count: casualties for every army, or one count per army. Exactly one
+            of count or percent must be set
+        percent: casualties as a percentage of every army's warriors, or one
+            percentage per army
+        weighting: default None. Name in CASUALTY_WEIGHTINGS or a weighting
+            callable; None weights by warriors
+        rng: default None. Generator to draw from; None uses the first
+            army's, or failing that the global np.random state
+    """
+    try:
+        counts = getCasualtyCounts(armies, count=count, percent=percent)
+    except AssertionError as e:
+        raise ValueError(e)
+    weighting = getWeighting(weighting)
+    if (rng is None) and armies:
+        rng = armies[0].rng
+    splits = distributeCasualtiesBatch(counts, [weighting(getArmyRows(army)) for army in armies], rng=rng)
+    for army, split in zip(armies, splits):
+        army.applyCasualtyCounts(split)
+    return splits
@@ -0,0 +1,141 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import numpy as np
+import pandas as pd
+
+from .messagelog import NO_LINK
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+EXPORT_FORMATS = [
+    "csv",
+    "parquet",
+    "npz"
+]
+
+
+def getDefaultFormat() -> str:
+    """Parquet if pyarrow is installed, else NPZ"""
+    return "npz" if pyarrow is None else "parquet"
+
+
+class ChronicleExporter:
+    """Stream message records to disk a chunk at a time
+
+    Each call to export() writes the records appended since the previous
+    call, so only one chunk is held in memory at once and an exporter can
+    be called repeatedly to tail a live game.
+
+    CSV output is a single file, appended to. Parquet and NPZ output are a
+    directory with one file per chunk, named by the first message id it
+    holds (Parquet) or the range of ids (NPZ), so a later exporter, e.g. from
+    another call to MessageHandler.exportChronicle, adds to what is there
+    instead of replacing it.
+
+    ***
+
+    Attributes:
+        path:str
+        format:str
+        chunkSize:int
+        nextID:int
+
+    Methods:
+        export() -> int
+        close() -> None
+    """
+    def __init__(self, path:str, format:str=None, chunkSize:int=4096, since:int=0):
+        self.path = str(path)
+        self.format = getDefaultFormat() if format is None else str(format).lower()
+        assert self.format in EXPORT_FORMATS, "export format must be one of {}, got '{}'".format(EXPORT_FORMATS, format)
+        if (self.format=="parquet") and (pyarrow is None):
+            raise ImportError("pyarrow is required for parquet export")
+        self.chunkSize = int(chunkSize)
+        self.nextID = int(since)
+
+    def __repr__(self):
+        return "<ChronicleExporter: {} from message {}>".format(self.path, self.nextID)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def export(self, records) -> int:
+        """Write records appended since the last export and return how many were written
+
+        ***
+
+        Parameters:
+            records: a MessageHandler, or its storage (e.g. MessageLog)
+        """
+        records = getattr(records, "records", records)
+        stop = len(records)
+        written = 0
+        for start in range(self.nextID, stop, self.chunkSize):
+            chunk = records.toDataFrame(start, min(start + self.chunkSize, stop))
+            self._writeChunk(chunk)
+            written += len(chunk)
+        self.nextID = max(self.nextID, stop)
+        return written
+
+    def _writeChunk(self, chunk:pd.DataFrame) -> None:
+        if self.format=="csv":
+            write_header = (not os.path.exists(self.path)) or (os.path.getsize(self.path)==0)
+            chunk.to_csv(self.path, mode="a", header=write_header, index_label="messageID")
+        elif self.format=="parquet":
+            os.makedirs(self.path, exist_ok=True)
+            table = pyarrow.Table.from_pandas(self._toPlainColumns(chunk), preserve_index=False)
+            file_name = "part-{:010d}.parquet".format(chunk.index[0])
+            pyarrow.parquet.write_table(table, os.path.join(self.path, file_name), compression="zstd")
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            columns = {column:values.to_numpy(dtype=(np.int64 if values.dtype.kind=="i" else str)) for column, values in self._toPlainColumns(chunk).items()}
+            file_name = "messages_{:010d}_{:010d}.npz".format(chunk.index[0], chunk.index[-1] + 1)
+            np.savez_compressed(os.path.join(self.path, file_name), **columns)
+
+    def _toPlainColumns(self, chunk:pd.DataFrame) -> pd.DataFrame:
+        """Return chunk with plain string and integer columns, so every chunk shares one schema"""
+        plain = pd.DataFrame({"messageID":chunk.index.to_numpy(dtype=np.int64)})
+        for column in chunk.columns:
+            values = chunk[column]
+            if column=="link":
+                plain[column] = values.fillna(NO_LINK).to_numpy(dtype=np.int64)
+            elif column in ["messageType", "creationLocation", "text"]:
+                plain[column] = values.astype(object).fillna("").astype(str).to_numpy()
+            else:
+                plain[column] = values.to_numpy(dtype=np.int64)
+        return plain
+
+    def close(self) -> None:
+        """Kept for use as a context manager; every chunk is complete once written"""
+        pass
+
+
+def readParquetChronicle(path:str) -> pd.DataFrame:
+    """Load a directory written by ChronicleExporter in Parquet format, indexed by message id"""
+    if pyarrow is None:
+        raise ImportError("pyarrow is required for parquet import")
+    frames = [pyarrow.parquet.read_table(os.path.join(path, file_name)).to_pandas() for file_name in sorted(os.listdir(path)) if file_name.endswith(".parquet")]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).set_index("messageID")
+
+
+def readNPZChronicle(path:str) -> pd.DataFrame:
+    """Load a directory written by ChronicleExporter in NPZ format, indexed by message id"""
+    frames = []
+    for file_name in sorted(os.listdir(path)):
+        if file_name.endswith(".npz"):
+            with np.load(os.path.join(path, file_name)) as data:
+                frames.append(pd.DataFrame({key:data[key] for key in data.files}))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).set_index("messageID")
@@ -6,7 +6,8 @@ import numpy as np
 
 from .warrior import Warrior
 from .culture import Culture
-from .dice import rollD6, rollD20
+from .dice import rollDice
+from .rng import getGenerator
 
 COMMANDER_TRAITS = [
     "Beloved",
@@ -45,6 +46,7 @@ class Commander(Warrior):
         commanderTraits:list
         
     Methods:
+        clone() -> Commander
         
     """
     def __init__(self, name:str, age:int, title:str, pedigree:str=None, culture:Culture=None, commanderTraits:list=None, id:int=None):
@@ -61,7 +63,14 @@ class Commander(Warrior):
         #     repr_string += ", {}".format(self.pedigree)
         return repr_string
     
-    def getRelationship(self, isFemale:bool=False, maxIndex:int=None) -> tuple:
+    def clone(self) -> "Commander":
+        """Return a copy of this commander sharing its Culture"""
+        new_commander = self.__class__.__new__(self.__class__)
+        new_commander.__dict__.update(self.__dict__)
+        new_commander.commanderTraits = list(self.commanderTraits)
+        return new_commander
+
+    def getRelationship(self, isFemale:bool=False, maxIndex:int=None, rng:np.random.Generator=None) -> tuple:
         """Returns tuple of relationship string and age integer
 
         ***
@@ -70,53 +79,67 @@ class Commander(Warrior):
             isFemale: whether to choose female relationship terms (e.g 
                 'niece' instead of 'nephew'). Default False
             maxIndex: upper bound on random table
+            rng: default None. Generator to roll with; None uses the
+                global np.random state
         """
-        relationship_results = [
-            ("Daughter" if isFemale else "Son", 14+rollD6(3, sum=True)),
-            ("Sister" if isFemale else "Son", 20+rollD20(2, sum=True)),
-            ("Mother" if isFemale else "Father", 30+rollD20(3, sum=True)),
-            ("Niece" if isFemale else "Nephew", 16+rollD20(1, sum=True)),
-            ("Aunt" if isFemale else "Uncle", 30+rollD20(3, sum=True)),
-            ("Cousin", 20+rollD20(2, sum=True)),
+        relationship_table = [ # relationship and dice expression for age
+            ("Daughter" if isFemale else "Son", "3d6+14"),
+            ("Sister" if isFemale else "Son", "2d20+20"),
+            ("Mother" if isFemale else "Father", "3d20+30"),
+            ("Niece" if isFemale else "Nephew", "1d20+16"),
+            ("Aunt" if isFemale else "Uncle", "3d20+30"),
+            ("Cousin", "2d20+20"),
             None,
             None,
-            ("Spouse", 20+rollD20(2, sum=True)),
-            ("Friend", 20+rollD20(2, sum=True)),
-            ("Rival", 20+rollD20(2, sum=True)),
-            ("Student", 16+rollD20(1, sum=True)),
-            ("Teacher", 30+rollD20(3, sum=True)),
-            ("Confessor", 20+rollD20(3, sum=True)),
-            ("Advisor", 20+rollD20(3, sum=True)),
-            ("Bodyguard", 20+rollD20(1, sum=True)),
-            ("Quartermaster", 20+rollD20(2, sum=True)),
-            ("Creditor", 20+rollD20(2, sum=True)),
-            ("Favorite", 16+rollD20(2, sum=True)),
-            ("Ally", 14+rollD20(3, sum=True))
+            ("Spouse", "2d20+20"),
+            ("Friend", "2d20+20"),
+            ("Rival", "2d20+20"),
+            ("Student", "1d20+16"),
+            ("Teacher", "3d20+30"),
+            ("Confessor", "3d20+20"),
+            ("Advisor", "3d20+20"),
+            ("Bodyguard", "1d20+20"),
+            ("Quartermaster", "2d20+20"),
+            ("Creditor", "2d20+20"),
+            ("Favorite", "2d20+16"),
+            ("Ally", "3d20+14")
         ]
         if maxIndex is None:
-            maxIndex = len(relationship_results)
-        max_index = min(maxIndex, len(relationship_results))
-        index_choice = np.random.choice([i for i in range(max_index)])
+            maxIndex = len(relationship_table)
+        max_index = min(maxIndex, len(relationship_table))
+        index_choice = getGenerator(rng).choice([i for i in range(max_index)])
         # log.debug(index_choice)
         if index_choice==6:
-            return tuple([t[0]+t[1] for t in zip(("Step-", 0), self.getRelationship(isFemale=isFemale, maxIndex=5))])
+            return tuple([t[0]+t[1] for t in zip(("Step-", 0), self.getRelationship(isFemale=isFemale, maxIndex=5, rng=rng))])
         elif index_choice==7:
-            return tuple([t[1]+t[0] for t in zip(("-in-Law", 0), self.getRelationship(isFemale=isFemale, maxIndex=5))])
+            return tuple([t[1]+t[0] for t in zip(("-in-Law", 0), self.getRelationship(isFemale=isFemale, maxIndex=5, rng=rng))])
         else:
-            return relationship_results[index_choice]
+            relationship, age = relationship_table[index_choice]
+            return relationship, rollDice(age, rng=rng)
         
-    def getSubordinate(self, culture:Culture=None) -> "Commander":
+    def getSubordinate(self, culture:Culture=None, rng:np.random.Generator=None, namesUsed:set=None) -> "Commander":
+        """Return a new commander serving under this one
+
+        ***
+
+        Parameters:
+            culture: default None, for this commander's culture
+            rng: default None. Generator to roll with; None uses the
+                global np.random state
+            namesUsed: default None. Set of names already used in the
+                game, passed to Culture.generateName()
+        """
         if culture is None:
             culture = self.culture
-        relationship, age = self.getRelationship()
+        relationship, age = self.getRelationship(rng=rng)
         rank_self = culture.getTitleRank(self.title)
         rank_min = max(1, rank_self)
         rank_max = min(len(culture.titles), rank_min+2)
-        title = culture.generateTitle(minRank=rank_min, maxRank=rank_max)
-        name = culture.generateName()
+        title = culture.generateTitle(minRank=rank_min, maxRank=rank_max, rng=rng)
+        name = culture.generateName(rng=rng, namesUsed=namesUsed)
         pedigree = "{} of {} {}".format(relationship, self.title, self.name)
         n_commander_traits = min(max(0, age-10)//10, len(COMMANDER_TRAITS))
-        commander_traits = [str(trait) for trait in np.random.choice(COMMANDER_TRAITS, size=n_commander_traits, replace=False)]
+        commander_traits = [str(trait) for trait in getGenerator(rng).choice(COMMANDER_TRAITS, size=n_commander_traits, replace=False)]
         subordinate_commander = Commander(name=name, age=age, title=title, pedigree=pedigree, culture=culture, commanderTraits=commander_traits)
         return subordinate_commander
         
\ No newline at end of file
@@ -0,0 +1,99 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import numbers
+import pandas as pd
+
+
+class CorrespondentRegistry:
+    """Senders and recipients of letters, indexed by their unique IDs
+
+    IDs are assigned consecutively from 0, so names and recipient flags are
+    kept in plain lists indexed by ID. DataFrame views are built only when
+    asked for and cached until the next addition.
+
+    ***
+
+    Attributes:
+        names:list
+        validRecipients:list
+
+    Methods:
+        add() -> int
+        getName() -> str
+        isValidRecipient() -> bool
+        getRecipientIDs() -> list
+        getRecipients() -> pandas.DataFrame
+        toDataFrame() -> pandas.DataFrame
+        clone() -> CorrespondentRegistry
+    """
+    def __init__(self):
+        self.names = []
+        self.validRecipients = []
+        self._recipientIDs = []
+        self._frame = None
+        self._recipientFrame = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, correspondentID):
+        return isinstance(correspondentID, numbers.Integral) and (0 <= correspondentID < len(self.names))
+
+    def __repr__(self):
+        return "<CorrespondentRegistry: {} correspondents, {} recipients>".format(len(self.names), len(self._recipientIDs))
+
+    def clone(self) -> "CorrespondentRegistry":
+        new_registry = self.__class__()
+        new_registry.names = list(self.names)
+        new_registry.validRecipients = list(self.validRecipients)
+        new_registry._recipientIDs = list(self._recipientIDs)
+        return new_registry
+
+    def add(self, name:str, validRecipient:bool=True) -> int:
+        """Register a correspondent and return its new ID"""
+        new_id = len(self.names)
+        self.names.append(str(name))
+        self.validRecipients.append(bool(validRecipient))
+        if validRecipient:
+            self._recipientIDs.append(new_id)
+            self._recipientFrame = None
+        self._frame = None
+        return new_id
+
+    def getName(self, correspondentID:int) -> str:
+        if correspondentID not in self:
+            raise KeyError("correspondent with ID={} not found".format(correspondentID))
+        return self.names[int(correspondentID)]
+
+    def isValidRecipient(self, correspondentID:int) -> bool:
+        if correspondentID not in self:
+            raise KeyError("correspondent with ID={} not found".format(correspondentID))
+        return self.validRecipients[int(correspondentID)]
+
+    def getRecipientIDs(self) -> list:
+        """Return IDs of correspondents able to receive letters"""
+        return list(self._recipientIDs)
+
+    def _buildFrame(self, ids:list) -> pd.DataFrame:
+        return pd.DataFrame(
+            {
+                "ID":ids,
+                "name":[self.names[i] for i in ids],
+                "validRecipient":[self.validRecipients[i] for i in ids]
+            },
+            index=ids
+        )
+
+    def getRecipients(self) -> pd.DataFrame:
+        """Return DataFrame of correspondents for which validRecipient is True"""
+        if self._recipientFrame is None:
+            self._recipientFrame = self._buildFrame(self._recipientIDs)
+        return self._recipientFrame
+
+    def toDataFrame(self) -> pd.DataFrame:
+        """Return DataFrame of all correspondents, with columns ID, name, and validRecipient"""
+        if self._frame is None:
+            self._frame = self._buildFrame(list(range(len(self.names))))
+        return self._frame
@@ -4,6 +4,8 @@ log = logging.getLogger(__name__)
 
 import numpy as np
 
+from .rng import getGenerator
+
 # Allakian, Delisgrene, Boonan, Dinn, Islish
 
 
@@ -15,6 +17,7 @@ class Culture:
     Attributes:
         cultureName:str
         names:list
+        namesUsed:list: names used outside any game, see generateName()
         titles:list
         
     Methods:
@@ -28,21 +31,41 @@ class Culture:
         self.namesUsed = [False for name in self.names]
         self.titles = titles or []
 
-    def generateName(self, unusedOnly:bool=True, updateUsed:bool=True) -> str:
+    def generateName(self, unusedOnly:bool=True, updateUsed:bool=True, rng:np.random.Generator=None, namesUsed:set=None) -> str:
+        """Return a name of this culture
+
+        ***
+
+        Parameters:
+            unusedOnly: default True, to avoid names already used
+            updateUsed: default True, to mark the chosen name as used
+            rng: default None. Generator to choose with; None uses the
+                global np.random state
+            namesUsed: default None, to track used names on this culture,
+                which is shared by every game. Otherwise the set of names
+                already used in one game, updated in place
+        """
+        if namesUsed is None:
+            is_used = self.namesUsed
+        else:
+            is_used = [name in namesUsed for name in self.names]
         name_indices = []
         for i in range(len(self.names)):
-            if (not self.namesUsed[i]) or (not unusedOnly):
+            if (not is_used[i]) or (not unusedOnly):
                 name_indices.append(i)
         if len(name_indices)<1:
             log.warning("all {} names used, reusing".format(self.cultureName))
-            return self.generateName(unusedOnly=False)
-        chosen_index = np.random.choice(name_indices) 
+            return self.generateName(unusedOnly=False, updateUsed=updateUsed, rng=rng, namesUsed=namesUsed)
+        chosen_index = getGenerator(rng).choice(name_indices) 
         chosen_name = self.names[chosen_index]
         if updateUsed:
-            self.namesUsed[chosen_index] = True 
+            if namesUsed is None:
+                self.namesUsed[chosen_index] = True
+            else:
+                namesUsed.add(chosen_name)
         return chosen_name
 
-    def generateTitle(self, minRank:int=None, maxRank:int=None) -> str:
+    def generateTitle(self, minRank:int=None, maxRank:int=None, rng:np.random.Generator=None) -> str:
         assert len(self.titles) > 0, "no titles from which to generate"
         if minRank:
             assert minRank > 0, "rank must be greater than 0"
@@ -56,7 +79,7 @@ class Culture:
             maxRank=len(self.titles)
         assert minRank <= maxRank, "minRank cannot be greater than maxRank: {}>{}".format(minRank, maxRank)
         rank_choices = [r for r in range(minRank, maxRank+1)]
-        chosen_rank = np.random.choice(rank_choices)
+        chosen_rank = getGenerator(rng).choice(rank_choices)
         return self.titles[chosen_rank]
        
     def getTitleRank(self, title:str) -> int:
@@ -2,8 +2,6 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
-import datetime
-
 
 class DecisionPoint:
     """Signals need for player input
@@ -63,18 +61,20 @@ class CrossroadsReached(DecisionPoint):
         
 
 class DayBreaks(DecisionPoint):
-    def __init__(self, date:datetime.datetime, **kwargs):
-        super().__init__(trigger="DayBreaks", date=date, **kwargs)
+    def __init__(self, tick:int, **kwargs):
+        super().__init__(trigger="DayBreaks", tick=tick, **kwargs)
 
 
 
 class LetterRecieved(DecisionPoint):
-    pass
+    def __init__(self, messageID:int, **kwargs):
+        kwargs['messageID'] = messageID
+        super().__init__(trigger="LetterRecieved", **kwargs)
 
 
 class NightFalls(DecisionPoint):
-    def __init__(self, date:datetime.datetime, **kwargs):
-        super().__init__(trigger="NightFalls", date=date, **kwargs)
+    def __init__(self, tick:int, **kwargs):
+        super().__init__(trigger="NightFalls", tick=tick, **kwargs)
 
 
 class NodeOccupied(DecisionPoint):
@@ -85,7 +85,9 @@ class NodeOccupied(DecisionPoint):
 
 
 class RumorRecieved(DecisionPoint):
-    pass
+    def __init__(self, messageID:int, **kwargs):
+        kwargs['messageID'] = messageID
+        super().__init__(trigger="RumorRecieved", **kwargs)
     
 
 class StrongholdConquered(DecisionPoint):
@@ -2,23 +2,132 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
+import re
+import functools
 import numpy as np
 from typing import Union
 
-def rollD6(n:int=1, sum:bool=True) -> Union[int, tuple]:
-    rolls = []
-    for i in range(n):
-        rolls.append(np.random.randint(1, 7))
+from .rng import getGenerator
+
+# A dice expression is a sum of terms such as "2d6", "3d20+14" or "2d6-2d6":
+# NdS rolls N dice of S sides (N defaults to 1), and a bare number is added
+# as is. Terms are joined by + or -.
+DICE_TERM_PATTERN = re.compile(r"([+-]?)\s*(?:(\d*)[dD](\d+)|(\d+))\s*")
+
+
+@functools.lru_cache(maxsize=None)
+def parseDice(expression:str) -> tuple:
+    """Return the terms of a dice expression
+
+    ***
+
+    Returns:
+        tuple of (sign, count, sides) for each dice term, and the total of
+        the constant terms
+    """
+    terms = []
+    constant = 0
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = DICE_TERM_PATTERN.match(expression, position)
+        if (match is None) or ((position > 0) and not match.group(1)):
+            raise ValueError("invalid dice expression '{}'".format(expression))
+        sign = -1 if match.group(1)=="-" else 1
+        if match.group(4) is not None:
+            constant += sign*int(match.group(4))
+        else:
+            count = int(match.group(2) or 1)
+            sides = int(match.group(3))
+            if sides < 1:
+                raise ValueError("dice must have at least one side, got '{}'".format(expression))
+            terms.append((sign, count, sides))
+        position = match.end()
+    if not (terms or position):
+        raise ValueError("invalid dice expression '{}'".format(expression))
+    return tuple(terms), constant
+
+
+def rollDiceFaces(count:int, sides:int, size=None, rng:np.random.Generator=None) -> np.ndarray:
+    """Return the faces of count dice of the given sides, in an array of shape size + (count,)"""
+    size = () if size is None else np.atleast_1d(size).tolist()
+    return getGenerator(rng).integers(1, sides+1, size=tuple(size)+(count,))
+
+
+def rollDice(expression:str, size=None, rng:np.random.Generator=None) -> Union[int, np.ndarray]:
+    """Roll a dice expression, once or for many independent pools
+
+    ***
+
+    Parameters:
+        expression: e.g. "2d6" or "3d20+14"
+        size: default None, to roll once and return an int. Otherwise an
+            int or tuple, the shape of the array of totals to return
+        rng: default None. Generator to roll with; None uses the global
+            np.random state
+
+    Each term is rolled for every pool with a single draw.
+    """
+    terms, constant = parseDice(expression)
+    rng = getGenerator(rng)
+    if size is None:
+        return constant + sum(sign*int(rng.integers(1, sides+1, size=count).sum()) for sign, count, sides in terms)
+    totals = np.full(size, constant, dtype=np.int64)
+    for sign, count, sides in terms:
+        totals += sign*rollDiceFaces(count, sides, size=size, rng=rng).sum(axis=-1)
+    return totals
+
+
+@functools.lru_cache(maxsize=None)
+def _getDistribution(expression:str) -> tuple:
+    terms, constant = parseDice(expression)
+    minimum = constant
+    probabilities = np.ones(1)
+    for sign, count, sides in terms:
+        face = np.full(sides, 1/sides)
+        for _ in range(count):
+            probabilities = np.convolve(probabilities, face)
+        minimum += count if sign > 0 else -count*sides
+    values = np.arange(minimum, minimum+len(probabilities))
+    values.setflags(write=False)
+    probabilities.setflags(write=False)
+    return values, probabilities
+
+
+def getDistribution(expression:str) -> tuple:
+    """Return the exact distribution of a dice expression
+
+    ***
+
+    Returns:
+        (values, probabilities): read-only arrays of every possible total,
+        in ascending order, and the probability of each
+    """
+    return _getDistribution(expression.strip())
+
+
+def getProbabilityAbove(expression:str, target) -> Union[float, np.ndarray]:
+    """Return the exact probability that a roll of expression exceeds target, or of each of an array of targets"""
+    values, probabilities = getDistribution(expression)
+    # probability of rolling values[i] or more
+    at_least = np.append(np.cumsum(probabilities[::-1])[::-1], 0.0)
+    index = np.searchsorted(values, np.asarray(target), side="right")
+    result = at_least[index]
+    if np.ndim(result)==0:
+        return float(result)
+    return result
+
+
+def rollD6(n:int=1, sum:bool=True, rng:np.random.Generator=None) -> Union[int, tuple]:
+    rolls = rollDiceFaces(n, 6, rng=rng)
     if sum:
-        return int(np.array(rolls).sum())
+        return int(rolls.sum())
     else:
         return tuple([int(r) for r in rolls])
-    
-def rollD20(n:int=1, sum:bool=True) -> Union[int, tuple]:
-    rolls = []
-    for i in range(n):
-        rolls.append(np.random.randint(1, 21))
+
+def rollD20(n:int=1, sum:bool=True, rng:np.random.Generator=None) -> Union[int, tuple]:
+    rolls = rollDiceFaces(n, 20, rng=rng)
     if sum:
-        return int(np.array(rolls).sum())
+        return int(rolls.sum())
     else:
-        return tuple([int(r) for r in rolls])
\ No newline at end of file
+        return tuple([int(r) for r in rolls])
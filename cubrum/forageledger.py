@@ -0,0 +1,94 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import numpy as np
+
+FORAGE_YIELD_PER_LEAGUE = 2000 # supply available along a fully grown league of road
+FORAGE_REGROWTH_HOURS = 24*30 # hours for a stripped road to grow back in full
+NEVER_FORAGED = -1
+
+
+class ForageLedger:
+    """Supply that can be foraged along each road, indexed by edge id
+
+    Each road stores the yield left after it was last foraged and the tick
+    at which that happened. Regrowth since then is linear and computed only
+    when the road is queried, so a query costs the same however long ago
+    the road was foraged; settle() applies it to every road at once.
+
+    ***
+
+    Attributes:
+        maxYield:numpy.ndarray
+        remaining:numpy.ndarray
+        lastForaged:numpy.ndarray
+        regrowthHours:int
+
+    Methods:
+        fromDistances() -> ForageLedger
+        clone() -> ForageLedger
+        getAvailable() -> float
+        getAvailableAll() -> numpy.ndarray
+        forage() -> float
+        settle() -> None
+    """
+    @staticmethod
+    def fromDistances(distances, yieldPerLeague:float=FORAGE_YIELD_PER_LEAGUE, regrowthHours:int=FORAGE_REGROWTH_HOURS) -> "ForageLedger":
+        """Build a ledger of fully grown roads from road lengths in leagues, in edge id order"""
+        return ForageLedger(np.asarray(distances, dtype=np.float64) * yieldPerLeague, regrowthHours=regrowthHours)
+
+    def __init__(self, maxYield, regrowthHours:int=FORAGE_REGROWTH_HOURS):
+        self.maxYield = np.asarray(maxYield, dtype=np.float64)
+        self.remaining = self.maxYield.copy()
+        self.lastForaged = np.full(len(self.maxYield), NEVER_FORAGED, dtype=np.int64)
+        self.regrowthHours = int(regrowthHours)
+
+    def __len__(self):
+        return len(self.maxYield)
+
+    def __repr__(self):
+        return "<ForageLedger: {} roads, {} foraged>".format(len(self), int((self.lastForaged!=NEVER_FORAGED).sum()))
+
+    def clone(self) -> "ForageLedger":
+        new_ledger = self.__class__.__new__(self.__class__)
+        new_ledger.maxYield = self.maxYield # never changes after construction
+        new_ledger.remaining = self.remaining.copy()
+        new_ledger.lastForaged = self.lastForaged.copy()
+        new_ledger.regrowthHours = self.regrowthHours
+        return new_ledger
+
+    def getAvailable(self, edgeID:int, tick:int) -> float:
+        """Return the supply that could be foraged from a road at tick"""
+        last_foraged = self.lastForaged[edgeID]
+        if last_foraged==NEVER_FORAGED:
+            return float(self.remaining[edgeID])
+        max_yield = self.maxYield[edgeID]
+        regrown = max_yield * max(int(tick) - last_foraged, 0) / self.regrowthHours
+        return float(min(self.remaining[edgeID] + regrown, max_yield))
+
+    def getAvailableAll(self, tick:int) -> np.ndarray:
+        """Return the supply that could be foraged from every road at tick"""
+        elapsed = np.maximum(int(tick) - self.lastForaged, 0)
+        regrown = np.where(self.lastForaged==NEVER_FORAGED, 0, self.maxYield * elapsed / self.regrowthHours)
+        return np.minimum(self.remaining + regrown, self.maxYield)
+
+    def forage(self, edgeID:int, tick:int, amount:float=None) -> float:
+        """Take up to amount of supply (default: all available) from a road at tick and return how much was taken
+
+        Players' clocks run apart, so tick may be earlier than the road's
+        last forage. Such a forage takes from what that one left, and the
+        road keeps regrowing from the later tick.
+        """
+        available = self.getAvailable(edgeID, tick) # no regrowth counted before lastForaged
+        taken = available if amount is None else min(float(amount), available)
+        self.remaining[edgeID] = available - taken
+        self.lastForaged[edgeID] = max(int(self.lastForaged[edgeID]), int(tick))
+        return taken
+
+    def settle(self, tick:int) -> None:
+        """Apply regrowth up to tick to every road in one pass"""
+        foraged = self.lastForaged!=NEVER_FORAGED
+        self.remaining = self.getAvailableAll(tick)
+        self.lastForaged[foraged] = np.maximum(self.lastForaged[foraged], int(tick))
+        self.lastForaged[self.remaining >= self.maxYield] = NEVER_FORAGED
@@ -2,6 +2,17 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
+TABLE_FIELDS = [ # fields stored in an army's FormationTable
+    "warriorCount",
+    "wagonCount",
+    "cavalry",
+    "heavy"
+]
+
+AGGREGATE_FIELDS = TABLE_FIELDS + [ # fields that army-level totals depend on
+    "special"
+]
+
 class Formation:
     """An indivisible military unit
     
@@ -21,8 +32,15 @@ class Formation:
         getSupplyCapacity() -> int
         getSupplyConsumption() -> int
         applyCasualties() -> int
-        
+        clone() -> Formation
+
+    A formation belonging to an Army bumps that army's version whenever
+    one of AGGREGATE_FIELDS changes, so the army knows to recompute its
+    cached totals. If the army keeps a FormationTable, the formation is a
+    view of its row there and TABLE_FIELDS are stored in the table.
     """
+    _army = None
+    _table = None
     def __init__(self, name:str, warriorCount:int, wagonCount:int, cavalry:bool=False, heavy:bool=False, special:str=None):
         self.name = name
         self.warriorCount = int(warriorCount)
@@ -31,6 +49,30 @@ class Formation:
         self.heavy=bool(heavy)
         self.special=special
         
+    def __getattr__(self, name):
+        table = self.__dict__.get("_table")
+        if (table is not None) and (name in TABLE_FIELDS):
+            return table.getValue(self._row, name)
+        raise AttributeError("'{}' object has no attribute '{}'".format(self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        if (name in TABLE_FIELDS) and (self._table is not None):
+            self._table.setValue(self._row, name, value)
+        else:
+            super().__setattr__(name, value)
+        if (name in AGGREGATE_FIELDS) and (self._army is not None):
+            self._army.version += 1
+
+    def clone(self) -> "Formation":
+        """Return a copy of this formation, not attached to any army or table"""
+        new_formation = self.__class__.__new__(self.__class__)
+        new_formation.__dict__.update(self.__dict__)
+        for name in ["_army", "_table", "_row"]:
+            new_formation.__dict__.pop(name, None)
+        for name in TABLE_FIELDS:
+            new_formation.__dict__[name] = getattr(self, name)
+        return new_formation
+
     def getDescription(self) -> str:
         """Nicely format unit type (e.g. 'heavy infantry') as a string"""
         weight = "heavy" if self.heavy else "light"
@@ -111,12 +153,14 @@ class Formation:
     def applyCasualties(self, count:int=None, percent:int=None) -> None:
         try:
             assert (count is None) ^ (percent is None), "exactly one of count or percent must be set"
-            count = count or int((percent/100) * self.warriorCount)
-            percent = percent or (count/self.warriorCount)
+            if count is None:
+                count = int((percent/100) * self.warriorCount)
             if count >= self.warriorCount:
                 self.warriorCount = 0
                 self.wagonCount = 0
                 return 0
+            if percent is None:
+                percent = count/self.warriorCount
             self.warriorCount -= count 
             self.wagonCount -= int(self.wagonCount*(percent/100))
             return self.warriorCount
@@ -0,0 +1,126 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import numpy as np
+
+FORMATION_DTYPE = np.dtype([
+    ("warriorCount", np.int64),
+    ("wagonCount", np.int64),
+    ("cavalry", bool),
+    ("heavy", bool)
+])
+
+
+def getFormationRows(formations:list) -> np.ndarray:
+    """Return a structured array of FORMATION_DTYPE with one row per formation, without binding them to it"""
+    rows = np.zeros(len(formations), dtype=FORMATION_DTYPE)
+    for row, formation in enumerate(formations):
+        for field in FORMATION_DTYPE.names:
+            rows[field][row] = getattr(formation, field)
+    return rows
+
+
+class FormationTable:
+    """Troop counts and types of an army's formations, one row per formation
+
+    The Formation objects stay in use as views of their rows: while bound
+    to a table, their warriorCount, wagonCount, cavalry and heavy fields are
+    read from and written to it. Army-level totals are then sums over whole
+    columns rather than loops over formations. The rules are those of the
+    per-formation methods in cubrum.formation.
+
+    ***
+
+    Attributes:
+        formations:list
+        rows:numpy.ndarray
+
+    Methods:
+        release() -> None
+        getValue() -> object
+        setValue() -> None
+        getStrength() -> numpy.ndarray
+        getTravelDistance() -> numpy.ndarray
+        getLength() -> numpy.ndarray
+        getSupplyCapacity() -> numpy.ndarray
+        getSupplyConsumption() -> numpy.ndarray
+        applyCasualties() -> numpy.ndarray
+    """
+    def __init__(self, formations:list):
+        self.formations = list(formations)
+        self.rows = np.zeros(len(self.formations), dtype=FORMATION_DTYPE)
+        for row, formation in enumerate(self.formations):
+            for field in FORMATION_DTYPE.names:
+                self.rows[field][row] = getattr(formation, field)
+                formation.__dict__.pop(field, None)
+            formation.__dict__["_table"] = self
+            formation.__dict__["_row"] = row
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __repr__(self):
+        return "<FormationTable: {} formations, {} warriors>".format(len(self.rows), int(self.rows["warriorCount"].sum()))
+
+    def release(self) -> None:
+        """Copy each row back into its Formation and unbind them from the table"""
+        for row, formation in enumerate(self.formations):
+            if formation.__dict__.get("_table") is not self:
+                continue
+            for field in FORMATION_DTYPE.names:
+                formation.__dict__[field] = self.getValue(row, field)
+            del formation.__dict__["_table"]
+            del formation.__dict__["_row"]
+        self.formations = []
+
+    def getValue(self, row:int, field:str):
+        value = self.rows[field][row]
+        return bool(value) if FORMATION_DTYPE[field]==np.dtype(bool) else int(value)
+
+    def setValue(self, row:int, field:str, value) -> None:
+        self.rows[field][row] = value
+
+    def getStrength(self, setting:str) -> np.ndarray:
+        """Return the effective strength of each formation in a given setting"""
+        assert setting in ["FIELD", "SIEGEATTACK", "SIEGEDEFEND"], "'setting' must be one of FIELD, SIEGEATTACK, or SIEGEDEFEND, got '{}'".format(setting)
+        warriors = self.rows["warriorCount"]
+        if setting!="FIELD":
+            return warriors.copy()
+        # doubled for cavalry, doubled again for heavy
+        return warriors << (self.rows["cavalry"].astype(np.int64) + self.rows["heavy"])
+
+    def getTravelDistance(self, hours:int=1, forced:bool=False) -> np.ndarray:
+        """Return the distance each formation travels in a fixed number of hours"""
+        if forced:
+            leagues_per_hour = np.where(self.rows["cavalry"], 2, 1)
+        else:
+            leagues_per_hour = np.full(len(self.rows), 0.5)
+        return np.round(hours * leagues_per_hour, 2)
+
+    def getLength(self) -> np.ndarray:
+        """Return the length in leagues of each formation on the march"""
+        warrior_length_miles = self.rows["warriorCount"] / np.where(self.rows["cavalry"], 2000, 5000)
+        wagon_length_miles = self.rows["wagonCount"] / 50
+        return np.round((warrior_length_miles + wagon_length_miles) / 3, 2)
+
+    def getSupplyCapacity(self) -> np.ndarray:
+        """Return how much supply each formation can transport"""
+        return self.rows["warriorCount"] * np.where(self.rows["cavalry"], 75, 15) + self.rows["wagonCount"] * 1000
+
+    def getSupplyConsumption(self, days:int=1) -> np.ndarray:
+        """Return the consumption of supply of each formation over a number of days"""
+        return (self.rows["warriorCount"] * np.where(self.rows["cavalry"], 10, 1) + self.rows["wagonCount"] * 10) * days
+
+    def applyCasualties(self, counts) -> np.ndarray:
+        """Remove counts[i] warriors from formation i, with a matching share of its wagons, and return warriors remaining"""
+        counts = np.asarray(counts, dtype=np.int64)
+        warriors = self.rows["warriorCount"]
+        wagons = self.rows["wagonCount"]
+        destroyed = counts >= warriors
+        # same wagon losses as Formation.applyCasualties
+        share = np.divide(counts, warriors, out=np.zeros(len(warriors)), where=warriors>0)
+        wagons -= (wagons * (share/100)).astype(np.int64)
+        warriors -= np.minimum(counts, warriors)
+        wagons[destroyed] = 0
+        return warriors.copy()
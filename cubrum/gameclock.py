@@ -2,90 +2,197 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
-import datetime
+import datetime, heapq
+from typing import Union
 
 from .decisionpoint import DecisionPoint, DayBreaks, NightFalls
+from .scheduler import Scheduler
 
 SUNRISE = 5
 SUNSET = 21
+HOURS_PER_DAY = 24
+
+
+def getEpoch(startTime:datetime.datetime) -> datetime.datetime:
+    """Return midnight at the start of startTime's day, the zero tick of a scenario"""
+    return datetime.datetime.combine(startTime.date(), datetime.time())
+
+def toTick(time:Union[int, datetime.datetime], epoch:datetime.datetime) -> int:
+    """Convert a datetime to whole hours since epoch; integers pass through"""
+    if isinstance(time, datetime.datetime):
+        return int((time - epoch) // datetime.timedelta(hours=1))
+    return int(time)
+
+def toDatetime(tick:int, epoch:datetime.datetime) -> datetime.datetime:
+    """Convert whole hours since epoch to a datetime for display"""
+    return epoch + datetime.timedelta(hours=int(tick))
+
+def getHourOfDay(tick:int) -> int:
+    return tick % HOURS_PER_DAY
+
+def countCrossings(startTick:int, endTick:int, hour:int) -> int:
+    """Count ticks in (startTick, endTick] that fall on a given hour of the day"""
+    return ((endTick - hour) // HOURS_PER_DAY) - ((startTick - hour) // HOURS_PER_DAY)
+
+def getDaylightChange(startTick:int, endTick:int) -> str:
+    """Returns 'DayBreaks' or 'NightFalls' for the last dawn or dusk in (startTick, endTick], else None"""
+    crossed_dawn = countCrossings(startTick, endTick, SUNRISE) > 0
+    crossed_dusk = countCrossings(startTick, endTick, SUNSET) > 0
+    if crossed_dawn and crossed_dusk:
+        return "DayBreaks" if SUNRISE <= getHourOfDay(endTick) < SUNSET else "NightFalls"
+    if crossed_dawn:
+        return "DayBreaks"
+    if crossed_dusk:
+        return "NightFalls"
+    return None
+
 
 class GameClock:
     """Track in-game passage of time and turn order
+
+    Times are held internally as integer ticks, whole hours since the
+    scenario epoch (midnight of the starting day), and converted to
+    datetime objects only for display.
     
     ***
     
     Attributes:
-        # masterTime:datetime.datetime 
-        # playerTimes:dict
+        epoch:datetime.datetime
+        gameTick:int
+        masterTick:int
+        playerTicks:dict
         gameTime:datetime.datetime
+        masterTime:datetime.datetime
+        scheduler:cubrum.scheduler.Scheduler
         
     Methods:
-        # updateMasterTime()
-        # getActivePlayer() -> int
-        # incrementPlayerTime() -> None
-        incrementGameTime() -> None
+        toTick() -> int
+        toDatetime() -> datetime.datetime
+        addPlayer() -> None
+        updateMasterTime() -> None
+        getActivePlayer() -> int
+        getPlayerTick() -> int
+        getPlayerTime() -> datetime.datetime
+        incrementPlayerTime() -> DecisionPoint
+        catchUpPlayers() -> None
+        incrementGameTime() -> DecisionPoint
+        scheduleDaylight() -> None
+        scheduleEvent() -> int
+        getHoursToNextEvent() -> int
+        popDueEvents() -> list
+        clone() -> GameClock
     """
-    def __init__(self, startTime:datetime.datetime): #, players:list):
-        # self.masterTime = startTime 
-        # self.playerTimes = {p:startTime for p in players}
-        self.gameTime=startTime
+    def __init__(self, startTime:datetime.datetime, players:list=None):
+        self.epoch = getEpoch(startTime)
+        self.gameTick = self.toTick(startTime)
+        self.masterTick = self.gameTick
+        self.playerTicks = {}
+        self._playerOrder = {}
+        self._playerHeap = []
+        for p in (players or []):
+            self.addPlayer(p)
+        self.scheduler = Scheduler()
+        self.scheduleDaylight()
 
     def __repr__(self):
-        # return self.masterTime.strftime("%Y-%m-%d:%H00")
         return self.gameTime.strftime("%Y-%m-%d:%H00")
 
-    # def addPlayer(self, playerID:int):
-    #     """Add a new player to time tracking"""
-    #     assert playerID not in self.playerTimes.keys(),"player '{}' already exists".format(playerID)
-    #     self.playerTimes[playerID] = self.masterTime
-        
-    # def updateMasterTime(self):
-    #     """Set master time to latest of all player times"""
-    #     latest_time = self.masterTime
-    #     for p in self.playerTimes.keys():
-    #         player_time = self.playerTimes[p]
-    #         if latest_time < player_time:
-    #             latest_time = player_time
-    #     self.masterTime=latest_time
-        
-    # def getActivePlayer(self) -> int:
-    #     """Return player with earliest time"""
-    #     active_player = None
-    #     earliest_time = None
-    #     for p in self.playerTimes.keys():
-    #         player_time = self.playerTimes[p]
-    #         if (earliest_time is None) or (earliest_time > player_time):
-    #             earliest_time = player_time
-    #             active_player=p
-    #     return active_player
-    
-    # def getPlayerTime(self, playerID:int) -> datetime.datetime:
-    #     if playerID==0:
-    #         return self.masterTime
-    #     assert playerID in self.playerTimes.keys(), "player id '{}' not found in GameClock".format(playerID)
-    #     return self.playerTimes[playerID]
-    
-    # def incrementPlayerTime(self, playerID:int, hours:int) -> DecisionPoint:
-    #     """Add hours to a player's current time
-        
-    #     ***
-        
-    #     Parameters:
-    #         playerID: integer ID of player
-    #         hours: how many hours to increment player's clock
-            
-    #     Returns:
-    #         if crossing dawn, DayBreaks. if crossing dusk, NightFalls. else None
-    #     """
-    #     assert playerID in self.playerTimes.keys(), "player '{}' not being tracked".format(playerID)
-    #     time_delta = datetime.timedelta(hours=hours)
-    #     self.playerTimes[playerID] = self.playerTimes[playerID] + time_delta
-    #     self.updateMasterTime()
-    #     if (int(self.playerTimes[playerID].strftime("%H")) >= SUNRISE) and (int((self.playerTimes[playerID]-time_delta).strftime("%H")) < SUNRISE):
-    #         return DayBreaks(playerID=playerID, date=self.getPlayerTime(playerID))
-    #     if (int(self.playerTimes[playerID].strftime("%H")) >= SUNSET) and (int((self.playerTimes[playerID]-time_delta).strftime("%H")) < SUNSET):
-    #         return NightFalls(playerID=playerID, date=self.getPlayerTime(playerID))
-        
+    def clone(self) -> "GameClock":
+        """Return an independent copy of this clock, its players, and its scheduled events"""
+        new_clock = self.__class__.__new__(self.__class__)
+        new_clock.epoch = self.epoch
+        new_clock.gameTick = self.gameTick
+        new_clock.masterTick = self.masterTick
+        new_clock.playerTicks = dict(self.playerTicks)
+        new_clock._playerOrder = dict(self._playerOrder)
+        new_clock._playerHeap = list(self._playerHeap)
+        new_clock.scheduler = self.scheduler.clone()
+        return new_clock
+
+    @property
+    def gameTime(self) -> datetime.datetime:
+        return self.toDatetime(self.gameTick)
+
+    @property
+    def masterTime(self) -> datetime.datetime:
+        return self.toDatetime(self.masterTick)
+
+    def toTick(self, time:Union[int, datetime.datetime]) -> int:
+        return toTick(time, self.epoch)
+
+    def toDatetime(self, tick:int) -> datetime.datetime:
+        return toDatetime(tick, self.epoch)
+
+    def addPlayer(self, playerID:int):
+        """Add a new player to time tracking"""
+        assert playerID not in self.playerTicks.keys(),"player '{}' already exists".format(playerID)
+        self.playerTicks[playerID] = self.masterTick
+        self._playerOrder[playerID] = len(self._playerOrder)
+        heapq.heappush(self._playerHeap, (self.masterTick, self._playerOrder[playerID], playerID))
+
+    def updateMasterTime(self, playerTick:int=None):
+        """Set master time to latest of all player times
+
+        Player times only ever move forward, so the latest time can be kept
+        current by comparing against each newly updated player time.
+        """
+        if playerTick is None:
+            playerTick = max(self.playerTicks.values(), default=self.masterTick)
+        if self.masterTick < playerTick:
+            self.masterTick = playerTick
+
+    def getActivePlayer(self) -> int:
+        """Return player with earliest time"""
+        while self._playerHeap:
+            player_tick, _, player_id = self._playerHeap[0]
+            if self.playerTicks.get(player_id) == player_tick:
+                return player_id
+            heapq.heappop(self._playerHeap) # stale entry from an earlier increment
+        return None
+
+    def getPlayerTick(self, playerID:int) -> int:
+        if playerID==0:
+            return self.masterTick
+        assert playerID in self.playerTicks.keys(), "player id '{}' not found in GameClock".format(playerID)
+        return self.playerTicks[playerID]
+
+    def getPlayerTime(self, playerID:int) -> datetime.datetime:
+        return self.toDatetime(self.getPlayerTick(playerID))
+
+    def incrementPlayerTime(self, playerID:int, hours:int) -> DecisionPoint:
+        """Add hours to a player's current time
+
+        ***
+
+        Parameters:
+            playerID: integer ID of player
+            hours: how many hours to increment player's clock
+
+        Returns:
+            if crossing dawn, DayBreaks. if crossing dusk, NightFalls. else None
+        """
+        assert playerID in self.playerTicks.keys(), "player '{}' not being tracked".format(playerID)
+        assert hours >= 0, "cannot move player clock backwards, got {} hours".format(hours)
+        previous_tick = self.playerTicks[playerID]
+        self.playerTicks[playerID] = previous_tick + int(hours)
+        heapq.heappush(self._playerHeap, (self.playerTicks[playerID], self._playerOrder[playerID], playerID))
+        if len(self._playerHeap) > 2*len(self.playerTicks) + 64: # compact stale entries
+            self._playerHeap = [(t, self._playerOrder[p], p) for p, t in self.playerTicks.items()]
+            heapq.heapify(self._playerHeap)
+        self.updateMasterTime(self.playerTicks[playerID])
+        daylight_change = getDaylightChange(previous_tick, self.playerTicks[playerID])
+        if daylight_change=="DayBreaks":
+            return DayBreaks(playerID=playerID, tick=self.playerTicks[playerID])
+        if daylight_change=="NightFalls":
+            return NightFalls(playerID=playerID, tick=self.playerTicks[playerID])
+
+    def catchUpPlayers(self, tick:int=None) -> None:
+        """Move every player clock that is behind tick (default: game time) forward to it"""
+        tick = self.gameTick if tick is None else int(tick)
+        for player_id, player_tick in list(self.playerTicks.items()):
+            if player_tick < tick:
+                self.incrementPlayerTime(player_id, tick - player_tick)
+
     def incrementGameTime(self,hours:int) -> DecisionPoint:
         """Add hours to game's current time
         
@@ -97,9 +204,47 @@ class GameClock:
         Returns:
             if crossing dawn, DayBreaks. if crossing dusk, NightFalls. else None
         """
-        time_delta = datetime.timedelta(hours=hours)
-        self.gameTime = self.gameTime + time_delta
-        if (int(self.gameTime.strftime("%H")) >= SUNRISE) and (int((self.gameTime-time_delta).strftime("%H")) < SUNRISE):
-            return DayBreaks(date=self.gameTime)
-        if (int(self.gameTime.strftime("%H")) >= SUNSET) and (int((self.gameTime-time_delta).strftime("%H")) < SUNSET):
-            return NightFalls(date=self.gameTime)
\ No newline at end of file
+        previous_tick = self.gameTick
+        self.gameTick = previous_tick + int(hours)
+        daylight_change = getDaylightChange(previous_tick, self.gameTick)
+        if daylight_change=="DayBreaks":
+            return DayBreaks(tick=self.gameTick)
+        if daylight_change=="NightFalls":
+            return NightFalls(tick=self.gameTick)
+
+    def scheduleDaylight(self) -> None:
+        """Queue the next dawn and dusk after the current game time"""
+        for hour, kind in [(SUNRISE, "DayBreaks"), (SUNSET, "NightFalls")]:
+            event_tick = self.gameTick + ((hour - self.gameTick - 1) % HOURS_PER_DAY) + 1
+            self.scheduler.schedule(event_tick, kind)
+
+    def scheduleEvent(self, eventTick:int, kind:str, transient:bool=False, **kwargs) -> int:
+        """Wrapper around scheduler.schedule() that rejects past events"""
+        assert eventTick > self.gameTick, "cannot schedule '{}' at tick {}, which is not after current tick {}".format(kind, eventTick, self.gameTick)
+        return self.scheduler.schedule(int(eventTick), kind, transient=transient, **kwargs)
+
+    def getHoursToNextEvent(self, maxHours:int=24) -> int:
+        """Return whole hours until the next scheduled event, at least 1 and at most maxHours"""
+        next_tick = self.scheduler.getNextTime()
+        if next_tick is None:
+            return int(maxHours)
+        return int(min(max(next_tick - self.gameTick, 1), maxHours))
+
+    def popDueEvents(self) -> list:
+        """Remove and return events at or before current game time
+
+        Dawn and dusk events reschedule themselves for the following day and
+        are returned as DayBreaks and NightFalls decision points; all other
+        events are returned as ScheduledEvent objects.
+        """
+        due = []
+        for event in self.scheduler.popDue(self.gameTick):
+            if event.kind == "DayBreaks":
+                self.scheduler.schedule(event.time + HOURS_PER_DAY, "DayBreaks")
+                due.append(DayBreaks(tick=event.time))
+            elif event.kind == "NightFalls":
+                self.scheduler.schedule(event.time + HOURS_PER_DAY, "NightFalls")
+                due.append(NightFalls(tick=event.time))
+            else:
+                due.append(event)
+        return due
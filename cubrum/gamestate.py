@@ -3,13 +3,20 @@ logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
 import datetime, sys
+import numpy as np
 import pandas as pd
 
 from .gameclock import GameClock
 from .messagehandler import MessageHandler
+from .correspondents import CorrespondentRegistry
 from .map import Map
-from .army import Army
+from .army import Army, getMoraleValues, changeMoraleBatch, checkMoraleBatch
+from .commander import Commander
+from .culture import Culture
+from .weather import Weather
+from .rng import RNGStreams
 from .exceptions import InvalidActionError, NoSuchPlayerError
+from .decisionpoint import ArmyEngaged, SuppliesExpended
 
 COPPERCOAST_NODES_PATH = os.path.join(os.path.dirname(__file__), "mapdata", "coppercoast_strongholds.json")
 COPPERCOAST_ROADS_PATH = os.path.join(os.path.dirname(__file__), "mapdata", "coppercoast_roads.json")
@@ -26,34 +33,47 @@ class GameState:
     Attributes:
         map[Map]: road network in game area
         clock[GameClock]: clock tracking game time and players
-        correspondents[pandas.DataFrame]: DataFrame pairing senders and recipients 
-            of letterswith their unique IDs 
+        correspondents[CorrespondentRegistry]: senders and recipients of
+            letters with their unique IDs
         armies[list]: all Army objects currently active in-game
         playerToArmy[dict]: map of player ID to index in armies attribute
+        weather[Weather]: weather over the game area
+        namesUsed[set]: names given to commanders generated in this game
+        rngs[RNGStreams]: random number streams of this game, one per
+            subsystem. The map, message handler, armies, weather and
+            getSubordinate() draw from theirs; other subsystems (battles,
+            dice) are given theirs through getRNG()
 
     Methods:
         addPlayer() -> int
         getPlayers() -> list
         getPlayerName() -> str
         addArmy() -> int
+        getSubordinate() -> Commander
         addCorrespondent() -> int
         getRecipients() -> pandas.DataFrame
         getMessages() -> pandas.DataFrame
         getActivePlayer() -> int
         getArmyGeometeries() -> list
+        selectArmies() -> numpy.ndarray
+        getMorale() -> numpy.ndarray
+        changeMorale() -> numpy.ndarray
+        checkMorale() -> numpy.ndarray
         getOptions() -> list
         applyAction() -> 
+        predictEvents() -> None
+        advance() -> list
+        getRNG() -> numpy.random.Generator
+        spawnRNG() -> list
+        reseed() -> None
+        clone() -> GameState
     """
-    def __init__(self, map:Map=COPPERCOAST_MAP, startDate:str="1410-05-20"):
+    def __init__(self, map:Map=COPPERCOAST_MAP, startDate:str="1410-05-20", seed:int=None, rngs:RNGStreams=None):
+        self.rngs = RNGStreams(seed) if rngs is None else rngs
         self.clock = GameClock(datetime.datetime.strptime(startDate+":7", "%Y-%m-%d:%H"),players=[])
-        self.messages = MessageHandler()
-        self.correspondents = pd.DataFrame(
-            {
-                "ID":[0],
-                "name":["system"],
-                "validRecipient":[False]
-            }
-        )
+        self.messages = MessageHandler(epoch=self.clock.epoch)
+        self.correspondents = CorrespondentRegistry()
+        self.correspondents.add("system", validRecipient=False)
         self.map=map
         for node in self.map.nodes:
             if self.map.nodes[node].get("strongholdType"):
@@ -62,6 +82,9 @@ class GameState:
                 self.map.nodes[node]['id'] = node_id
         self.armies = []
         self.playerToArmy = {}
+        self.weather = Weather()
+        self.namesUsed = set()
+        self._bindRNG()
 
     def __repr__(self):
         repr_string = "<GameState: "
@@ -69,11 +92,55 @@ class GameState:
         repr_string+=">"
         return repr_string
 
+    def clone(self) -> "GameState":
+        """Return an independent copy of this game
+
+        Intended for stamping new games out of a prebuilt scenario template
+        without re-reading map files or rebuilding armies. Map attributes,
+        armies, clock, messages and correspondents are all copied, so the
+        copy and the original can be played separately. Random number
+        streams are copied too, so the copy draws the same numbers as the
+        original would; call reseed() to give it streams of its own.
+        """
+        new_state = self.__class__.__new__(self.__class__)
+        new_state.map = self.map.clone()
+        new_state.clock = self.clock.clone()
+        new_state.messages = self.messages.clone()
+        new_state.correspondents = self.correspondents.clone()
+        new_state.armies = [army.clone(new_state.map) for army in self.armies]
+        new_state.playerToArmy = dict(self.playerToArmy)
+        new_state.weather = Weather(startingSeason=self.weather.season, startingWeather=self.weather.currentWeather)
+        new_state.namesUsed = set(self.namesUsed)
+        new_state.rngs = self.rngs.clone()
+        new_state._bindRNG()
+        return new_state
+
+    def _bindRNG(self) -> None:
+        """Point the map, message handler, armies and weather at this game's streams"""
+        self.map.rng = self.rngs.get("map")
+        self.messages.rng = self.rngs.get("messages")
+        self.weather.rng = self.rngs.get("weather")
+        for army in self.armies:
+            army.rng = self.rngs.get("armies")
+
+    def getRNG(self, stream:str) -> "numpy.random.Generator":
+        """Return this game's Generator for a subsystem in cubrum.rng.RNG_STREAMS"""
+        return self.rngs.get(stream)
+
+    def spawnRNG(self, n:int=1) -> list:
+        """Return n Generators independent of the game's streams and of each other, e.g. for parallel simulations"""
+        return self.rngs.spawn(n)
+
+    def reseed(self, seed:int=None) -> None:
+        """Replace every random number stream with new ones derived from seed (default: fresh entropy)"""
+        self.rngs = RNGStreams(seed)
+        self._bindRNG()
+
     def addPlayer(self, playerName:str) -> int:
         """Takes a player name and returns a new player ID
         
         Also adds the new player to the correspondents
-            dataframe, clock, and playerToArmy dictionary 
+            registry, clock, and playerToArmy dictionary 
             attributes
         """
         new_id = self.addCorrespondent(correspondentName=playerName, validRecipient=True)
@@ -88,12 +155,9 @@ class GameState:
     def getPlayerName(self, playerID:int) -> str:
         """Returns string name associated with player ID"""
         try:
-            matching_correspondents = self.correspondents.loc[self.correspondents['ID']==playerID, "name"]
-            assert len(matching_correspondents)>0, "player with ID={} not found".format(playerID)
-            assert len(matching_correspondents)==1, "multiple records returned for ID={}".format(playerID)
-            return str(matching_correspondents.iloc[0])
-        except AssertionError as e:
-            raise NoSuchPlayerError(e)
+            return self.correspondents.getName(playerID)
+        except KeyError:
+            raise NoSuchPlayerError("player with ID={} not found".format(playerID))
 
     def addArmy(self, newArmy:Army, playerID:int=None) -> int:
         """Adds an Army object to the armies attribute
@@ -119,11 +183,20 @@ class GameState:
         if self.playerToArmy.get(playerID) is not None:
             raise ValueError("Player with id '{}' already assigned army '{}'".format(playerID, self.armies(self.playerToArmy[playerID])))
         new_army_index = len(self.armies)
+        newArmy.rng = self.rngs.get("armies")
         self.armies.append(newArmy)
         self.playerToArmy[playerID] = new_army_index
 
+    def getSubordinate(self, commander:Commander, culture:Culture=None) -> Commander:
+        """Return a new commander serving under commander
+
+        Names and traits are drawn from the game's commanders stream, and
+        names already given in this game are not reused.
+        """
+        return commander.getSubordinate(culture=culture, rng=self.rngs.get("commanders"), namesUsed=self.namesUsed)
+
     def addCorrespondent(self, correspondentName:str, validRecipient:bool=True) -> int:
-        """Adds a new item to correspondents dataframe
+        """Adds a new item to correspondents registry
 
         ***
         
@@ -135,36 +208,28 @@ class GameState:
         Returns:
             correspondent_id: integer ID of newly added correspondent
         """
-        new_id = len(self.correspondents)
-        new_correspondent = {
-            "ID":int(new_id),
-            "name":str(correspondentName),
-            "validRecipient":bool(validRecipient)
-        }
-        self.correspondents.loc[new_id] = new_correspondent
-        return new_id
+        return self.correspondents.add(correspondentName, validRecipient=validRecipient)
     
     def getRecipients(self) -> pd.DataFrame:
-        """Return list of correspondents for which validRecipient is True
+        """Return DataFrame of correspondents for which validRecipient is True
         """
-        return self.correspondents.loc[self.correspondents["validRecipient"]==True]
+        return self.correspondents.getRecipients()
     
-    def getMessages(self, playerID:int) -> pd.DataFrame:
+    def getMessages(self, playerID:int, unreadOnly:bool=False) -> pd.DataFrame:
         """Return subset of messages addressed to player that have been recieved at current time
         
         ***
         Parameters:
             playerID: ID integer of player whose messages should be retrieved
+            unreadOnly: default False. If True, only return messages that 
+                arrived since the last call with unreadOnly=True
         """
         if playerID!=0: # system is always valid
             try:
                 assert playerID in self.getPlayers(), "player with ID={} not found".format(playerID)
             except AssertionError as e:
                 raise NoSuchPlayerError(e)
-        messages_addressed = self.messages.akashicRecords.loc[self.messages.akashicRecords['recipientID']==playerID]
-        messages_recieved = messages_addressed.loc[messages_addressed['receiptDate'] != None]
-        messages_recieved = messages_recieved.loc[messages_addressed['receiptDate'] <= self.clock.getPlayerTime(playerID)]
-        return messages_recieved
+        return self.messages.getMessages(playerID, self.clock.getPlayerTick(playerID), unreadOnly=unreadOnly)
     
     def getActivePlayer(self) -> int:
         """Wrapper around clock.getActivePlayer()"""
@@ -192,6 +257,59 @@ class GameState:
                     army_geometries[i]['intersecting'].append(self.armies[j])
         return army_geometries
     
+    def selectArmies(self, armyIndices=None, where=None) -> np.ndarray:
+        """Return the indices of armies matching a filter, in ascending order
+
+        ***
+
+        Parameters:
+            armyIndices: default None, for every army. Indices into the
+                armies attribute, or a boolean mask over it
+            where: default None. Callable taking an Army and returning
+                whether to keep it
+        """
+        indices = np.arange(len(self.armies))
+        if armyIndices is not None:
+            selection = np.asarray(armyIndices)
+            indices = indices[selection if selection.dtype==bool else selection.astype(np.int64)]
+        if where is not None:
+            indices = np.array([i for i in indices.tolist() if where(self.armies[i])], dtype=np.int64)
+        return np.unique(indices)
+
+    def getMorale(self, armyIndices=None, where=None) -> np.ndarray:
+        """Return the morale of the armies selected as by selectArmies()"""
+        return getMoraleValues([self.armies[i] for i in self.selectArmies(armyIndices, where)])
+
+    def changeMorale(self, amount, armyIndices=None, where=None) -> np.ndarray:
+        """Change the morale of the armies selected as by selectArmies() in one step
+
+        For end-of-day upkeep, e.g. lowering the morale of every army out of
+        supply with changeMorale(-1, where=lambda army: army.supply <= 0).
+
+        ***
+
+        Parameters:
+            amount: change for every selected army, or one per selected
+                army in ascending order of index
+            armyIndices, where: as for selectArmies()
+
+        Returns:
+            array of the new morale of each selected army
+        """
+        return changeMoraleBatch([self.armies[i] for i in self.selectArmies(armyIndices, where)], amount)
+
+    def checkMorale(self, armyIndices=None, where=None) -> np.ndarray:
+        """Check the morale of the armies selected as by selectArmies() in one roll
+
+        ***
+
+        Returns:
+            array of the indices of armies that failed their check
+        """
+        indices = self.selectArmies(armyIndices, where)
+        results = checkMoraleBatch([self.armies[i] for i in indices], rng=self.rngs.get("armies"))
+        return indices[results > 0]
+
     def getOptions(self, playerID:int) -> list:
         if not playerID in self.getPlayers():
             raise NoSuchPlayerError("player with ID={} not found".format(playerID))
@@ -200,4 +318,84 @@ class GameState:
     def applyAction(self, action):
         if not action.isValid(self):
             raise InvalidActionError("action '{}' not valid".format(action))
-        return action.apply(self)
\ No newline at end of file
+        return action.apply(self)
+    
+    def predictEvents(self) -> None:
+        """Queue transient clock events for the next predictable changes in game state
+
+        Covers van arrivals at nodes, supply exhaustion, letter receipts, and
+        the earliest time any two armies could possibly come into contact.
+        """
+        clock = self.clock
+        clock.scheduler.clearTransient()
+        army_to_player = {army_index:player_id for player_id, army_index in self.playerToArmy.items() if army_index is not None}
+        hourly_speeds = []
+        for army_index, army in enumerate(self.armies):
+            player_id = army_to_player.get(army_index)
+            hours_to_arrival = army.getHoursToArrival()
+            if hours_to_arrival is not None:
+                clock.scheduleEvent(clock.gameTick + hours_to_arrival, "ArmyArrival", transient=True, armyIndex=army_index, playerID=player_id)
+                hourly_speeds.append(army.getTravelDistance(hours=1))
+            else:
+                hourly_speeds.append(0)
+            hours_to_exhaustion = army.getHoursToSupplyExhaustion()
+            if (hours_to_exhaustion is not None) and (army.supply > 0):
+                clock.scheduleEvent(clock.gameTick + hours_to_exhaustion, "SuppliesExpended", transient=True, armyIndex=army_index, playerID=player_id)
+        # armies cannot meet before the gap between them closes at their combined speed
+        for i in range(len(self.armies)):
+            for j in range(i+1, len(self.armies)):
+                closing_speed = hourly_speeds[i] + hourly_speeds[j]
+                if closing_speed <= 0:
+                    continue
+                gap = self.armies[i].position.getDistance(self.armies[j].position)
+                hours_to_contact = max(int(gap//closing_speed), 1)
+                clock.scheduleEvent(clock.gameTick + hours_to_contact, "PossibleEncounter", transient=True, armyIndices=(i, j))
+        for recipient_id, receipt_tick in self.messages.getNextDeliveries().items():
+            clock.scheduleEvent(max(receipt_tick, clock.gameTick+1), "MessageDelivery", transient=True, playerID=recipient_id)
+
+    def advance(self, maxHours:int=24) -> list:
+        """Jump game time forward to the next scheduled event
+
+        All armies march and consume supply over the whole interval in a
+        single step, rather than hour by hour. Player clocks that are behind
+        are brought up to the new game time, and messages falling due are
+        delivered.
+
+        ***
+
+        Parameters:
+            maxHours: default 24. Upper bound on how far to advance
+
+        Returns:
+            decision_points: list of DecisionPoint objects raised by movement
+                and by events falling due
+        """
+        decision_points = self.messages.releaseDue(self.clock.gameTick)
+        self.predictEvents()
+        hours = self.clock.getHoursToNextEvent(maxHours=maxHours)
+        army_to_player = {army_index:player_id for player_id, army_index in self.playerToArmy.items() if army_index is not None}
+        for army_index, army in enumerate(self.armies):
+            army.consumeSupply(hours)
+            if army.position.getMotion()=="holding":
+                continue
+            res_march = army.march(hours=hours)
+            if res_march:
+                res_march.updateContext(playerID=army_to_player.get(army_index))
+                decision_points.append(res_march)
+        self.clock.incrementGameTime(hours)
+        self.clock.catchUpPlayers()
+        decision_points += self.messages.releaseDue(self.clock.gameTick)
+        for event in self.clock.popDueEvents():
+            if event.kind=="PossibleEncounter":
+                i, j = event.armyIndices
+                army_i, army_j = self.armies[i], self.armies[j]
+                if army_i.position.touchingColumn(army_j.position) or army_i.position.intersectsColumn(army_j.position):
+                    decision_points.append(ArmyEngaged(trigger="ArmyEngaged", armies=[army_i, army_j], tick=event.time))
+            elif event.kind=="SuppliesExpended":
+                if self.armies[event.armyIndex].supply <= 0:
+                    decision_points.append(SuppliesExpended(trigger="SuppliesExpended", army=self.armies[event.armyIndex], playerID=event.playerID, tick=event.time))
+            elif event.kind in ["ArmyArrival", "MessageDelivery"]:
+                pass # reported by march() and releaseDue()
+            else:
+                decision_points.append(event)
+        return decision_points
@@ -2,34 +2,346 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
-import datetime, json
+import datetime, json, heapq
+from collections.abc import Mapping, MutableMapping
+from types import MappingProxyType
+from functools import cached_property
 import numpy as np
 import networkx as nx
 from networkx.classes.graph import Graph
+from networkx.classes.reportviews import EdgeView
 
 from .formation import Formation
 from .exceptions import NoPathError
+from .strongholdtable import StrongholdTable, TABLE_ATTRIBUTES
+from .forageledger import ForageLedger
+from .rng import getGenerator
+from .dice import rollDice
+
+
+MUTABLE_NODE_ATTRIBUTES = [
+    "id",
+    "currentSupply",
+    "currentLoot",
+    "garrison",
+    "gatesOpen",
+    "heldBy",
+    "taxed",
+    "levied"
+]
+MUTABLE_EDGE_ATTRIBUTES = [] # forage state is kept in a ForageLedger
+_MISSING = object() # overlay value of an attribute a node or edge does not have
+
+
+def _copyValue(value):
+    """Copy list and dict values, so that games never share them"""
+    return value.copy() if isinstance(value, (list, dict)) else value
+
+
+class MapTopology:
+    """Read-only road network shared by every game played on one map
+
+    Holds node and edge attributes that never change during a game (names,
+    stronghold types, distances, bearings), and assigns every node and
+    road a consecutive integer id.
+
+    ***
+
+    Attributes:
+        nodes:dict
+        adjacency:dict
+        nodeIndex:dict
+        edgeIndex:dict
+        edgeCount:int
+    """
+    def __init__(self, nodes:dict, adjacency:dict):
+        self.nodes = nodes
+        self.adjacency = adjacency
+        self.nodeIndex = {node:i for i, node in enumerate(nodes)}
+        self.edgeIndex = {} # (u, v) and (v, u) both map to the edge id
+        for u, neighbors in adjacency.items():
+            for v in neighbors:
+                if (u, v) not in self.edgeIndex:
+                    edge_id = len(self.edgeIndex) // 2
+                    self.edgeIndex[(u, v)] = edge_id
+                    self.edgeIndex[(v, u)] = edge_id
+        self.edgeCount = len(self.edgeIndex) // 2
+
+    def __repr__(self):
+        return "<MapTopology: {} nodes, {} edges>".format(len(self.nodes), self.edgeCount)
+
+
+class _TableColumn:
+    """Overlay column of a node attribute held in a StrongholdTable
+
+    Nodes with a row in the table read and write it; other nodes fall back
+    to a plain list.
+    """
+    __slots__ = ("table", "attribute", "rows", "fallback")
+
+    def __init__(self, table:StrongholdTable, attribute:str, rows:list, fallback:list):
+        self.table = table
+        self.attribute = attribute
+        self.rows = rows # table row of each node id, or -1
+        self.fallback = fallback
+
+    def __getitem__(self, index:int):
+        row = self.rows[index]
+        if row < 0:
+            return self.fallback[index]
+        value = self.table.getAttribute(row, self.attribute)
+        return _MISSING if value is None else value
+
+    def __setitem__(self, index:int, value):
+        row = self.rows[index]
+        if row < 0:
+            self.fallback[index] = value
+        else:
+            self.table.setAttribute(row, self.attribute, None if value is _MISSING else value)
+
+    def clone(self, table:StrongholdTable) -> "_TableColumn":
+        return self.__class__(table, self.attribute, self.rows, [_copyValue(v) for v in self.fallback])
+
+
+class MapOverlay:
+    """Mutable stronghold and road state of a single game
+
+    Each mutable attribute is one list, indexed by node or edge id of the
+    shared MapTopology. The economic state of strongholds is held instead in
+    a StrongholdTable, which the overlay columns of those attributes read
+    and write. Attributes outside MUTABLE_NODE_ATTRIBUTES and
+    MUTABLE_EDGE_ATTRIBUTES that are set during a game go into small
+    per-node or per-edge dicts.
+
+    ***
+
+    Attributes:
+        nodeColumns:dict
+        edgeColumns:dict
+        nodeExtras:dict
+        edgeExtras:dict
+        strongholds:cubrum.strongholdtable.StrongholdTable
+        forage:cubrum.forageledger.ForageLedger
+
+    Methods:
+        clone() -> MapOverlay
+    """
+    def __init__(self, nodeColumns:dict, edgeColumns:dict, nodeExtras:dict=None, edgeExtras:dict=None, strongholds:StrongholdTable=None, forage:ForageLedger=None):
+        self.nodeColumns = nodeColumns
+        self.edgeColumns = edgeColumns
+        self.nodeExtras = nodeExtras or {}
+        self.edgeExtras = edgeExtras or {}
+        self.strongholds = strongholds
+        self.forage = forage
+
+    def clone(self) -> "MapOverlay":
+        strongholds = None if self.strongholds is None else self.strongholds.clone()
+        node_columns = {}
+        for attribute, values in self.nodeColumns.items():
+            if isinstance(values, _TableColumn):
+                node_columns[attribute] = values.clone(strongholds)
+            else:
+                node_columns[attribute] = [_copyValue(v) for v in values]
+        return self.__class__(
+            nodeColumns=node_columns,
+            edgeColumns={attribute:[_copyValue(v) for v in values] for attribute, values in self.edgeColumns.items()},
+            nodeExtras={i:{key:_copyValue(v) for key, v in extras.items()} for i, extras in self.nodeExtras.items()},
+            edgeExtras={i:{key:_copyValue(v) for key, v in extras.items()} for i, extras in self.edgeExtras.items()},
+            strongholds=strongholds,
+            forage=None if self.forage is None else self.forage.clone()
+        )
+
+
+class AttributeView(MutableMapping):
+    """Attribute dictionary of one node or edge, combining topology and overlay
+
+    Reads fall through from the game's overlay to the shared topology.
+    Writes go to the overlay; attributes that belong to the topology cannot
+    be changed.
+    """
+    __slots__ = ("_static", "_columns", "_extras", "_index")
+
+    def __init__(self, static:dict, columns:dict, extras:dict, index:int):
+        self._static = static
+        self._columns = columns
+        self._extras = extras
+        self._index = index
+
+    def __getitem__(self, key):
+        column = self._columns.get(key)
+        if column is not None:
+            value = column[self._index]
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if key in self._static:
+            return self._static[key]
+        extras = self._extras.get(self._index)
+        if extras is not None:
+            return extras[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        column = self._columns.get(key)
+        if column is not None:
+            column[self._index] = value
+        elif key in self._static:
+            raise TypeError("attribute '{}' is part of the shared map topology and cannot be changed".format(key))
+        else:
+            self._extras.setdefault(self._index, {})[key] = value
+
+    def __delitem__(self, key):
+        column = self._columns.get(key)
+        if column is not None:
+            if column[self._index] is _MISSING:
+                raise KeyError(key)
+            column[self._index] = _MISSING
+        elif key in self._static:
+            raise TypeError("attribute '{}' is part of the shared map topology and cannot be changed".format(key))
+        else:
+            del self._extras.get(self._index, {})[key]
+
+    def __iter__(self):
+        yield from self._static
+        for key, column in self._columns.items():
+            if column[self._index] is not _MISSING:
+                yield key
+        yield from self._extras.get(self._index, {})
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def copy(self) -> dict:
+        return {key:_copyValue(value) for key, value in self.items()}
+
+
+class _NodeAttributes(Mapping):
+    """Stands in for Graph._node of a map split into topology and overlay"""
+    __slots__ = ("_topology", "_overlay")
+
+    def __init__(self, topology:MapTopology, overlay:MapOverlay):
+        self._topology = topology
+        self._overlay = overlay
+
+    def __getitem__(self, node):
+        return AttributeView(self._topology.nodes[node], self._overlay.nodeColumns, self._overlay.nodeExtras, self._topology.nodeIndex[node])
+
+    def __contains__(self, node):
+        return node in self._topology.nodes
+
+    def __iter__(self):
+        return iter(self._topology.nodes)
+
+    def __len__(self):
+        return len(self._topology.nodes)
+
+
+class _EdgeNeighborAttributes(Mapping):
+    __slots__ = ("_topology", "_overlay", "_node")
+
+    def __init__(self, topology:MapTopology, overlay:MapOverlay, node):
+        self._topology = topology
+        self._overlay = overlay
+        self._node = node
+
+    def __getitem__(self, neighbor):
+        return AttributeView(self._topology.adjacency[self._node][neighbor], self._overlay.edgeColumns, self._overlay.edgeExtras, self._topology.edgeIndex[(self._node, neighbor)])
+
+    def __contains__(self, neighbor):
+        return neighbor in self._topology.adjacency[self._node]
+
+    def __iter__(self):
+        return iter(self._topology.adjacency[self._node])
+
+    def __len__(self):
+        return len(self._topology.adjacency[self._node])
+
+
+class _EdgeAttributes(Mapping):
+    """Adjacency of edge attribute views, read by Map.edges"""
+    __slots__ = ("_topology", "_overlay")
+
+    def __init__(self, topology:MapTopology, overlay:MapOverlay):
+        self._topology = topology
+        self._overlay = overlay
+
+    def __getitem__(self, node):
+        if node not in self._topology.adjacency:
+            raise KeyError(node)
+        return _EdgeNeighborAttributes(self._topology, self._overlay, node)
+
+    def __contains__(self, node):
+        return node in self._topology.adjacency
+
+    def __iter__(self):
+        return iter(self._topology.adjacency)
+
+    def __len__(self):
+        return len(self._topology.adjacency)
+
+
+class MapEdgeView(EdgeView):
+    """EdgeView whose attribute dictionaries include a game's overlay"""
+    __slots__ = ()
+
+    def __init__(self, G):
+        super().__init__(G)
+        if G.overlay is not None:
+            self._adjdict = _EdgeAttributes(G.topology, G.overlay)
+            self._nodes_nbrs = self._adjdict.items
 
 
 class Map(Graph):
     """A network of locations and paths between them
 
+    A map is built with ordinary attribute dictionaries. The first time it
+    is cloned, it is split into a read-only MapTopology, shared with every
+    clone, and a MapOverlay of the attributes in MUTABLE_NODE_ATTRIBUTES
+    and MUTABLE_EDGE_ATTRIBUTES and the road forage ledger, of which each
+    clone gets its own copy.
+    Attributes are still read and written through nodes[...] and
+    edges[...]. A split map cannot gain nodes or roads.
+
     ***
 
+    Attributes:
+        topology:MapTopology
+        overlay:MapOverlay
+        rng:numpy.random.Generator
+
     Methods:
         addNodes(node_list)
         addEdges(edge_list)
         addNodesFromFile()
         addEdgesFromFile()
         getShortestPath(start, end) -> list
+        getDistanceField(start) -> dict
         getPathLength(path) -> int
+        getStrongholds() -> StrongholdTable
+        getForageLedger() -> ForageLedger
+        getEdgeID() -> int
+        clone() -> Map
     """
-    def fillDefaults(self):
+    topology = None
+    overlay = None
+    rng = None
+
+    @cached_property
+    def edges(self):
+        return MapEdgeView(self)
+
+    def fillDefaults(self, rng:np.random.Generator=None):
+        """Fill in missing stronghold attributes, rolling supply and loot with rng or else the map's"""
+        rng = getGenerator(self.rng if rng is None else rng)
         for node in self.nodes:
             # set name
             self.nodes[node]['name']=node
-            self.nodes[node]['taxed']=self.nodes[node].get("taxed", [])
-            self.nodes[node]['levied']=self.nodes[node].get("levied", [])
+            # kept immutable, as they are once held in a StrongholdTable
+            self.nodes[node]['taxed']=tuple(self.nodes[node].get("taxed", ()))
+            self.nodes[node]['levied']=tuple(self.nodes[node].get("levied", ()))
             # default defenses
             if self.nodes[node].get("defenses") is None:
                 if self.nodes[node].get('strongholdType')=="city":
@@ -44,24 +356,24 @@ class Map(Graph):
             # default supply
             if self.nodes[node].get("maxSupply") is None:
                 if self.nodes[node].get('strongholdType')=="city":
-                    self.nodes[node]['maxSupply'] = np.random.randint(1,7)*100000
+                    self.nodes[node]['maxSupply'] = rollDice("1d6", rng=rng)*100000
                     self.nodes[node]['currentSupply'] = self.nodes[node]['maxSupply']
                 elif self.nodes[node].get('strongholdType')=="town":
-                    self.nodes[node]['maxSupply'] = np.random.randint(1,7)*10000
+                    self.nodes[node]['maxSupply'] = rollDice("1d6", rng=rng)*10000
                     self.nodes[node]['currentSupply'] = self.nodes[node]['maxSupply']
                 elif self.nodes[node].get('strongholdType')=="fortress":
-                    self.nodes[node]['maxSupply'] = np.random.randint(1,7)*1000
+                    self.nodes[node]['maxSupply'] = rollDice("1d6", rng=rng)*1000
                     self.nodes[node]['currentSupply'] = self.nodes[node]['maxSupply']
             # default loot
             if self.nodes[node].get("maxLoot") is None:
                 if self.nodes[node].get('strongholdType')=="city":
-                    self.nodes[node]['maxLoot'] = np.random.randint(1,7)*100000
+                    self.nodes[node]['maxLoot'] = rollDice("1d6", rng=rng)*100000
                     self.nodes[node]['currentLoot'] = self.nodes[node]['maxLoot']
                 elif self.nodes[node].get('strongholdType')=="town":
-                    self.nodes[node]['maxLoot'] = np.random.randint(1,7)*100000
+                    self.nodes[node]['maxLoot'] = rollDice("1d6", rng=rng)*100000
                     self.nodes[node]['currentLoot'] = self.nodes[node]['maxLoot']
                 elif self.nodes[node].get('strongholdType')=="fortress":
-                    self.nodes[node]['maxLoot'] = (np.random.randint(10,20)*1000) if (np.random.randint(1,11)>9) else 0
+                    self.nodes[node]['maxLoot'] = (rollDice("1d10+9", rng=rng)*1000) if (rollDice("1d10", rng=rng)>9) else 0
                     self.nodes[node]['currentLoot'] = self.nodes[node]['maxLoot']
             # default garrison, update to use Formation objects
             if self.nodes[node].get("garrison") is None:
@@ -71,8 +383,8 @@ class Map(Graph):
                     self.nodes[node]['garrison'] = {'name':'{} garrison'.format(node), 'infantryCount':250}
                 elif self.nodes[node].get('strongholdType')=="fortress":
                     self.nodes[node]['garrison'] = {'name':'{} garrison'.format(node), 'infantryCount':250, 'cavalryCount':50}
-        for edge in self.edges:
-            self.edges[edge]['foraged'] = self.edges[edge].get("foraged", []) 
+            if self.nodes[node].get("garrison") is not None:
+                self.nodes[node]['garrison'] = MappingProxyType(dict(self.nodes[node]['garrison']))
 
     def addNodes(self, node_list) -> None:
         """Add nodes to underlying graph object
@@ -84,6 +396,7 @@ class Map(Graph):
                 item as the node name, and the second a dictionary of 
                 node attributes.
         """
+        assert self.topology is None, "cannot add nodes to a map whose topology is shared"
         node_json = node_list.copy()
         self.add_nodes_from(node_json)
         self.fillDefaults()
@@ -98,6 +411,7 @@ class Map(Graph):
                 of edge attributes. The attributes must include 'distance',
                 measured in leagues.
         """
+        assert self.topology is None, "cannot add edges to a map whose topology is shared"
         edge_json = edge_list.copy()
         for e in edge_json:
             e[2]['start'] = e[0]
@@ -137,6 +451,43 @@ class Map(Graph):
             raise NoPathError("Cannot find path between '{}' and '{}'".format(start, end))
         return shortest_path
     
+    def getDistanceField(self, start, exclusion_function=None, cutoff:float=None) -> dict:
+        """Returns the shortest distance from one node to every reachable node
+
+        ***
+
+        Parameters:
+            start: string name of starting node, or dict of node name to the
+                distance already travelled to it, to search from several
+                nodes at once
+            exclusion_function: as in getShortestPath()
+            cutoff: default None. If set, nodes farther than this are left
+                out, and the search stops once it passes them
+        """
+        sources = {start:0} if isinstance(start, str) else start
+        distance_field = {}
+        tentative = dict(sources)
+        queue = [(distance, node) for node, distance in sources.items()]
+        heapq.heapify(queue)
+        while queue:
+            distance, node = heapq.heappop(queue)
+            if node in distance_field:
+                continue
+            if (cutoff is not None) and (distance > cutoff):
+                break
+            distance_field[node] = distance
+            for neighbor, d in self._adj[node].items():
+                if neighbor in distance_field:
+                    continue
+                neighbor_distance = distance + d['distance']
+                if neighbor_distance >= tentative.get(neighbor, float("inf")):
+                    continue
+                if (exclusion_function is not None) and exclusion_function(self.nodes[node],self.nodes[neighbor],d):
+                    continue
+                tentative[neighbor] = neighbor_distance
+                heapq.heappush(queue, (neighbor_distance, neighbor))
+        return distance_field
+    
     def getPathLength(self, path:list) -> int:
         """Returns the total number of leagues along a path
 
@@ -149,4 +500,80 @@ class Map(Graph):
         for i in range(1, len(path)):
             edge = self.edges[(path[i-1], path[i])]
             total_distance += edge['distance']
-        return total_distance
\ No newline at end of file
+        return total_distance
+
+    def _splitTopology(self) -> None:
+        """Move this map's attributes into a shared topology and its own overlay"""
+        static_nodes = {}
+        node_columns = {attribute:[] for attribute in MUTABLE_NODE_ATTRIBUTES}
+        for node, attributes in self._node.items():
+            static_nodes[node] = {key:value for key, value in attributes.items() if key not in node_columns}
+            for attribute, column in node_columns.items():
+                column.append(attributes.get(attribute, _MISSING))
+        adjacency = {}
+        static_edges = {} # id of each edge's attribute dict -> its static part, shared by both directions
+        for u, neighbors in self._adj.items():
+            adjacency[u] = {}
+            for v, attributes in neighbors.items():
+                static_attributes = static_edges.get(id(attributes))
+                if static_attributes is None:
+                    static_attributes = {key:value for key, value in attributes.items() if key not in MUTABLE_EDGE_ATTRIBUTES}
+                    static_edges[id(attributes)] = static_attributes
+                adjacency[u][v] = static_attributes
+        topology = MapTopology(static_nodes, adjacency)
+        strongholds = StrongholdTable.fromAttributes([(node, attributes) for node, attributes in self._node.items() if attributes.get("strongholdType")])
+        rows = [strongholds.rowIndex.get(node, -1) for node in topology.nodes]
+        for attribute in TABLE_ATTRIBUTES:
+            node_columns[attribute] = _TableColumn(strongholds, attribute, rows, node_columns[attribute])
+        edge_columns = {attribute:[_MISSING]*topology.edgeCount for attribute in MUTABLE_EDGE_ATTRIBUTES}
+        for u, neighbors in self._adj.items():
+            for v, attributes in neighbors.items():
+                for attribute, column in edge_columns.items():
+                    column[topology.edgeIndex[(u, v)]] = attributes.get(attribute, _MISSING)
+        self.topology = topology
+        edge_distances = [0]*topology.edgeCount
+        for (u, v), edge_id in topology.edgeIndex.items():
+            edge_distances[edge_id] = adjacency[u][v]['distance']
+        self.overlay = MapOverlay(node_columns, edge_columns, strongholds=strongholds, forage=ForageLedger.fromDistances(edge_distances))
+        self._adj = topology.adjacency
+        self._node = _NodeAttributes(topology, self.overlay)
+
+    def getStrongholds(self) -> StrongholdTable:
+        """Return the table holding the economic state of this map's strongholds
+
+        Splits the map into topology and overlay if that has not happened yet.
+        """
+        if self.topology is None:
+            self._splitTopology()
+        return self.overlay.strongholds
+
+    def getForageLedger(self) -> ForageLedger:
+        """Return the ledger of supply left to forage along this map's roads, indexed by getEdgeID()"""
+        if self.topology is None:
+            self._splitTopology()
+        return self.overlay.forage
+
+    def getEdgeID(self, u:str, v:str) -> int:
+        """Return the integer id of the road between two nodes"""
+        if self.topology is None:
+            self._splitTopology()
+        try:
+            return self.topology.edgeIndex[(u, v)]
+        except KeyError:
+            raise KeyError("The edge {} is not in the graph.".format((u, v)))
+
+    def clone(self) -> "Map":
+        """Return a map sharing this map's topology, with its own copy of the mutable attributes
+
+        Changes to one game's strongholds and roads never reach another's.
+        Unlike building from file, no defaults are re-rolled.
+        """
+        if self.topology is None:
+            self._splitTopology()
+        new_map = self.__class__()
+        new_map.graph.update(self.graph)
+        new_map.topology = self.topology
+        new_map.overlay = self.overlay.clone()
+        new_map._adj = self.topology.adjacency
+        new_map._node = _NodeAttributes(new_map.topology, new_map.overlay)
+        return new_map
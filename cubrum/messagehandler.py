@@ -2,58 +2,255 @@ import logging, os
 logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
 log = logging.getLogger(__name__)
 
-import datetime
+import bisect, datetime, heapq, sys
 import numpy as np
 import pandas as pd
 from typing import Union
 
 from .position import PointPosition, ColumnPosition
+from .decisionpoint import LetterRecieved, RumorRecieved
+from .messagelog import MessageLog, NO_LINK
+from .chronicle import ChronicleExporter
+from .gameclock import SUNRISE, SUNSET, HOURS_PER_DAY, toTick, toDatetime
+from .rng import getGenerator
+
+NO_TICK = -1 # receiptDate of messages that never arrive
+FIRST_MESSENGER_HOUR = SUNRISE + 1 # messengers don't travel from SUNSET through SUNRISE
+MESSENGER_HOURS_PER_DAY = SUNSET - FIRST_MESSENGER_HOUR
+
+
+def _countMessengerHours(ticks):
+    """Number of messenger hours at or before each tick, counted from the epoch"""
+    hours_today = np.clip((ticks % HOURS_PER_DAY) - FIRST_MESSENGER_HOUR + 1, 0, MESSENGER_HOURS_PER_DAY)
+    return (ticks // HOURS_PER_DAY) * MESSENGER_HOURS_PER_DAY + hours_today
+
+def _nthMessengerHour(counts):
+    """Tick of the count-th messenger hour after the epoch"""
+    days, hours_into_day = np.divmod(counts - 1, MESSENGER_HOURS_PER_DAY)
+    return days * HOURS_PER_DAY + FIRST_MESSENGER_HOUR + hours_into_day
+
+def getDeliveryTick(departureTick:int, travelHours:float) -> int:
+    """Return the tick at which a messenger arrives
+
+    Each hour of travel ends on the next daylight hour, so the arrival is the
+    ceil(travelHours)-th daylight hour after departure. Journeys of zero
+    hours arrive at the moment of departure.
+
+    ***
+
+    Parameters:
+        departureTick: tick at which the messenger sets out
+        travelHours: hours of daylight travel required
+    """
+    if travelHours <= 0:
+        return int(departureTick)
+    travel_steps = int(np.ceil(travelHours))
+    return int(_nthMessengerHour(_countMessengerHours(int(departureTick)) + travel_steps))
+
+def getDeliveryTicks(departureTicks, travelHours) -> np.ndarray:
+    """Vectorized getDeliveryTick() over arrays of departure ticks and travel hours"""
+    departure_ticks = np.asarray(departureTicks, dtype=np.int64)
+    travel_hours = np.asarray(travelHours, dtype=float)
+    departure_ticks, travel_hours = np.broadcast_arrays(departure_ticks, travel_hours)
+    travel_steps = np.ceil(np.maximum(travel_hours, 0)).astype(np.int64)
+    delivery_ticks = _nthMessengerHour(_countMessengerHours(departure_ticks) + travel_steps)
+    return np.where(travel_steps > 0, delivery_ticks, departure_ticks)
+
+
+class Inbox:
+    """Messages delivered to a single recipient, sorted by receipt tick
+
+    A read cursor remembers the last message returned by getUnread(), so
+    repeated polling only returns messages that arrived since.
+
+    ***
+
+    Attributes:
+        keys:list
+        cursor:tuple
+
+    Methods:
+        add() -> None
+        remove() -> bool
+        getReceived() -> list
+        getUnread() -> list
+        clone() -> Inbox
+    """
+    def __init__(self):
+        self.keys = [] # sorted (receiptTick, messageID) pairs
+        self.cursor = (-sys.maxsize, -1)
+        self._lateKeys = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def clone(self) -> "Inbox":
+        new_inbox = self.__class__()
+        new_inbox.keys = list(self.keys)
+        new_inbox.cursor = self.cursor
+        new_inbox._lateKeys = list(self._lateKeys)
+        return new_inbox
+
+    def add(self, receiptTick:int, messageID:int) -> None:
+        key = (int(receiptTick), int(messageID))
+        if key <= self.cursor: # arrived before the last read position, e.g. from a sender whose clock is behind
+            self._lateKeys.append(key)
+        bisect.insort(self.keys, key)
+
+    def remove(self, receiptTick:int, messageID:int) -> bool:
+        """Take a message out of the inbox; return False if it was not there"""
+        key = (int(receiptTick), int(messageID))
+        index = bisect.bisect_left(self.keys, key)
+        if (index==len(self.keys)) or (self.keys[index]!=key):
+            return False
+        del self.keys[index]
+        if key in self._lateKeys:
+            self._lateKeys.remove(key)
+        return True
+
+    def getReceived(self, tick:int) -> list:
+        """Return ids of messages received at or before tick, in order of receipt"""
+        stop = bisect.bisect_right(self.keys, (int(tick), sys.maxsize))
+        return [message_id for _, message_id in self.keys[:stop]]
+
+    def getUnread(self, tick:int) -> list:
+        """Return ids of messages received at or before tick and not yet returned, and advance the cursor"""
+        start = bisect.bisect_right(self.keys, self.cursor)
+        stop = bisect.bisect_right(self.keys, (int(tick), sys.maxsize))
+        unread_keys = self.keys[start:stop]
+        if self._lateKeys:
+            unread_keys = sorted(self._lateKeys + unread_keys)
+            self._lateKeys = []
+        if stop > start:
+            self.cursor = self.keys[stop-1]
+        return [message_id for _, message_id in unread_keys]
+
+
+class RecordIndexer:
+    """loc or iloc of MessageHandler.akashicRecords that writes through to the handler's storage
+
+    akashicRecords is rebuilt from storage, so assigning to a copy of it
+    would be lost. Reads index the current DataFrame; an assignment such as
+    handler.loc[messageID, "receiptDate"] = tick calls records.setValue()
+    for every cell selected. Messages whose receiptDate or recipientID
+    change are taken out of their inbox or delivery queue and queued again
+    for delivery to their new recipient at their new receipt time.
+    """
+    def __init__(self, handler:"MessageHandler", attribute:str):
+        self._handler = handler
+        self._attribute = attribute
+
+    def __getitem__(self, key):
+        return getattr(self._handler.akashicRecords, self._attribute)[key]
+
+    def __setitem__(self, key, value):
+        if not (isinstance(key, tuple) and (len(key)==2)):
+            raise TypeError("assign to records with [rows, columns], got {}".format(key))
+        rows, columns = key
+        frame = self._handler.akashicRecords
+        positions = np.atleast_1d(getattr(pd.Series(np.arange(len(frame)), index=frame.index), self._attribute)[rows])
+        names = np.atleast_1d(getattr(pd.Series(frame.columns, index=frame.columns), self._attribute)[columns])
+        values = np.asarray(value, dtype=object)
+        if (values.ndim==1) and (len(names)==1):
+            values = values[:, None] # one value per row of a single column
+        values = np.broadcast_to(values, (len(positions), len(names)))
+        records = self._handler.records
+        for position, row_values in zip(positions, values):
+            message_id = int(frame.index[position])
+            delivery = (records.getValue(message_id, "recipientID"), records.getValue(message_id, "receiptDate"))
+            for name, cell in zip(names, row_values):
+                records.setValue(message_id, str(name), cell)
+            if any(name in ["recipientID", "receiptDate"] for name in names):
+                self._handler._redeliver(message_id, *delivery)
 
 
 class MessageHandler:
     """Records actions, rumors, and letters
 
+    creationDate and receiptDate are stored as integer ticks, whole hours
+    since the scenario epoch; see cubrum.gameclock.
+
+    Records are kept in memory in a MessageLog by default. Any object with
+    the same interface, such as cubrum.messagelog.SQLiteMessageLog, may be
+    passed as storage instead; after reopening persisted records, call
+    restore() to rebuild inboxes and delivery queues. Inboxes and delivery
+    queues are always held in memory, whatever the storage.
+
     ***
 
     Attributes:
+        records:cubrum.messagelog.MessageLog
+        inboxes:dict
+        pending:dict
+        unreported:list
         akashicRecords:pandas.DataFrame
+        epoch:datetime.datetime
+        rng:numpy.random.Generator
 
     Methods:
         addEvent() -> None
-        addLetter() -> None
+        addLetter() -> int
+        broadcastLetter() -> list
+        getInbox() -> Inbox
+        getNextDeliveries() -> dict
+        releaseDue() -> list
         getMessages() -> pandas.DataFrame
+        restore() -> None
+        exportChronicle() -> int
+        clone() -> MessageHandler
     """
-    def __init__(self):
-        self.akashicRecords = pd.DataFrame(
-            {
-                "messageType":[],
-                "creationDate":[],
-                "creationLocation":[],
-                "receiptDate":[],
-                "text":[],
-                "senderID":[],
-                "recipientID":[],
-                "link":[]
-            }
-        )
-        self.messageTypes = [
-            "EVENT",
-            "RUMOR",
-            "LETTER"
-        ]
+    def __init__(self, epoch:datetime.datetime=None, storage=None, rng:np.random.Generator=None):
+        self.epoch = epoch
+        self.rng = rng
+        self.records = MessageLog() if storage is None else storage
+        self.messageTypes = self.records.messageTypes
+        self.inboxes = {}
+        self.pending = {}
+        self.unreported = [] # (receiptTick, messageID, recipientID) released by getMessages() but not yet by releaseDue()
 
     def __repr__(self):
         return self.akashicRecords.__repr__()
+
+    def clone(self) -> "MessageHandler":
+        """Return an independent copy of this handler; its storage must provide clone()"""
+        new_handler = self.__class__(epoch=self.epoch, storage=self.records.clone(), rng=self.rng)
+        new_handler.inboxes = {recipient_id:inbox.clone() for recipient_id, inbox in self.inboxes.items()}
+        new_handler.pending = {recipient_id:list(queue) for recipient_id, queue in self.pending.items()}
+        new_handler.unreported = list(self.unreported)
+        return new_handler
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def akashicRecords(self) -> pd.DataFrame:
+        """DataFrame view of all records, built on demand"""
+        return self.records.toDataFrame()
     
     @property
-    def loc(self):
-        return self.akashicRecords.loc 
+    def loc(self) -> RecordIndexer:
+        """Label indexer of akashicRecords; assignments are written to records"""
+        return RecordIndexer(self, "loc")
     
     @property
-    def iloc(self):
-        return self.akashicRecords.iloc
+    def iloc(self) -> RecordIndexer:
+        """Position indexer of akashicRecords; assignments are written to records"""
+        return RecordIndexer(self, "iloc")
 
-    def addLetter(self, text:str, senderID:str, recipientID:str, creationDate:datetime.datetime, creationPosition:Union[PointPosition, ColumnPosition], recipientPosition:Union[PointPosition, ColumnPosition], messengerSpeed:float=1, safeDeliveryPercent:int=80) -> int:
+    def toTick(self, date:Union[int, datetime.datetime]) -> int:
+        """Convert a datetime to a tick using this handler's epoch; integers pass through"""
+        if isinstance(date, datetime.datetime):
+            assert self.epoch is not None, "MessageHandler has no epoch, pass integer ticks"
+        return toTick(date, self.epoch)
+
+    def toDatetime(self, tick:int) -> datetime.datetime:
+        """Convert a stored tick to a datetime for display, or None if it never occurs"""
+        if (tick is None) or (tick==NO_TICK):
+            return None
+        assert self.epoch is not None, "MessageHandler has no epoch"
+        return toDatetime(tick, self.epoch)
+
+    def addLetter(self, text:str, senderID:int, recipientID:int, creationDate:Union[int, datetime.datetime], creationPosition:Union[PointPosition, ColumnPosition], recipientPosition:Union[PointPosition, ColumnPosition], messengerSpeed:float=1, safeDeliveryPercent:int=80) -> int:
         """Adds a LETTER record to the messageHandler, and an EVENT record if the letter will be lost along the way
         """
         # extract vanPositions 
@@ -64,53 +261,255 @@ class MessageHandler:
         # calculate travel time
         travel_distance = creationPosition.getDistance(recipientPosition)
         travel_time = messengerSpeed * travel_distance
-        remaining_time = travel_time
-        receiptDate = creationDate
-        while remaining_time > 0:
-            receiptDate += datetime.timedelta(hours=1)
-            remaining_time -= 1
-            while (int(receiptDate.strftime("%H")) >= 21) or (int(receiptDate.strftime("%H")) <= 5): # messengers don't travel at night
-                receiptDate += datetime.timedelta(hours=1)
+        creationDate = self.toTick(creationDate)
+        receiptDate = getDeliveryTick(creationDate, travel_time)
         # convert creationLocation to pretty string 
         creation_location_string = str(creationPosition)
         # add letter message 
-        letter_id = len(self.akashicRecords)
-        new_message = {
-            "messageType":"LETTER",
-            "creationDate":creationDate,
-            "creationLocation":creation_location_string,
-            "receiptDate":receiptDate,
-            "text":text,
-            "senderID":senderID,
-            "recipientID":recipientID,
-            "link":None
-            }
-        self.akashicRecords.loc[letter_id] = new_message
+        letter_id = self.records.append(
+            messageType="LETTER",
+            creationDate=creationDate,
+            creationLocation=creation_location_string,
+            receiptDate=receiptDate,
+            text=text,
+            senderID=int(senderID),
+            recipientID=int(recipientID),
+            link=None
+        )
         return_value = letter_id
         # check for intercepted messenger
-        if np.random.randint(1, 101) > safeDeliveryPercent: # message lost
+        if getGenerator(self.rng).integers(1, 101) > safeDeliveryPercent: # message lost
             # lost_date = creationDate + ((receiptDate-creationDate)/2)
             lost_date = receiptDate
             event_text = "letter lost along the way"
             event_id = self.addEvent(event_text, lost_date, recipientPosition, link=letter_id)
-            self.akashicRecords.loc[letter_id, "receiptDate"] = None
-            self.akashicRecords.loc[letter_id, "link"] = event_id 
+            self.records.setValue(letter_id, "receiptDate", NO_TICK)
+            self.records.setValue(letter_id, "link", event_id)
             return_value = event_id
+        else:
+            self._queueDelivery(recipientID, receiptDate, letter_id)
         return return_value
 
-    def addEvent(self, text:str, creationDate:datetime.datetime, creationPosition:PointPosition, link:int=None) -> int:
+    def broadcastLetter(self, text:str, senderID:int, recipientIDs:list, creationDate:Union[int, datetime.datetime], creationPosition:Union[PointPosition, ColumnPosition], recipientPositions:list, messengerSpeed:float=1, safeDeliveryPercent:int=80) -> list:
+        """Send the same letter to many recipients at once
+
+        Distances are read from a single distance field computed from the
+        sender's position, delivery times are computed together, and all
+        LETTER and EVENT records are appended in one bulk write.
+
+        ***
+
+        Parameters:
+            recipientIDs: list of recipient ID integers
+            recipientPositions: list of positions, parallel to recipientIDs
+            other parameters as in addLetter()
+
+        Returns:
+            message_ids: list parallel to recipientIDs. As in addLetter(), each
+                item is the LETTER id, or the EVENT id if that letter was lost
+        """
+        assert len(recipientIDs)==len(recipientPositions), "got {} recipient IDs but {} positions".format(len(recipientIDs), len(recipientPositions))
+        if len(recipientIDs)==0:
+            return []
+        # extract vanPositions 
+        if type(creationPosition)==ColumnPosition:
+            creationPosition = creationPosition.vanPosition
+        recipientPositions = [p.vanPosition if type(p)==ColumnPosition else p for p in recipientPositions]
+        # calculate travel times
+        distance_field = creationPosition.getDistanceField()
+        travel_distances = np.array([creationPosition.getDistanceWithField(p, distance_field) for p in recipientPositions])
+        creationDate = self.toTick(creationDate)
+        receipt_dates = getDeliveryTicks(creationDate, messengerSpeed * travel_distances)
+        # check for intercepted messengers
+        lost = getGenerator(self.rng).integers(1, 101, size=len(recipientIDs)) > safeDeliveryPercent
+        first_letter_id = len(self.records)
+        letter_ids = np.arange(first_letter_id, first_letter_id+len(recipientIDs))
+        lost_indices = np.flatnonzero(lost)
+        event_ids = np.full(len(recipientIDs), NO_LINK)
+        event_ids[lost] = np.arange(first_letter_id+len(recipientIDs), first_letter_id+len(recipientIDs)+len(lost_indices))
+        self.records.extend(
+            messageType=["LETTER"]*len(recipientIDs) + ["EVENT"]*len(lost_indices),
+            creationDate=np.concatenate([np.full(len(recipientIDs), creationDate), receipt_dates[lost_indices]]),
+            creationLocation=[str(creationPosition)]*len(recipientIDs) + [str(recipientPositions[i]) for i in lost_indices],
+            receiptDate=np.concatenate([np.where(lost, NO_TICK, receipt_dates), receipt_dates[lost_indices]]),
+            text=[text]*len(recipientIDs) + ["letter lost along the way"]*len(lost_indices),
+            senderID=np.concatenate([np.full(len(recipientIDs), int(senderID)), np.zeros(len(lost_indices), dtype=np.int64)]),
+            recipientID=np.concatenate([np.asarray(recipientIDs, dtype=np.int64), np.zeros(len(lost_indices), dtype=np.int64)]),
+            link=[int(e) if e!=NO_LINK else None for e in event_ids] + [int(letter_ids[i]) for i in lost_indices]
+        )
+        for i in np.flatnonzero(~lost):
+            self._queueDelivery(recipientIDs[i], receipt_dates[i], letter_ids[i])
+        for i in lost_indices:
+            self._queueDelivery(0, receipt_dates[i], event_ids[i])
+        return np.where(lost, event_ids, letter_ids).tolist()
+
+    def addEvent(self, text:str, creationDate:Union[int, datetime.datetime], creationPosition:PointPosition, link:int=None) -> int:
+        creationDate = self.toTick(creationDate)
         # convert creationLocation to pretty string 
         creation_location_string = str(creationPosition)
-        event_id = len(self.akashicRecords)
-        new_message = {
-            "messageType":"EVENT",
-            "creationDate":creationDate,
-            "creationLocation":creation_location_string,
-            "recieptDate":creationDate,
-            "text":text,
-            "senderID":0,
-            "recipientID":0,
-            "link":link
-        }
-        self.akashicRecords.loc[event_id] = new_message
-        return event_id
\ No newline at end of file
+        event_id = self.records.append(
+            messageType="EVENT",
+            creationDate=creationDate,
+            creationLocation=creation_location_string,
+            receiptDate=creationDate,
+            text=text,
+            senderID=0,
+            recipientID=0,
+            link=link
+        )
+        self._queueDelivery(0, creationDate, event_id)
+        return event_id
+
+    def _queueDelivery(self, recipientID:int, receiptTick:int, messageID:int) -> None:
+        heapq.heappush(self.pending.setdefault(int(recipientID), []), (int(receiptTick), int(messageID)))
+
+    def _redeliver(self, messageID:int, recipientID:int, receiptTick:int) -> None:
+        """Move a message delivered to recipientID at receiptTick to the recipient and receipt time now in its record"""
+        if self.getInbox(recipientID).remove(receiptTick, messageID):
+            self.unreported = [entry for entry in self.unreported if entry[1]!=messageID]
+        else:
+            queue = self.pending.get(int(recipientID), [])
+            if (int(receiptTick), int(messageID)) in queue:
+                queue.remove((int(receiptTick), int(messageID)))
+                heapq.heapify(queue)
+        new_tick = self.records.getValue(messageID, "receiptDate")
+        if new_tick!=NO_TICK:
+            self._queueDelivery(self.records.getValue(messageID, "recipientID"), new_tick, messageID)
+
+    def getNextDeliveries(self) -> dict:
+        """Return the earliest pending receipt tick for each recipient with undelivered messages"""
+        return {recipient_id:queue[0][0] for recipient_id, queue in self.pending.items() if queue}
+
+    def releaseDue(self, tick:int, recipientID:int=None) -> list:
+        """Move messages whose receipt time has passed from the delivery queue into inboxes
+
+        ***
+
+        Parameters:
+            tick: time up to which messages are delivered
+            recipientID: default None. If set, only release this recipient's
+                messages; otherwise release for everyone
+
+        Returns:
+            decision_points: a LetterRecieved or RumorRecieved for each letter
+                or rumor released, in order of receipt. Those already moved
+                to an inbox by getMessages() are reported here too
+        """
+        tick = self.toTick(tick)
+        if recipientID is None:
+            recipient_ids = list(self.pending.keys())
+        else:
+            recipient_ids = [int(recipientID)]
+        released = self._release(tick, recipient_ids)
+        if self.unreported:
+            is_due = lambda entry: (entry[0] <= tick) and ((recipientID is None) or (entry[2]==int(recipientID)))
+            released += [entry for entry in self.unreported if is_due(entry)]
+            self.unreported = [entry for entry in self.unreported if not is_due(entry)]
+        decision_points = []
+        for receipt_tick, message_id, recipient_id in sorted(released):
+            message_type = self.records.getValue(message_id, "messageType")
+            if message_type=="LETTER":
+                decision_points.append(LetterRecieved(messageID=message_id, playerID=recipient_id, senderID=self.records.getValue(message_id, "senderID"), tick=receipt_tick))
+            elif message_type=="RUMOR":
+                decision_points.append(RumorRecieved(messageID=message_id, playerID=recipient_id, tick=receipt_tick))
+        return decision_points
+
+    def _release(self, tick:int, recipientIDs:list) -> list:
+        """Move due messages of recipients into their inboxes; return (receiptTick, messageID, recipientID) of each"""
+        released = []
+        for recipient_id in recipientIDs:
+            queue = self.pending.get(recipient_id)
+            if not queue:
+                continue
+            inbox = self.getInbox(recipient_id)
+            while queue and (queue[0][0] <= tick):
+                receipt_tick, message_id = heapq.heappop(queue)
+                inbox.add(receipt_tick, message_id)
+                released.append((receipt_tick, message_id, recipient_id))
+        return released
+
+    def getInbox(self, recipientID:int) -> Inbox:
+        """Return the Inbox of a recipient, creating it if needed"""
+        recipientID = int(recipientID)
+        inbox = self.inboxes.get(recipientID)
+        if inbox is None:
+            inbox = Inbox()
+            self.inboxes[recipientID] = inbox
+        return inbox
+
+    def getMessages(self, recipientID:int, tick:int, unreadOnly:bool=False) -> pd.DataFrame:
+        """Return messages addressed to a recipient and received by a given time
+
+        Any of the recipient's messages still queued for delivery by tick are
+        moved to its inbox first. Their decision points are not lost: the
+        next releaseDue() call covering them still reports them.
+
+        ***
+
+        Parameters:
+            recipientID: ID integer of recipient
+            tick: time at which to check for receipt
+            unreadOnly: default False. If True, only return messages not
+                returned by an earlier unreadOnly call for this recipient
+
+        Returns:
+            messages: DataFrame of records indexed by message id, in order
+                of receipt
+        """
+        tick = self.toTick(tick)
+        self.unreported += self._release(tick, [int(recipientID)])
+        inbox = self.getInbox(recipientID)
+        if unreadOnly:
+            message_ids = inbox.getUnread(self.toTick(tick))
+        else:
+            message_ids = inbox.getReceived(self.toTick(tick))
+        return self.records.take(message_ids)
+
+    def restore(self, tick:int) -> None:
+        """Rebuild inboxes and delivery queues from existing records
+
+        Messages received by tick are placed directly into inboxes and
+        counted as read; later ones are queued for delivery.
+
+        ***
+
+        Parameters:
+            tick: current time of the game being resumed
+        """
+        tick = self.toTick(tick)
+        self.inboxes = {}
+        self.pending = {}
+        self.unreported = []
+        recipient_ids = self.records.getColumn("recipientID")
+        receipt_ticks = self.records.getColumn("receiptDate")
+        for message_id in np.flatnonzero(receipt_ticks != NO_TICK):
+            recipient_id, receipt_tick = int(recipient_ids[message_id]), int(receipt_ticks[message_id])
+            if receipt_tick <= tick:
+                self.getInbox(recipient_id).add(receipt_tick, int(message_id))
+            else:
+                self._queueDelivery(recipient_id, receipt_tick, int(message_id))
+        for inbox in self.inboxes.values():
+            inbox.getUnread(tick)
+
+    def exportChronicle(self, path:str, format:str=None, since:int=0, chunkSize:int=4096) -> int:
+        """Write records from message id since onward to disk in chunks
+
+        See cubrum.chronicle.ChronicleExporter for the output formats. To
+        tail a live game, pass the returned id as since on the next call, or
+        keep a ChronicleExporter and call its export() method.
+
+        ***
+
+        Parameters:
+            path: output file for CSV, or directory for Parquet and NPZ
+            format: default None. 'csv', 'parquet', or 'npz'; if None,
+                parquet when pyarrow is installed, else npz
+            since: default 0. First message id to export
+            chunkSize: default 4096. Records written per chunk
+
+        Returns:
+            next_id: id of the first message not yet exported
+        """
+        with ChronicleExporter(path, format=format, chunkSize=chunkSize, since=since) as exporter:
+            exporter.export(self)
+        return exporter.nextID
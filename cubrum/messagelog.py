@@ -0,0 +1,494 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sqlite3
+import numpy as np
+import pandas as pd
+
+MESSAGE_TYPES = [
+    "EVENT",
+    "RUMOR",
+    "LETTER"
+]
+MESSAGE_COLUMNS = {
+    "messageType":np.int8,
+    "creationDate":np.int64,
+    "creationLocation":np.int32,
+    "receiptDate":np.int64,
+    "text":object,
+    "senderID":np.int64,
+    "recipientID":np.int64,
+    "link":np.int64
+}
+NO_LINK = -1 # link of messages that reference nothing
+
+
+class MessageLog:
+    """Append-only columnar storage for message records
+
+    Records are written into preallocated fixed-size chunks, one NumPy array
+    per column, so appending never copies earlier records. Message types and
+    creation locations are stored as small integer codes into interned
+    lists. A pandas DataFrame is assembled only when asked for, and cached
+    until the next write.
+
+    ***
+
+    Attributes:
+        chunkSize:int
+        messageTypes:list
+        locations:list
+
+    Methods:
+        append() -> int
+        extend() -> int
+        setValue() -> None
+        getValue() -> object
+        getColumn() -> numpy.ndarray
+        getRecord() -> dict
+        take() -> pandas.DataFrame
+        toDataFrame() -> pandas.DataFrame
+        clone() -> MessageLog
+    """
+    def __init__(self, chunkSize:int=4096, messageTypes:list=None):
+        self.chunkSize = int(chunkSize)
+        self.messageTypes = list(messageTypes or MESSAGE_TYPES)
+        self._typeCodes = {t:i for i, t in enumerate(self.messageTypes)}
+        self.locations = []
+        self._locationCodes = {}
+        self._chunks = []
+        self._length = 0
+        self._frame = None
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return "<MessageLog: {} records>".format(self._length)
+
+    def clone(self) -> "MessageLog":
+        """Return an independent copy of this log"""
+        new_log = self.__class__(chunkSize=self.chunkSize, messageTypes=self.messageTypes)
+        new_log.locations = list(self.locations)
+        new_log._locationCodes = dict(self._locationCodes)
+        new_log._chunks = [{column:values.copy() for column, values in chunk.items()} for chunk in self._chunks]
+        new_log._length = self._length
+        return new_log
+
+    def _internLocation(self, location:str) -> int:
+        location = str(location)
+        code = self._locationCodes.get(location)
+        if code is None:
+            code = len(self.locations)
+            self.locations.append(location)
+            self._locationCodes[location] = code
+        return code
+
+    def _encode(self, column:str, value):
+        if column=="messageType":
+            try:
+                return self._typeCodes[value]
+            except KeyError:
+                raise ValueError("message type must be one of {}, got '{}'".format(self.messageTypes, value))
+        if column=="creationLocation":
+            return self._internLocation(value)
+        if column=="link":
+            return NO_LINK if value is None else int(value)
+        return value
+
+    def _decode(self, column:str, value):
+        if column=="messageType":
+            return self.messageTypes[value]
+        if column=="creationLocation":
+            return self.locations[value]
+        if column=="link":
+            return None if value==NO_LINK else int(value)
+        if column=="text":
+            return value
+        return int(value)
+
+    def _addChunk(self) -> None:
+        self._chunks.append({column:np.empty(self.chunkSize, dtype=dtype) for column, dtype in MESSAGE_COLUMNS.items()})
+
+    def _locate(self, messageID:int) -> tuple:
+        if (messageID < 0) or (messageID >= self._length):
+            raise IndexError("message id {} out of range for log of {} records".format(messageID, self._length))
+        return divmod(int(messageID), self.chunkSize)
+
+    def append(self, **record) -> int:
+        """Write one record and return its message id
+
+        Keyword arguments are the columns in MESSAGE_COLUMNS; link may be None.
+        """
+        message_id = self._length
+        chunk_index, row = divmod(message_id, self.chunkSize)
+        if chunk_index==len(self._chunks):
+            self._addChunk()
+        chunk = self._chunks[chunk_index]
+        for column in MESSAGE_COLUMNS:
+            chunk[column][row] = self._encode(column, record.get(column))
+        self._length += 1
+        self._frame = None
+        return message_id
+
+    def extend(self, **columns) -> int:
+        """Write many records given as parallel sequences and return the first new message id"""
+        lengths = set(len(values) for values in columns.values())
+        assert len(lengths)==1, "all columns must have the same length, got lengths {}".format(lengths)
+        count = lengths.pop()
+        encoded = {}
+        for column, dtype in MESSAGE_COLUMNS.items():
+            values = columns.get(column, [None]*count)
+            if column in ["messageType", "creationLocation", "link"]:
+                encoded[column] = np.array([self._encode(column, v) for v in values], dtype=dtype)
+            elif dtype is object:
+                encoded[column] = np.empty(count, dtype=object)
+                encoded[column][:] = list(values)
+            else:
+                encoded[column] = np.asarray(values, dtype=dtype)
+        first_id = self._length
+        written = 0
+        while written < count:
+            chunk_index, row = divmod(self._length, self.chunkSize)
+            if chunk_index==len(self._chunks):
+                self._addChunk()
+            n = min(self.chunkSize - row, count - written)
+            chunk = self._chunks[chunk_index]
+            for column in MESSAGE_COLUMNS:
+                chunk[column][row:row+n] = encoded[column][written:written+n]
+            written += n
+            self._length += n
+        self._frame = None
+        return first_id
+
+    def setValue(self, messageID:int, column:str, value) -> None:
+        """Overwrite a single field of an existing record"""
+        assert column in MESSAGE_COLUMNS, "unknown column '{}'".format(column)
+        chunk_index, row = self._locate(messageID)
+        self._chunks[chunk_index][column][row] = self._encode(column, value)
+        self._frame = None
+
+    def getValue(self, messageID:int, column:str):
+        assert column in MESSAGE_COLUMNS, "unknown column '{}'".format(column)
+        chunk_index, row = self._locate(messageID)
+        return self._decode(column, self._chunks[chunk_index][column][row])
+
+    def getRecord(self, messageID:int) -> dict:
+        return {column:self.getValue(messageID, column) for column in MESSAGE_COLUMNS}
+
+    def getColumn(self, column:str, start:int=0, stop:int=None) -> np.ndarray:
+        """Return raw stored values of one column for message ids in [start, stop)
+
+        messageType and creationLocation are returned as integer codes, and
+        missing links as NO_LINK.
+        """
+        assert column in MESSAGE_COLUMNS, "unknown column '{}'".format(column)
+        stop = self._length if stop is None else min(int(stop), self._length)
+        start = max(int(start), 0)
+        if start >= stop:
+            return np.empty(0, dtype=MESSAGE_COLUMNS[column])
+        first_chunk = start // self.chunkSize
+        last_chunk = (stop - 1) // self.chunkSize
+        pieces = []
+        for chunk_index in range(first_chunk, last_chunk+1):
+            chunk_start = chunk_index * self.chunkSize
+            lo = max(start - chunk_start, 0)
+            hi = min(stop - chunk_start, self.chunkSize)
+            pieces.append(self._chunks[chunk_index][column][lo:hi])
+        return np.concatenate(pieces)
+
+    def _buildFrame(self, columns:dict, index) -> pd.DataFrame:
+        link = pd.array(columns["link"], dtype="Int64")
+        link[columns["link"]==NO_LINK] = pd.NA
+        return pd.DataFrame(
+            {
+                "messageType":pd.Categorical.from_codes(columns["messageType"], categories=self.messageTypes),
+                "creationDate":columns["creationDate"],
+                "creationLocation":pd.Categorical.from_codes(columns["creationLocation"], categories=pd.Index(self.locations, dtype=object)),
+                "receiptDate":columns["receiptDate"],
+                "text":columns["text"],
+                "senderID":columns["senderID"],
+                "recipientID":columns["recipientID"],
+                "link":link
+            },
+            index=index
+        )
+
+    def toDataFrame(self, start:int=0, stop:int=None) -> pd.DataFrame:
+        """Return records with message ids in [start, stop) as a DataFrame indexed by message id
+
+        The full view is cached until the next write.
+        """
+        full_view = (start==0) and (stop is None)
+        if full_view and (self._frame is not None):
+            return self._frame
+        stop = self._length if stop is None else min(int(stop), self._length)
+        columns = {column:self.getColumn(column, start, stop) for column in MESSAGE_COLUMNS}
+        frame = self._buildFrame(columns, pd.RangeIndex(max(start, 0), max(stop, start, 0)))
+        if full_view:
+            self._frame = frame
+        return frame
+
+    def take(self, messageIDs) -> pd.DataFrame:
+        """Return the records with the given message ids as a DataFrame"""
+        message_ids = np.asarray(messageIDs, dtype=np.int64)
+        if len(message_ids) and ((message_ids.min() < 0) or (message_ids.max() >= self._length)):
+            raise IndexError("message ids out of range for log of {} records".format(self._length))
+        chunk_indices, rows = np.divmod(message_ids, self.chunkSize)
+        columns = {}
+        for column, dtype in MESSAGE_COLUMNS.items():
+            values = np.empty(len(message_ids), dtype=dtype)
+            for chunk_index in np.unique(chunk_indices):
+                mask = chunk_indices==chunk_index
+                values[mask] = self._chunks[chunk_index][column][rows[mask]]
+            columns[column] = values
+        return self._buildFrame(columns, pd.Index(message_ids))
+
+
+class SQLiteMessageLog:
+    """Message records persisted to a local SQLite file
+
+    Has the same interface as MessageLog, so it can be passed to
+    MessageHandler as its storage: getColumn() returns the same integer
+    codes for messageType and creationLocation, and the full DataFrame is
+    cached until the next write. Appends are buffered and written in
+    batched transactions; the buffer is flushed whenever it fills and
+    before any read. Reopening an existing file continues its records.
+
+    Only the records themselves move to disk. A MessageHandler using this
+    storage still keeps its inboxes and delivery queues in memory, one
+    (receiptTick, messageID) pair per delivered message, so its memory use
+    grows with the campaign, though far more slowly than with MessageLog.
+
+    ***
+
+    Attributes:
+        path:str
+        batchSize:int
+        messageTypes:list
+        locations:list
+        connection:sqlite3.Connection
+
+    Methods:
+        append() -> int
+        extend() -> int
+        flush() -> None
+        close() -> None
+        setValue() -> None
+        getValue() -> object
+        getColumn() -> numpy.ndarray
+        getRecord() -> dict
+        take() -> pandas.DataFrame
+        toDataFrame() -> pandas.DataFrame
+        clone() -> SQLiteMessageLog
+    """
+    def __init__(self, path:str, batchSize:int=1000, messageTypes:list=None):
+        self.path = str(path)
+        self.batchSize = int(batchSize)
+        self.messageTypes = list(messageTypes or MESSAGE_TYPES)
+        self._typeCodes = {t:i for i, t in enumerate(self.messageTypes)}
+        self.locations = []
+        self._locationCodes = {}
+        self._frame = None
+        self.connection = sqlite3.connect(self.path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "id INTEGER PRIMARY KEY, messageType TEXT NOT NULL, creationDate INTEGER NOT NULL, "
+                "creationLocation TEXT, receiptDate INTEGER NOT NULL, text TEXT, "
+                "senderID INTEGER NOT NULL, recipientID INTEGER NOT NULL, link INTEGER)"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS messages_recipient_receipt ON messages (recipientID, receiptDate)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS messages_type ON messages (messageType)")
+        self._length = self.connection.execute("SELECT COALESCE(MAX(id)+1, 0) FROM messages").fetchone()[0]
+        self._buffer = []
+        for (location,) in self.connection.execute("SELECT creationLocation FROM messages ORDER BY id"):
+            self._internLocation(location)
+
+    def __len__(self):
+        return self._length
+
+    def __repr__(self):
+        return "<SQLiteMessageLog: {} records in {}>".format(self._length, self.path)
+
+    def clone(self, path:str=":memory:") -> "SQLiteMessageLog":
+        """Return an independent copy of this log in a new database
+
+        ***
+
+        Parameters:
+            path: default ':memory:', for a copy held in memory. Otherwise
+                the file to copy to, which must not already hold records
+        """
+        self.flush()
+        new_connection = sqlite3.connect(str(path))
+        if (path != ":memory:") and new_connection.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='messages'").fetchone():
+            new_connection.close()
+            raise ValueError("cannot clone into '{}', which already holds messages".format(path))
+        self.connection.backup(new_connection)
+        new_log = self.__class__.__new__(self.__class__)
+        new_log.path = str(path)
+        new_log.batchSize = self.batchSize
+        new_log.messageTypes = list(self.messageTypes)
+        new_log._typeCodes = dict(self._typeCodes)
+        new_log.locations = list(self.locations)
+        new_log._locationCodes = dict(self._locationCodes)
+        new_log._frame = None
+        new_log.connection = new_connection
+        new_log._length = self._length
+        new_log._buffer = []
+        return new_log
+
+    def _internLocation(self, location:str) -> int:
+        location = str(location)
+        code = self._locationCodes.get(location)
+        if code is None:
+            code = len(self.locations)
+            self.locations.append(location)
+            self._locationCodes[location] = code
+        return code
+
+    def _encodeRow(self, messageID:int, record:dict) -> tuple:
+        if record.get("messageType") not in self.messageTypes:
+            raise ValueError("message type must be one of {}, got '{}'".format(self.messageTypes, record.get("messageType")))
+        link = record.get("link")
+        location = str(record.get("creationLocation")) # missing locations are stored as 'None', as by MessageLog
+        self._internLocation(location)
+        return (
+            int(messageID),
+            str(record["messageType"]),
+            int(record["creationDate"]),
+            location,
+            int(record["receiptDate"]),
+            None if record.get("text") is None else str(record["text"]),
+            int(record["senderID"]),
+            int(record["recipientID"]),
+            None if (link is None) or (link==NO_LINK) else int(link)
+        )
+
+    def append(self, **record) -> int:
+        message_id = self._length
+        self._buffer.append(self._encodeRow(message_id, record))
+        self._length += 1
+        self._frame = None
+        if len(self._buffer) >= self.batchSize:
+            self.flush()
+        return message_id
+
+    def extend(self, **columns) -> int:
+        """Write many records given as parallel sequences and return the first new message id
+
+        Missing optional columns (creationLocation, text, link) are filled
+        as by MessageLog.extend().
+        """
+        lengths = set(len(values) for values in columns.values())
+        assert len(lengths)==1, "all columns must have the same length, got lengths {}".format(lengths)
+        count = lengths.pop()
+        first_id = self._length
+        for i in range(count):
+            self._buffer.append(self._encodeRow(first_id+i, {column:values[i] for column, values in columns.items()}))
+        self._length += count
+        self._frame = None
+        if len(self._buffer) >= self.batchSize:
+            self.flush()
+        return first_id
+
+    def flush(self) -> None:
+        """Write buffered records in a single transaction"""
+        if not self._buffer:
+            return
+        with self.connection:
+            self.connection.executemany("INSERT INTO messages VALUES (?,?,?,?,?,?,?,?,?)", self._buffer)
+        self._buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+    def _checkID(self, messageID:int) -> int:
+        if (messageID < 0) or (messageID >= self._length):
+            raise IndexError("message id {} out of range for log of {} records".format(messageID, self._length))
+        return int(messageID)
+
+    def setValue(self, messageID:int, column:str, value) -> None:
+        assert column in MESSAGE_COLUMNS, "unknown column '{}'".format(column)
+        messageID = self._checkID(messageID)
+        if column=="link" and value==NO_LINK:
+            value = None
+        if column=="messageType" and value not in self.messageTypes:
+            raise ValueError("message type must be one of {}, got '{}'".format(self.messageTypes, value))
+        if column=="creationLocation":
+            self._internLocation(value)
+        self._frame = None
+        self.flush()
+        with self.connection:
+            self.connection.execute("UPDATE messages SET {}=? WHERE id=?".format(column), (value if (value is None) or isinstance(value, str) else int(value), messageID))
+
+    def getValue(self, messageID:int, column:str):
+        assert column in MESSAGE_COLUMNS, "unknown column '{}'".format(column)
+        messageID = self._checkID(messageID)
+        self.flush()
+        return self.connection.execute("SELECT {} FROM messages WHERE id=?".format(column), (messageID,)).fetchone()[0]
+
+    def getRecord(self, messageID:int) -> dict:
+        messageID = self._checkID(messageID)
+        self.flush()
+        row = self.connection.execute("SELECT {} FROM messages WHERE id=?".format(", ".join(MESSAGE_COLUMNS)), (messageID,)).fetchone()
+        return dict(zip(MESSAGE_COLUMNS, row))
+
+    def getColumn(self, column:str, start:int=0, stop:int=None) -> np.ndarray:
+        """Return values of one column for message ids in [start, stop), encoded as by MessageLog.getColumn()"""
+        assert column in MESSAGE_COLUMNS, "unknown column '{}'".format(column)
+        stop = self._length if stop is None else min(int(stop), self._length)
+        self.flush()
+        rows = self.connection.execute("SELECT {} FROM messages WHERE id>=? AND id<? ORDER BY id".format(column), (int(start), stop)).fetchall()
+        values = [row[0] for row in rows]
+        if column=="link":
+            values = [NO_LINK if v is None else v for v in values]
+        elif column=="messageType":
+            values = [self._typeCodes[v] for v in values]
+        elif column=="creationLocation":
+            values = [self._locationCodes[v] for v in values]
+        if column=="text":
+            array = np.empty(len(values), dtype=object)
+            array[:] = values
+            return array
+        return np.array(values, dtype=MESSAGE_COLUMNS[column])
+
+    def _buildFrame(self, rows:list) -> pd.DataFrame:
+        frame = pd.DataFrame.from_records(rows, columns=["id"]+list(MESSAGE_COLUMNS), index="id")
+        frame.index.name = None
+        frame["messageType"] = pd.Categorical(frame["messageType"], categories=self.messageTypes)
+        frame["creationLocation"] = pd.Categorical(frame["creationLocation"].astype(object), categories=pd.Index(self.locations, dtype=object))
+        for column in ["creationDate", "receiptDate", "senderID", "recipientID"]:
+            frame[column] = frame[column].astype(np.int64)
+        frame["link"] = frame["link"].astype("Int64")
+        return frame
+
+    def toDataFrame(self, start:int=0, stop:int=None) -> pd.DataFrame:
+        """Return records with message ids in [start, stop) as a DataFrame indexed by message id
+
+        The full view is cached until the next write.
+        """
+        full_view = (start==0) and (stop is None)
+        if full_view and (self._frame is not None):
+            return self._frame
+        stop = self._length if stop is None else min(int(stop), self._length)
+        self.flush()
+        rows = self.connection.execute("SELECT id, {} FROM messages WHERE id>=? AND id<? ORDER BY id".format(", ".join(MESSAGE_COLUMNS)), (int(start), stop)).fetchall()
+        frame = self._buildFrame(rows)
+        if full_view:
+            self._frame = frame
+        return frame
+
+    def take(self, messageIDs) -> pd.DataFrame:
+        message_ids = [self._checkID(int(i)) for i in messageIDs]
+        self.flush()
+        rows_by_id = {}
+        for i in range(0, len(message_ids), 500): # stay under the SQLite parameter limit
+            batch = message_ids[i:i+500]
+            query = "SELECT id, {} FROM messages WHERE id IN ({})".format(", ".join(MESSAGE_COLUMNS), ",".join("?"*len(batch)))
+            for row in self.connection.execute(query, batch):
+                rows_by_id[row[0]] = row
+        return self._buildFrame([rows_by_id[i] for i in message_ids])
@@ -138,6 +138,7 @@ class Proceed(PlayerAction):
         if res_clock:
             res_clock.updateContext(playerID=self.playerID)
             decision_points.append(res_clock)
+        decision_points += state.messages.releaseDue(state.clock.getPlayerTick(self.playerID), recipientID=self.playerID)
         return decision_points
         
 
@@ -5,7 +5,7 @@ log = logging.getLogger(__name__)
 from typing import Union
 
 from .decisionpoint import DecisionPoint, ArmyGathered, CrossroadsReached, NodeOccupied, StrongholdReached
-from .exceptions import InvalidActionError, InvalidPositionError
+from .exceptions import InvalidActionError, InvalidPositionError, NoPathError
 from .map import Map
 
 
@@ -25,6 +25,9 @@ class PointPosition:
         setOrientation() -> None
         move() -> DecisionPoint
         getDistance() -> float
+        getDistanceField() -> dict
+        getEndpointDistances() -> dict
+        getDistanceWithField() -> float
     """
     def __init__(self, mapLocation:Union[str, tuple], map:Map, orientation:str=None, distanceToDestination:float=None):
         self.mapLocation = mapLocation
@@ -68,8 +71,9 @@ class PointPosition:
         except AssertionError as e:
             raise InvalidPositionError(e)
         
-    def copy(self) -> "PointPosition":
-        return PointPosition(mapLocation=self.mapLocation, map=self.map, orientation=self.orientation, distanceToDestination=self.distanceToDestination)
+    def copy(self, map:Map=None) -> "PointPosition":
+        """Return a copy of this position, optionally placed on another map with the same topology"""
+        return PointPosition(mapLocation=self.mapLocation, map=(self.map if map is None else map), orientation=self.orientation, distanceToDestination=self.distanceToDestination)
     
     def isSameLocation(self, other:"PointPosition") -> bool:
         """Returns whether two PointPositions are in the same location, regardless of orientation"""
@@ -241,6 +245,54 @@ class PointPosition:
                     distance_choices.append(distance_to_adjacent_node+(self.getDescription()['distance'] - self.distanceToDestination))
             return round(distance_choices[0] if (distance_choices[0] < distance_choices[1]) else distance_choices[1], 2)
 
+    def getDistanceField(self, exclusion_function=None, cutoff:float=None) -> dict:
+        """Return distance in leagues from this position to every reachable node
+
+        Runs a single shortest-path search, so the result can be reused with
+        getDistanceWithField() for any number of other positions.
+
+        ***
+
+        Parameters:
+            exclusion_function, cutoff: as in Map.getDistanceField()
+        """
+        return self.map.getDistanceField(self.getEndpointDistances(), exclusion_function=exclusion_function, cutoff=cutoff)
+
+    def getEndpointDistances(self) -> dict:
+        """Return distance in leagues to this position's node, or to both ends of its edge"""
+        self.validate()
+        if self.getPositionType()=="node":
+            return {self.mapLocation:0}
+        return {
+            self.orientation:self.distanceToDestination,
+            self.getOrigin():self.getDescription()['distance'] - self.distanceToDestination
+        }
+
+    def getDistanceWithField(self, other:"PointPosition", distanceField:dict) -> float:
+        """Return getDistance(other), looking up route lengths in distanceField
+
+        ***
+
+        Parameters:
+            other: position to measure to
+            distanceField: result of self.getDistanceField()
+        """
+        other.validate()
+        if (self.getPositionType()=="edge") and (other.getPositionType()=="edge") and (set(self.mapLocation)==set(other.mapLocation)):
+            return self.getDistance(other) # same edge, no route search needed
+        try:
+            if other.getPositionType()=="node":
+                return round(distanceField[other.mapLocation], 2)
+            distance_choices = []
+            for node_name in other.mapLocation:
+                if node_name==other.orientation:
+                    distance_choices.append(distanceField[node_name]+other.distanceToDestination)
+                else:
+                    distance_choices.append(distanceField[node_name]+(other.getDescription()['distance'] - other.distanceToDestination))
+            return round(min(distance_choices), 2)
+        except KeyError:
+            raise NoPathError("Cannot find path between '{}' and '{}'".format(self, other))
+
 
 class ColumnPosition:
     """Position of an Army column on a map, spread out or concentrated
@@ -257,6 +309,7 @@ class ColumnPosition:
         reverseCourse() -> None
         getCurrentLength() -> float
         setDestination() -> None
+        copy() -> ColumnPosition
 
     """
     def __init__(self, vanPosition:PointPosition, rearPosition:PointPosition=None, columnLength:float=None, waypoints:list=None):
@@ -275,6 +328,10 @@ class ColumnPosition:
             self_description = "column {} leagues long; van is {}; rear is {})".format(self.getCurrentLength(), van_description, rear_description)
         return self_description
 
+    def copy(self, map:Map=None) -> "ColumnPosition":
+        """Return a copy of this column, optionally placed on another map with the same topology"""
+        return ColumnPosition(vanPosition=self.vanPosition.copy(map), rearPosition=self.rearPosition.copy(map), columnLength=self.columnLength, waypoints=self.waypoints)
+
     def validate(self):
         self.vanPosition.validate()
         self.rearPosition.validate()
@@ -708,8 +765,8 @@ class ColumnPosition:
         if self.intersectsColumn(other):
             return -1
         min_distance = None
-        for self_position in [self.vanPosition, self.rearPosition] + [PointPosition(wp, map=self.map) for wp in self.waypoints]:
-            for other_position in [other.vanPosition, other.rearPosition] + [PointPosition(wp, map=other.map) for wp in other.waypoints]:
+        for self_position in [self.vanPosition, self.rearPosition] + [PointPosition(wp, map=self.vanPosition.map) for wp in self.waypoints]:
+            for other_position in [other.vanPosition, other.rearPosition] + [PointPosition(wp, map=other.vanPosition.map) for wp in other.waypoints]:
                 pair_distance = self_position.getDistance(other_position)    
                 if (min_distance is None) or (pair_distance < min_distance):
                     min_distance = pair_distance
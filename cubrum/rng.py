@@ -0,0 +1,84 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import numpy as np
+
+RNG_STREAMS = [ # one independent stream per subsystem of a game
+    "map",
+    "armies",
+    "battles",
+    "weather",
+    "commanders",
+    "messages",
+    "dice"
+]
+
+
+
+def getGenerator(rng:np.random.Generator=None) -> np.random.Generator:
+    """Return rng, or if it is None a Generator seeded from the global np.random state
+
+    Objects used outside a GameState fall back on the global state, so they
+    stay reproducible with np.random.seed(). Each fallback call draws a new
+    seed from it, which only the public np.random API can do; pass a
+    Generator wherever numbers are drawn in a loop.
+    """
+    if rng is not None:
+        return rng
+    return np.random.default_rng(np.random.randint(0, 2**63-1, dtype=np.int64))
+
+
+def copyGenerator(rng:np.random.Generator) -> np.random.Generator:
+    """Return a Generator that will draw the same numbers as rng, without sharing its state"""
+    bit_generator = type(rng.bit_generator)()
+    bit_generator.state = rng.bit_generator.state
+    return np.random.Generator(bit_generator)
+
+
+class RNGStreams:
+    """Random number generators of a single game, all derived from one seed
+
+    Each subsystem in RNG_STREAMS draws from its own Generator, spawned from
+    the game's SeedSequence, so the same seed and the same actions replay
+    the same game, and draws in one subsystem never shift those in another.
+    spawn() hands out further independent Generators, e.g. for parallel
+    Monte Carlo workers.
+
+    ***
+
+    Attributes:
+        seed:int
+        seedSequence:numpy.random.SeedSequence
+        streams:dict
+
+    Methods:
+        get() -> numpy.random.Generator
+        spawn() -> list
+        clone() -> RNGStreams
+    """
+    def __init__(self, seed=None):
+        self.seedSequence = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self.seed = self.seedSequence.entropy
+        children = self.seedSequence.spawn(len(RNG_STREAMS))
+        self.streams = {name:np.random.Generator(np.random.PCG64(child)) for name, child in zip(RNG_STREAMS, children)}
+
+    def __repr__(self):
+        return "<RNGStreams: seed {}>".format(self.seed)
+
+    def get(self, name:str) -> np.random.Generator:
+        assert name in self.streams, "stream must be one of {}, got '{}'".format(RNG_STREAMS, name)
+        return self.streams[name]
+
+    def spawn(self, n:int=1) -> list:
+        """Return n new Generators independent of every stream and of each other"""
+        return [np.random.Generator(np.random.PCG64(child)) for child in self.seedSequence.spawn(n)]
+
+    def clone(self) -> "RNGStreams":
+        """Return a copy whose streams continue exactly where these left off"""
+        new_streams = self.__class__.__new__(self.__class__)
+        sequence = self.seedSequence
+        new_streams.seedSequence = np.random.SeedSequence(sequence.entropy, spawn_key=sequence.spawn_key, pool_size=sequence.pool_size, n_children_spawned=sequence.n_children_spawned)
+        new_streams.seed = self.seed
+        new_streams.streams = {name:copyGenerator(rng) for name, rng in self.streams.items()}
+        return new_streams
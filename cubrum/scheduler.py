@@ -0,0 +1,148 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import heapq
+
+
+class ScheduledEvent:
+    """A pending occurrence at a fixed point in game time
+
+    ***
+
+    Attributes:
+        time: when the event fires
+        kind:str
+        context:dict
+        eventID:int
+        transient:bool
+    """
+    def __init__(self, time, kind:str, eventID:int, transient:bool=False, **kwargs):
+        self.time = time
+        self.kind = str(kind)
+        self.eventID = int(eventID)
+        self.transient = bool(transient)
+        self.context = {**kwargs}
+
+    def __getattr__(self, name):
+        if name == "context":
+            raise AttributeError(name)
+        return self.context.get(name, None)
+
+    def __repr__(self):
+        return "<{} at {}>".format(self.kind, self.time)
+
+
+class Scheduler:
+    """Priority queue of pending events, ordered by time
+
+    Durable events (e.g. dawn, dusk, letter receipts) stay queued until they
+    fire or are cancelled. Transient events are predictions derived from the
+    current game state (e.g. arrivals, encounters) and are discarded in bulk
+    by clearTransient() whenever that state may have changed.
+
+    ***
+
+    Attributes:
+        queue:list
+
+    Methods:
+        schedule() -> int
+        cancel() -> None
+        clearTransient() -> None
+        peek() -> ScheduledEvent
+        getNextTime() -> object
+        popDue() -> list
+        clone() -> Scheduler
+    """
+    def __init__(self):
+        self.queue = []
+        self._nextID = 0
+        self._pending = set() # ids of queued events that have neither fired nor been cancelled
+        self._transient = set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __repr__(self):
+        return "<Scheduler: {} pending>".format(len(self))
+
+    def clone(self) -> "Scheduler":
+        """Return an independent copy of this queue; events themselves are shared, as they never change once queued"""
+        new_scheduler = self.__class__()
+        new_scheduler.queue = list(self.queue)
+        new_scheduler._nextID = self._nextID
+        new_scheduler._pending = set(self._pending)
+        new_scheduler._transient = set(self._transient)
+        return new_scheduler
+
+    def schedule(self, time, kind:str, transient:bool=False, **kwargs) -> int:
+        """Add an event to the queue and return its ID
+
+        ***
+
+        Parameters:
+            time: when the event should fire
+            kind: string name of the event type
+            transient: default False. If True, the event is dropped at the
+                next call to clearTransient()
+            kwargs: context attached to the event
+        """
+        event_id = self._nextID
+        self._nextID += 1
+        event = ScheduledEvent(time, kind, eventID=event_id, transient=transient, **kwargs)
+        if transient:
+            self._transient.add(event_id)
+        heapq.heappush(self.queue, (time, event_id, event))
+        self._pending.add(event_id)
+        return event_id
+
+    def cancel(self, eventID:int) -> None:
+        """Mark an event so that it never fires; events already fired or cancelled, and unknown ids, are ignored"""
+        self._pending.discard(eventID)
+        self._transient.discard(eventID)
+
+    def clearTransient(self) -> None:
+        """Invalidate all transient events currently queued"""
+        self._pending -= self._transient
+        self._transient.clear()
+        if len(self.queue) > 2*len(self._pending) + 64: # compact stale entries
+            self.queue = [entry for entry in self.queue if self._isLive(entry[2])]
+            heapq.heapify(self.queue)
+
+    def _isLive(self, event:ScheduledEvent) -> bool:
+        return event.eventID in self._pending
+
+    def _discard(self, event:ScheduledEvent) -> None:
+        self._pending.discard(event.eventID)
+        self._transient.discard(event.eventID)
+
+    def _dropStale(self) -> None:
+        while self.queue and not self._isLive(self.queue[0][2]):
+            heapq.heappop(self.queue)
+
+    def peek(self) -> ScheduledEvent:
+        """Return the earliest live event without removing it, or None"""
+        self._dropStale()
+        if not self.queue:
+            return None
+        return self.queue[0][2]
+
+    def getNextTime(self):
+        """Return the time of the earliest live event, or None"""
+        next_event = self.peek()
+        if next_event is None:
+            return None
+        return next_event.time
+
+    def popDue(self, time) -> list:
+        """Remove and return all live events at or before time, in order"""
+        due = []
+        while True:
+            self._dropStale()
+            if (not self.queue) or (self.queue[0][0] > time):
+                break
+            _, _, event = heapq.heappop(self.queue)
+            self._discard(event)
+            due.append(event)
+        return due
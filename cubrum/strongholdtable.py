@@ -0,0 +1,234 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+from types import MappingProxyType
+import numpy as np
+import pandas as pd
+
+STRONGHOLD_COLUMNS = {
+    "maxSupply":np.int64,
+    "currentSupply":np.int64,
+    "maxLoot":np.int64,
+    "currentLoot":np.int64,
+    "defenses":np.int16,
+    "garrisonInfantry":np.int32,
+    "garrisonCavalry":np.int32,
+    "heldBy":np.int16
+}
+TABLE_ATTRIBUTES = [ # node attributes whose values are kept in the table
+    "currentSupply",
+    "currentLoot",
+    "garrison",
+    "heldBy",
+    "taxed",
+    "levied"
+]
+GARRISON_COLUMNS = { # garrison keys kept in typed columns; any others are kept as given
+    "infantryCount":"garrisonInfantry",
+    "cavalryCount":"garrisonCavalry"
+}
+NO_FACTION = -1
+SUPPLY_REGENERATION_PERCENT = 10 # of maxSupply, per day
+
+
+class StrongholdTable:
+    """Economic state of every stronghold on a map, one row per stronghold
+
+    Each quantity is a typed NumPy column, so updates across many
+    strongholds (daily supply regrowth, taxing every holding of a faction)
+    are single array operations. Holding factions are stored as integer
+    codes into the factions list, and which factions have taxed or levied
+    each stronghold as boolean matrices with one column per faction.
+
+    Values read through getAttribute() are built from the columns on every
+    read, so they are immutable (tuples, and a read-only mapping for
+    garrison): change them by assigning a new value with setAttribute().
+
+    ***
+
+    Attributes:
+        names:list
+        rowIndex:dict
+        factions:list
+        columns:dict
+        garrisonNames:list
+        garrisonExtras:list
+        taxed:numpy.ndarray
+        levied:numpy.ndarray
+
+    Methods:
+        fromAttributes() -> StrongholdTable
+        clone() -> StrongholdTable
+        getFactionCode() -> int
+        getHoldings() -> numpy.ndarray
+        getTotal() -> int
+        getAttribute() -> object
+        setAttribute() -> None
+        regenerateSupply() -> int
+        tax() -> int
+        levy() -> dict
+        pillage() -> int
+        toDataFrame() -> pandas.DataFrame
+    """
+    @staticmethod
+    def fromAttributes(strongholds:list) -> "StrongholdTable":
+        """Build a table from (name, attribute dict) pairs, as filled in by Map.fillDefaults"""
+        table = StrongholdTable([name for name, _ in strongholds])
+        for row, (name, attributes) in enumerate(strongholds):
+            for column in ["maxSupply", "maxLoot", "defenses"]:
+                table.columns[column][row] = attributes.get(column) or 0
+            table.columns["currentSupply"][row] = attributes.get("currentSupply", table.columns["maxSupply"][row])
+            table.columns["currentLoot"][row] = attributes.get("currentLoot", table.columns["maxLoot"][row])
+            for attribute in ["garrison", "heldBy", "taxed", "levied"]:
+                if attributes.get(attribute) is not None:
+                    table.setAttribute(row, attribute, attributes[attribute])
+        return table
+
+    def __init__(self, names:list, factions:list=None):
+        self.names = list(names)
+        self.rowIndex = {name:row for row, name in enumerate(self.names)}
+        self.factions = list(factions or [])
+        self._factionCodes = {faction:code for code, faction in enumerate(self.factions)}
+        self.columns = {column:np.zeros(len(self.names), dtype=dtype) for column, dtype in STRONGHOLD_COLUMNS.items()}
+        self.columns["heldBy"][:] = NO_FACTION
+        self.garrisonNames = [None]*len(self.names)
+        self.garrisonExtras = [{} for _ in self.names] # garrison keys other than name and GARRISON_COLUMNS
+        self.taxed = np.zeros((len(self.names), len(self.factions)), dtype=bool)
+        self.levied = np.zeros((len(self.names), len(self.factions)), dtype=bool)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return "<StrongholdTable: {} strongholds, {} factions>".format(len(self.names), len(self.factions))
+
+    def clone(self) -> "StrongholdTable":
+        new_table = self.__class__.__new__(self.__class__)
+        new_table.names = self.names # never changes after construction
+        new_table.rowIndex = self.rowIndex
+        new_table.factions = list(self.factions)
+        new_table._factionCodes = dict(self._factionCodes)
+        new_table.columns = {column:values.copy() for column, values in self.columns.items()}
+        new_table.garrisonNames = list(self.garrisonNames)
+        new_table.garrisonExtras = [dict(extras) for extras in self.garrisonExtras]
+        new_table.taxed = self.taxed.copy()
+        new_table.levied = self.levied.copy()
+        return new_table
+
+    def getFactionCode(self, faction:str, add:bool=False) -> int:
+        """Return the integer code of a faction, or NO_FACTION if unknown and add is False"""
+        code = self._factionCodes.get(faction)
+        if code is None:
+            if not add:
+                return NO_FACTION
+            code = len(self.factions)
+            self.factions.append(faction)
+            self._factionCodes[faction] = code
+            empty_column = np.zeros((len(self.names), 1), dtype=bool)
+            self.taxed = np.hstack([self.taxed, empty_column])
+            self.levied = np.hstack([self.levied, empty_column])
+        return code
+
+    def getHoldings(self, faction:str) -> np.ndarray:
+        """Return a boolean mask of strongholds held by faction"""
+        code = self._factionCodes.get(faction)
+        if code is None:
+            return np.zeros(len(self.names), dtype=bool)
+        return self.columns["heldBy"] == code
+
+    def getTotal(self, column:str, faction:str=None) -> int:
+        """Sum a column over all strongholds, or over those held by faction"""
+        assert column in STRONGHOLD_COLUMNS, "unknown column '{}'".format(column)
+        values = self.columns[column]
+        if faction is not None:
+            values = values[self.getHoldings(faction)]
+        return int(values.sum())
+
+    def getAttribute(self, row:int, attribute:str):
+        """Return a stronghold's value of a node attribute in TABLE_ATTRIBUTES, in its Map form
+
+        taxed and levied are returned as tuples and garrison as a read-only
+        mapping, so that editing them in place raises instead of being lost.
+        """
+        if attribute in ["currentSupply", "currentLoot"]:
+            return int(self.columns[attribute][row])
+        if attribute=="heldBy":
+            code = self.columns["heldBy"][row]
+            return None if code==NO_FACTION else self.factions[code]
+        if attribute=="garrison":
+            if self.garrisonNames[row] is None:
+                return None
+            garrison = {'name':self.garrisonNames[row], 'infantryCount':int(self.columns["garrisonInfantry"][row])}
+            if self.columns["garrisonCavalry"][row] > 0:
+                garrison['cavalryCount'] = int(self.columns["garrisonCavalry"][row])
+            garrison.update(self.garrisonExtras[row])
+            return MappingProxyType(garrison)
+        if attribute in ["taxed", "levied"]:
+            flags = getattr(self, attribute)[row]
+            return tuple(self.factions[code] for code in np.flatnonzero(flags))
+        raise KeyError(attribute)
+
+    def setAttribute(self, row:int, attribute:str, value) -> None:
+        """Set a stronghold's value of a node attribute in TABLE_ATTRIBUTES from its Map form"""
+        if attribute in ["currentSupply", "currentLoot"]:
+            self.columns[attribute][row] = value
+        elif attribute=="heldBy":
+            self.columns["heldBy"][row] = NO_FACTION if value is None else self.getFactionCode(value, add=True)
+        elif attribute=="garrison":
+            value = value or {}
+            self.garrisonNames[row] = value.get('name')
+            for key, column in GARRISON_COLUMNS.items():
+                self.columns[column][row] = value.get(key, 0)
+            self.garrisonExtras[row] = {key:v for key, v in value.items() if (key!="name") and (key not in GARRISON_COLUMNS)}
+        elif attribute in ["taxed", "levied"]:
+            codes = [self.getFactionCode(faction, add=True) for faction in value]
+            flags = getattr(self, attribute)
+            flags[row] = False
+            flags[row, codes] = True
+        else:
+            raise KeyError(attribute)
+
+    def regenerateSupply(self, days:int=1, percent:float=SUPPLY_REGENERATION_PERCENT) -> int:
+        """Restore a percentage of maxSupply to every stronghold, up to its maximum, and return the total restored"""
+        current = self.columns["currentSupply"]
+        maximum = self.columns["maxSupply"]
+        regrown = np.minimum(current + (maximum * (percent/100) * days).astype(np.int64), maximum)
+        regrown = np.maximum(regrown, current) # never reduce supply already above maximum
+        restored = int((regrown - current).sum())
+        self.columns["currentSupply"] = regrown
+        return restored
+
+    def tax(self, faction:str, percent:float) -> int:
+        """Collect a percentage of current loot from every stronghold held by faction and return the total"""
+        held = self.getHoldings(faction)
+        collected = (self.columns["currentLoot"][held] * (percent/100)).astype(np.int64)
+        self.columns["currentLoot"][held] -= collected
+        if held.any():
+            self.taxed[held, self.getFactionCode(faction)] = True
+        return int(collected.sum())
+
+    def levy(self, faction:str, percent:float) -> dict:
+        """Draw a percentage of the garrisons of every stronghold held by faction and return the troops raised"""
+        held = self.getHoldings(faction)
+        raised = {}
+        for column, key in [("garrisonInfantry", "infantryCount"), ("garrisonCavalry", "cavalryCount")]:
+            drawn = (self.columns[column][held] * (percent/100)).astype(self.columns[column].dtype)
+            self.columns[column][held] -= drawn
+            raised[key] = int(drawn.sum())
+        if held.any():
+            self.levied[held, self.getFactionCode(faction)] = True
+        return raised
+
+    def pillage(self, name:str) -> int:
+        """Strip a stronghold of all its loot and return the amount taken"""
+        row = self.rowIndex[name]
+        loot = int(self.columns["currentLoot"][row])
+        self.columns["currentLoot"][row] = 0
+        return loot
+
+    def toDataFrame(self) -> pd.DataFrame:
+        """Return the table as a DataFrame indexed by stronghold name"""
+        frame = pd.DataFrame({column:values for column, values in self.columns.items() if column!="heldBy"}, index=pd.Index(self.names, name="name"))
+        frame["heldBy"] = pd.Categorical.from_codes(self.columns["heldBy"], categories=pd.Index(self.factions, dtype=object))
+        return frame
@@ -5,6 +5,8 @@ log = logging.getLogger(__name__)
 import datetime
 import numpy as np
 
+from .rng import getGenerator
+
 class Weather:
     """Represents the weather of an area
     
@@ -13,6 +15,7 @@ class Weather:
         season:str
         currentWeather:str 
         weatherTypes:list
+        rng:numpy.random.Generator
     Methods:
         dateToSeason() -> str
         getPotentialWeather() -> list
@@ -20,8 +23,9 @@ class Weather:
         getBattleModifier() -> int
         getMovementModifier() -> int
     """
-    def __init__(self, startingSeason:str="spring", startingWeather:str="fair"):
+    def __init__(self, startingSeason:str="spring", startingWeather:str="fair", rng:np.random.Generator=None):
         self.season = startingSeason
+        self.rng = rng
         self.weatherTypes={
             'fair':{'seasons':['spring','summer','autumn','winter'], 'weight':2},
             'rain':{'battleModifier':-1, 'movementModifier':90, 'seasons':['spring','summer','autumn','winter']},
@@ -55,7 +59,7 @@ class Weather:
         potential_weather = self.getPotentialWeather(self.season)
         weights = np.array([self.weatherTypes[pw].get('weight', 1) for pw in potential_weather])
         weights_normalized = weights/weights.sum()
-        new_weather = np.random.choice(potential_weather, p=weights_normalized)
+        new_weather = getGenerator(self.rng).choice(potential_weather, p=weights_normalized)
         self.currentWeather = str(new_weather)
         return self.currentWeather
     
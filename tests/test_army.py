@@ -0,0 +1,221 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import cubrum
+from cubrum.formation import Formation
+from cubrum.formationtable import FormationTable
+
+
+class TestAggregateCache(unittest.TestCase):
+    def setUp(self):
+        self.state = cubrum.getStartingState()
+        self.army = self.state.armies[0]
+
+    def assertTotalsFresh(self):
+        self.assertEqual(self.army._computeStrength("FIELD"), self.army.getStrength())
+        self.assertEqual(self.army._computeLength(), self.army.getLength())
+        self.assertEqual(self.army._computeSupplyCapacity(), self.army.getSupplyCapacity())
+        self.assertEqual(self.army._computeSupplyConsumption()*3, self.army.getSupplyConsumption(days=3))
+        self.assertEqual(self.army._computeNoncombattantCount(), self.army.getNoncombattantCount())
+        self.assertEqual(self.army._computeInfantry(), self.army.countInfantry())
+        self.assertEqual(self.army._computeCavalry(), self.army.countCavalry())
+        self.assertEqual(self.army._computeForces(), self.army.getForces())
+        self.assertEqual(self.army._computeTravelDistance(10, False), self.army.getTravelDistance(10))
+
+    def testCachedUntilChanged(self):
+        self.assertTotalsFresh()
+        version = self.army.version
+        self.army.getStrength()
+        self.army.getForces()["wagons"] = -1
+        self.assertEqual(version, self.army.version)
+        self.assertTotalsFresh()
+
+    def testFormationChangeInvalidates(self):
+        strength = self.army.getStrength()
+        self.army.formations[0].warriorCount -= 100
+        self.assertLess(self.army.getStrength(), strength)
+        self.assertTotalsFresh()
+        self.army.formations[0].heavy = not self.army.formations[0].heavy
+        self.assertTotalsFresh()
+
+    def testFormationListChangeInvalidates(self):
+        infantry = self.army.countInfantry()
+        new_formation = Formation("Levy", warriorCount=300, wagonCount=10)
+        self.army.formations.append(new_formation)
+        self.assertEqual(infantry + 300, self.army.countInfantry())
+        new_formation.warriorCount = 200
+        self.assertEqual(infantry + 200, self.army.countInfantry())
+        self.army.formations.remove(new_formation)
+        self.assertEqual(infantry, self.army.countInfantry())
+        new_formation.warriorCount = 100 # no longer part of the army
+        self.assertEqual(infantry, self.army.countInfantry())
+        self.army.formations = self.army.formations[1:]
+        self.assertTotalsFresh()
+
+    def testSupplyConsumedEvenlyOverSteps(self):
+        self.army.formations = [Formation("small", warriorCount=10, wagonCount=0)]
+        daily = self.army.getSupplyConsumption(days=1)
+        self.assertNotEqual(0, daily % 24)
+        start = self.army.supply
+        consumed = sum(self.army.consumeSupply(1) for _ in range(24))
+        consumed += sum(self.army.consumeSupply(hours) for hours in [5, 7, 1, 11])
+        self.assertEqual(2*daily, consumed)
+        self.assertEqual(start - 2*daily, self.army.supply)
+
+    def testNoncombattantPercentInvalidates(self):
+        noncombattants = self.army.getNoncombattantCount()
+        self.army.noncombattantPercent = 2*self.army.noncombattantPercent
+        self.assertGreater(self.army.getNoncombattantCount(), noncombattants)
+        self.assertTotalsFresh()
+
+    def testCloneIsIndependent(self):
+        strength = self.army.getStrength()
+        new_army = self.army.clone()
+        new_army.formations[0].warriorCount = 0
+        self.assertEqual(strength, self.army.getStrength())
+        self.assertLess(new_army.getStrength(), strength)
+
+
+class TestFormationTable(unittest.TestCase):
+    def setUp(self):
+        self.state = cubrum.getStartingState()
+        self.army = self.state.armies[0]
+        self.tabulated = self.army.clone()
+        self.tabulated.tabulate()
+
+    def assertTotalsMatch(self):
+        for setting in ["FIELD", "SIEGEATTACK", "SIEGEDEFEND"]:
+            self.assertEqual(self.army.getStrength(setting), self.tabulated.getStrength(setting))
+        self.assertAlmostEqual(self.army.getLength(), self.tabulated.getLength())
+        self.assertEqual(self.army.getSupplyCapacity(), self.tabulated.getSupplyCapacity())
+        self.assertEqual(self.army.getSupplyConsumption(days=2), self.tabulated.getSupplyConsumption(days=2))
+        self.assertEqual(self.army.getNoncombattantCount(), self.tabulated.getNoncombattantCount())
+        self.assertEqual(self.army.countInfantry(), self.tabulated.countInfantry())
+        self.assertEqual(self.army.countCavalry(), self.tabulated.countCavalry())
+        self.assertEqual(self.army.getForces(), self.tabulated.getForces())
+        for forced in [False, True]:
+            self.assertEqual(self.army.getTravelDistance(5, forced), self.tabulated.getTravelDistance(5, forced))
+
+    def testMatchesFormations(self):
+        self.assertEqual(len(self.army.formations), len(self.tabulated.formationTable))
+        self.assertTotalsMatch()
+
+    def testFormationsAreRowViews(self):
+        formation = self.tabulated.formations[2]
+        self.assertNotIn("warriorCount", formation.__dict__)
+        formation.warriorCount = 10
+        self.assertEqual(10, self.tabulated.formationTable.rows["warriorCount"][2])
+        self.army.formations[2].warriorCount = 10
+        self.assertTotalsMatch()
+
+    def testListChangesRebuildTable(self):
+        for army in [self.army, self.tabulated]:
+            army.formations.append(Formation("Levy", warriorCount=300, wagonCount=10, cavalry=True))
+        self.assertTotalsMatch()
+        removed = self.tabulated.formations.pop(0)
+        self.army.formations.pop(0)
+        self.assertEqual(self.army.formations[0].name, self.tabulated.formations[0].name)
+        self.assertEqual(self.state.armies[0].formations[0].warriorCount, removed.warriorCount)
+        self.assertIsNone(removed._table)
+        self.assertTotalsMatch()
+
+    def testSortRebuildsTable(self):
+        version = self.tabulated.version
+        self.tabulated.getForces()
+        self.tabulated.formations.sort(key=lambda formation: formation.warriorCount)
+        self.assertGreater(self.tabulated.version, version)
+        self.assertEqual([f.warriorCount for f in self.tabulated.formations], self.tabulated.formationTable.rows["warriorCount"].tolist())
+        self.tabulated.formations.reverse()
+        self.assertEqual([f.warriorCount for f in self.tabulated.formations], self.tabulated.formationTable.rows["warriorCount"].tolist())
+        self.assertTotalsMatch()
+
+    def testSpecialChangeInvalidates(self):
+        forces = self.tabulated.getForces()
+        self.tabulated.formations[2].special = "Marines"
+        self.assertNotEqual(forces, self.tabulated.getForces())
+        self.assertEqual(self.tabulated._computeForces(), self.tabulated.getForces())
+
+    def testUntabulate(self):
+        self.tabulated.tabulate(enabled=False)
+        self.assertIsNone(self.tabulated.formationTable)
+        self.assertIn("warriorCount", self.tabulated.formations[0].__dict__)
+        self.assertTotalsMatch()
+
+    def testCloneKeepsTable(self):
+        new_army = self.tabulated.clone()
+        self.assertIsNotNone(new_army.formationTable)
+        new_army.formations[0].warriorCount = 0
+        self.assertEqual(self.army.formations[0].warriorCount, self.tabulated.formations[0].warriorCount)
+
+    def testApplyCasualties(self):
+        formations = [
+            Formation("A", warriorCount=100, wagonCount=50),
+            Formation("B", warriorCount=200, wagonCount=10, cavalry=True),
+            Formation("C", warriorCount=0, wagonCount=0)
+        ]
+        table = FormationTable(formations)
+        remaining = table.applyCasualties([50, 300, 0])
+        self.assertEqual([50, 0, 0], remaining.tolist())
+        self.assertEqual([50, 0, 0], [f.warriorCount for f in formations])
+        self.assertEqual(0, formations[1].wagonCount)
+
+    def testArmyCasualties(self):
+        warriors = self.tabulated.countInfantry() + self.tabulated.countCavalry()
+        self.tabulated.applyCasualties(count=500)
+        self.assertEqual(warriors - 500, self.tabulated.countInfantry() + self.tabulated.countCavalry())
+
+
+class TestReachable(unittest.TestCase):
+    def setUp(self):
+        self.state = cubrum.getStartingState(seed=50)
+        self.army = self.state.armies[0]
+
+    def testMatchesDistanceField(self):
+        for forced in [False, True]:
+            reachable = self.army.reachable(24, forced=forced)
+            leagues = self.army.getTravelDistance(24, forced=forced)
+            self.assertAlmostEqual(leagues/24, reachable['speed'])
+            distance_field = self.army.position.vanPosition.getDistanceField()
+            self.assertEqual({node for node, distance in distance_field.items() if distance <= leagues}, set(reachable['nodes']))
+            for node, arrival in reachable['nodes'].items():
+                self.assertAlmostEqual(distance_field[node]/reachable['speed'], arrival, places=2)
+            for stretch in reachable['roads']:
+                self.assertLessEqual(stretch['toLeagues'], self.state.map.edges[stretch['road']]['distance'])
+                self.assertLessEqual(stretch['arrival'] + (stretch['toLeagues']-stretch['fromLeagues'])/reachable['speed'], 24+1e-9)
+        self.assertGreater(len(self.army.reachable(24, forced=True)['nodes']), len(self.army.reachable(24)['nodes']))
+
+    def testMarchArrivesInTime(self):
+        reachable = self.army.reachable(48)
+        neighbor = next(iter(self.state.map.neighbors(self.army.position.vanPosition.mapLocation)))
+        self.assertIn(neighbor, reachable['nodes'])
+        self.army.setDestination(neighbor)
+        response = self.army.march(hours=reachable['nodes'][neighbor])
+        self.assertEqual(neighbor, response.name)
+        self.assertEqual(0, response.remaining_movement)
+
+    def testFromRoad(self):
+        origin = self.army.position.vanPosition.mapLocation
+        neighbor = next(iter(self.state.map.neighbors(origin)))
+        self.army.setDestination(neighbor)
+        self.army.march(hours=3)
+        van = self.army.position.vanPosition
+        reachable = self.army.reachable(2)
+        from_van = [stretch for stretch in reachable['roads'] if stretch['arrival']==0]
+        self.assertEqual({(origin, neighbor), (neighbor, origin)}, {stretch['road'] for stretch in from_van})
+        for stretch in from_van:
+            self.assertAlmostEqual(1.0, stretch['toLeagues'] - stretch['fromLeagues'])
+        self.assertAlmostEqual(van.getDescription()['distance'], sum(stretch['fromLeagues'] for stretch in from_van))
+
+    def testExcludedRoads(self):
+        reachable = self.army.reachable(48, exclusion_function=lambda u, v, d: True)
+        self.assertEqual({self.army.position.vanPosition.mapLocation:0.0}, reachable['nodes'])
+        self.assertEqual([], reachable['roads'])
+        self.assertEqual({self.army.position.vanPosition.mapLocation:0.0}, self.army.reachable(0)['nodes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
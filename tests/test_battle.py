@@ -0,0 +1,167 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+import cubrum
+import cubrum.battle
+from cubrum.battlesimulator import BattleSimulator
+from cubrum.battle import Battle, resolveBattles, applyBattleResults
+from cubrum.weather import Weather
+
+
+class TestBattleOdds(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(44)
+        self.state = cubrum.getStartingState(seed=44)
+        self.armies = self.state.armies
+        self.battle = cubrum.battle.Battle(Weather())
+        self.battle.addBelligerent(self.armies[0])
+        self.battle.addBelligerent(self.armies[1], defending=True)
+        self.sides = [army.allegience for army in self.armies]
+
+    def testMoraleFailure(self):
+        self.assertEqual(1.0, cubrum.battle.getMoraleFailureProbability(1))
+        self.assertAlmostEqual(15/36, cubrum.battle.getMoraleFailureProbability(7))
+        self.assertEqual(0.0, cubrum.battle.getMoraleFailureProbability(12))
+
+    def testEqualModifiers(self):
+        for army in self.armies:
+            army.formations = []
+            army.morale = 7
+        self.battle.belligerents[self.sides[1]]['defending'] = False
+        odds = self.battle.getOdds()
+        tie = 146/1296
+        for side in self.sides:
+            self.assertAlmostEqual((1-tie)/2, odds[side]['victory'])
+            self.assertAlmostEqual(tie, odds[side]['draw'])
+            self.assertAlmostEqual((1-tie)/2 * 15/36, odds[side]['rout'])
+        self.assertAlmostEqual(1.0, sum(outcome['probability'] for outcome in self.battle.getOutcomeDistribution()))
+
+    def testMatchesSampledResults(self):
+        self.armies[1].morale = 5
+        before = [(army.morale, army.supply, army.countInfantry()) for army in self.armies]
+        odds = self.battle.getOdds()
+        self.assertEqual(before, [(army.morale, army.supply, army.countInfantry()) for army in self.armies])
+        for side in self.sides:
+            self.assertAlmostEqual(1.0, odds[side]['victory'] + odds[side]['draw'] + odds[self.sides[1-self.sides.index(side)]]['victory'])
+            self.assertAlmostEqual(1.0, sum(odds[side]['casualtyPercent'].values()))
+        self.assertEqual(0.0, odds[self.sides[0]]['draw']) # a defender wins ties
+        outcomes = self.battle.getOutcomeDistribution()
+        for side in self.sides:
+            self.assertAlmostEqual(odds[side]['rout'], sum(o['probability'] for o in outcomes if o['consequences'][side].get('rout', False)))
+            self.assertAlmostEqual(odds[side]['victory'], sum(o['probability'] for o in outcomes if o['victoriousSide']==side))
+        trials = 3000
+        victories = 0
+        routs = 0
+        for _ in range(trials):
+            result = self.battle.generateResult()
+            victories += result.victoriousSide==self.sides[1]
+            routs += result.consequences[self.sides[1]].get('rout', False)
+        self.assertAlmostEqual(odds[self.sides[1]]['victory'], victories/trials, delta=0.03)
+        self.assertAlmostEqual(odds[self.sides[1]]['rout'], routs/trials, delta=0.03)
+
+
+    def testDistributionMatchesConsequencesTable(self):
+        self.armies[1].morale = 5
+        for defending in [True, False]:
+            self.battle.belligerents[self.sides[1]]['defending'] = defending
+            offset = self.battle.getModifiers()[self.sides[0]]['value'] - self.battle.getModifiers()[self.sides[1]]['value']
+            expected = {}
+            for index, probability in enumerate(cubrum.battle.TWO_D6_DIFFERENCE_PROBABILITIES.tolist()):
+                difference = index - 10 + offset
+                victor, defeated = self.battle._getVictor(*self.sides, difference)
+                rout = cubrum.battle.getMoraleFailureProbability(self.battle.belligerents[defeated]['army'].morale) if defeated else 0.0
+                branches = [(probability*(1-rout), None)] + [(probability*rout/6, percent) for percent in cubrum.battle.ROUT_SUPPLY_LOST_PERCENTS]
+                for branch_probability, percent in branches:
+                    if branch_probability > 0:
+                        key = repr((victor, self.battle._getConsequences(*self.sides, difference, percent)))
+                        expected[key] = expected.get(key, 0.0) + branch_probability
+            actual = {repr((o['victoriousSide'], o['consequences'])):o['probability'] for o in self.battle.getOutcomeDistribution()}
+            self.assertEqual(sorted(expected), sorted(actual))
+            for key, probability in expected.items():
+                self.assertAlmostEqual(probability, actual[key])
+
+
+class TestBattleSimulator(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(45)
+        self.state = cubrum.getStartingState(seed=45)
+        self.armies = self.state.armies
+        self.simulator = BattleSimulator.fromArmies(self.armies[0], self.armies[1], defending=2)
+
+    def testMatchesExactOdds(self):
+        before = [(army.morale, army.supply, army.countInfantry(), army.version) for army in self.armies]
+        results = self.simulator.run(trials=50000)
+        self.assertEqual(before, [(army.morale, army.supply, army.countInfantry(), army.version) for army in self.armies])
+        odds = self.simulator.battle.getOdds()
+        for army, side in zip(self.armies, self.simulator.sides):
+            warriors = army.countInfantry() + army.countCavalry()
+            self.assertAlmostEqual(odds[side]['victory'], results[side]['victories'].mean(), delta=0.01)
+            self.assertAlmostEqual(odds[side]['rout'], results[side]['routed'].mean(), delta=0.01)
+            self.assertAlmostEqual(odds[side]['expectedCasualtyPercent'], 100*results[side]['casualties'].mean()/warriors, delta=0.1)
+            self.assertTrue((results[side]['supplyLost'][~results[side]['routed']]==0).all())
+            self.assertTrue(np.isin(results[side]['retreatDistance'], [0, 1, 2]).all())
+        self.assertTrue((results['engagements']==1).all())
+
+    def testChainedEngagements(self):
+        results = self.simulator.run(trials=5000, engagements=4)
+        self.assertTrue(((results['engagements'] >= 1) & (results['engagements'] <= 4)).all())
+        routed = results[self.simulator.sides[0]]['routed'] | results[self.simulator.sides[1]]['routed']
+        self.assertTrue((results['engagements'][~routed]==4).all())
+        victories = sum(results[side]['victories'] for side in self.simulator.sides)
+        self.assertTrue((victories==results['engagements']).all()) # a defender wins ties, so every engagement is decided
+        summary = self.simulator.summarize(results)
+        self.assertGreater(summary[self.simulator.sides[1]]['victories']['mean'], summary[self.simulator.sides[0]]['victories']['mean'])
+
+
+class TestBatchedBattles(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(46)
+        self.state = cubrum.getStartingState(seed=46)
+        self.armies = self.state.armies
+
+    def makeBattle(self, attacker, defender, **kwargs):
+        battle = Battle(Weather(), **kwargs)
+        battle.addBelligerent(attacker)
+        battle.addBelligerent(defender, defending=True)
+        return battle
+
+    def testModifiersMatch(self):
+        battles = [self.makeBattle(*self.armies), self.makeBattle(*self.armies, isSiege=True, strongholdType="fortress")]
+        self.armies[0].supply = 0
+        strength = np.array([[b.getStrengths()[side] for b in battles] for side in battles[0].belligerents])
+        morale = np.array([[army.morale]*2 for army in self.armies])
+        siege = np.array([[b.getSiegeModifier(side) for b in battles] for side in battles[0].belligerents])
+        values = cubrum.battle.getModifierValues(strength, morale, np.zeros((2, 2), bool), np.zeros((2, 2), bool), np.array([[True]*2, [False]*2]), siege)
+        for i, battle in enumerate(battles):
+            modifiers = battle.getModifiers()
+            self.assertEqual([modifiers[side]['value'] for side in battle.belligerents], values[:, i].tolist())
+
+    def testResolveMatchesOdds(self):
+        battle = self.makeBattle(*self.armies)
+        odds = battle.getOdds()
+        results = resolveBattles([battle]*4000)
+        self.assertEqual(4000, len(results))
+        side = self.armies[1].allegience
+        self.assertAlmostEqual(odds[side]['victory'], np.mean([r.victoriousSide==side for r in results]), delta=0.03)
+        self.assertAlmostEqual(odds[side]['rout'], np.mean([r.consequences[side].get('rout', False) for r in results]), delta=0.03)
+
+    def testApply(self):
+        pairs = [(self.armies[0], self.armies[1])] + [(army.clone(), other.clone()) for army, other in [self.armies]*3]
+        results = resolveBattles([self.makeBattle(*pair) for pair in pairs])
+        before = [[army.countInfantry() + army.countCavalry() for army in pair] for pair in pairs]
+        decisions = applyBattleResults(results)
+        self.assertEqual(len(results), len(decisions))
+        for pair, warriors, result in zip(pairs, before, results):
+            for army, count in zip(pair, warriors):
+                percent = result.consequences[army.allegience].get('casualtyPercent', 0)
+                self.assertEqual(count - int(count*percent/100), army.countInfantry() + army.countCavalry())
+
+
+if __name__ == '__main__':
+    unittest.main()
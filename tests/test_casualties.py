@@ -0,0 +1,75 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+import cubrum
+import cubrum.casualties
+from cubrum.formation import Formation
+from cubrum.formationtable import getFormationRows
+
+
+class TestCasualties(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(43)
+        self.state = cubrum.getStartingState(seed=43)
+        self.armies = self.state.armies
+
+    def testMatchesPerCasualtySampling(self):
+        weights = np.array([400, 100, 1500, 0, 1000], dtype=np.float64)
+        trials = 4000
+        multinomial = np.array([cubrum.casualties.distributeCasualties(50, weights) for _ in range(trials)])
+        per_casualty = np.array([np.bincount(np.random.choice(len(weights), size=50, p=weights/weights.sum()), minlength=len(weights)) for _ in range(trials)])
+        self.assertTrue((multinomial.sum(axis=1)==50).all())
+        self.assertEqual(0, multinomial[:, 3].sum())
+        expected_mean = 50*weights/weights.sum()
+        np.testing.assert_allclose(expected_mean, multinomial.mean(axis=0), atol=0.3)
+        np.testing.assert_allclose(multinomial.var(axis=0), per_casualty.var(axis=0), rtol=0.15, atol=0.1)
+
+    def testBatchMatchesSingle(self):
+        weights = [np.array([1.0, 3.0]), np.array([2.0, 0.0, 2.0, 4.0]), np.array([]), np.array([0.0, 0.0])]
+        trials = 3000
+        splits = [cubrum.casualties.distributeCasualtiesBatch([40, 80, 5, 5], weights) for _ in range(trials)]
+        self.assertEqual([2, 4, 0, 2], [len(split) for split in splits[0]])
+        self.assertTrue(all(split[0].sum()==40 and split[1].sum()==80 and split[3].sum()==0 for split in splits))
+        second_army = np.array([split[1] for split in splits])
+        np.testing.assert_allclose([20, 0, 20, 40], second_army.mean(axis=0), atol=0.5)
+
+    def testWeightings(self):
+        rows = getFormationRows([
+            Formation("van", warriorCount=100, wagonCount=0, cavalry=True),
+            Formation("main", warriorCount=100, wagonCount=0, heavy=True),
+            Formation("rear", warriorCount=100, wagonCount=0)
+        ])
+        np.testing.assert_allclose([100, 100, 100], cubrum.casualties.getWeighting()(rows))
+        np.testing.assert_allclose([50, 25, 100], cubrum.casualties.ExposureWeighting(cavalry=0.5, heavy=0.25)(rows))
+        np.testing.assert_allclose([100, 200, 300], cubrum.casualties.RearguardWeighting(bias=3)(rows))
+        with self.assertRaises(AssertionError):
+            cubrum.casualties.getWeighting("flanking")
+
+    def testArmyCasualties(self):
+        army = self.armies[0]
+        warriors = army.countInfantry() + army.countCavalry()
+        counts = army.applyCasualties(percent=10, weighting="rearguard")
+        self.assertEqual(warriors//10, counts.sum())
+        self.assertEqual(warriors - warriors//10, army.countInfantry() + army.countCavalry())
+        army.applyCasualties(count=0)
+        self.assertEqual(warriors - warriors//10, army.countInfantry() + army.countCavalry())
+
+    def testBatch(self):
+        self.armies[1].tabulate()
+        before = [army.countInfantry() + army.countCavalry() for army in self.armies]
+        splits = cubrum.casualties.applyCasualtiesBatch(self.armies, percent=[10, 20])
+        for army, split, warriors, percent in zip(self.armies, splits, before, [10, 20]):
+            self.assertEqual(int(warriors*percent/100), split.sum())
+            self.assertEqual(warriors - split.sum(), army.countInfantry() + army.countCavalry())
+        with self.assertRaises(ValueError):
+            cubrum.casualties.applyCasualtiesBatch(self.armies)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+import cubrum.dice
+
+
+class TestDice(unittest.TestCase):
+    def setUp(self):
+        self.rng = np.random.default_rng(48)
+
+    def testParse(self):
+        self.assertEqual((((1, 3, 20),), 14), cubrum.dice.parseDice("3d20+14"))
+        self.assertEqual((((1, 1, 6), (-1, 2, 6)), -1), cubrum.dice.parseDice("d6 - 2d6 + 1 - 2"))
+        for expression in ["", "2d", "2d6 3", "d0", "2x6"]:
+            with self.assertRaises(ValueError):
+                cubrum.dice.parseDice(expression)
+
+    def testRollPools(self):
+        rolls = cubrum.dice.rollDice("2d6", size=10000, rng=self.rng)
+        self.assertEqual((10000,), rolls.shape)
+        self.assertTrue(((rolls >= 2) & (rolls <= 12)).all())
+        values, probabilities = cubrum.dice.getDistribution("2d6")
+        frequencies = np.bincount(rolls, minlength=13)[2:]/len(rolls)
+        np.testing.assert_allclose(probabilities, frequencies, atol=0.015)
+        self.assertEqual((2, 5), cubrum.dice.rollDice("3d20+14", size=(2, 5), rng=self.rng).shape)
+        self.assertIsInstance(cubrum.dice.rollDice("1d6", rng=self.rng), int)
+        self.assertEqual(3, len(cubrum.dice.rollD6(3, sum=False, rng=self.rng)))
+
+    def testDistribution(self):
+        values, probabilities = cubrum.dice.getDistribution("2d6")
+        self.assertEqual(list(range(2, 13)), values.tolist())
+        self.assertAlmostEqual(6/36, probabilities[5])
+        values, probabilities = cubrum.dice.getDistribution("2d6-2d6")
+        self.assertEqual(list(range(-10, 11)), values.tolist())
+        np.testing.assert_allclose(probabilities, probabilities[::-1])
+        values, probabilities = cubrum.dice.getDistribution("1d20+16")
+        self.assertEqual((17, 36), (values[0], values[-1]))
+        self.assertAlmostEqual(1.0, probabilities.sum())
+        with self.assertRaises(ValueError):
+            probabilities[0] = 1.0
+
+    def testProbabilityAbove(self):
+        self.assertAlmostEqual(15/36, cubrum.dice.getProbabilityAbove("2d6", 7))
+        self.assertEqual(1.0, cubrum.dice.getProbabilityAbove("2d6", 1))
+        self.assertEqual(0.0, cubrum.dice.getProbabilityAbove("2d6", 12))
+        np.testing.assert_allclose([1.0, 0.5, 0.0], cubrum.dice.getProbabilityAbove("1d6", np.array([0, 3, 6])))
+
+
+if __name__ == '__main__':
+    unittest.main()
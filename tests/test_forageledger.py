@@ -0,0 +1,64 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+import cubrum.map
+import cubrum.forageledger
+
+COPPERCOAST_NODES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cubrum", "mapdata", "coppercoast_strongholds.json")
+COPPERCOAST_ROADS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cubrum", "mapdata", "coppercoast_roads.json")
+
+
+class TestForageLedger(unittest.TestCase):
+    def setUp(self):
+        self.ledger = cubrum.forageledger.ForageLedger([1000, 500], regrowthHours=100)
+
+    def testForageAndRegrow(self):
+        self.assertEqual(400, self.ledger.forage(0, 10, amount=400))
+        self.assertEqual(600, self.ledger.getAvailable(0, 10))
+        self.assertEqual(800, self.ledger.getAvailable(0, 30))
+        self.assertEqual(1000, self.ledger.getAvailable(0, 500))
+        self.assertEqual(800, self.ledger.forage(0, 30))
+        self.assertEqual(0, self.ledger.getAvailable(0, 30))
+
+    def testForageOutOfOrder(self):
+        self.assertEqual(1000, self.ledger.forage(0, 100))
+        self.assertEqual(0, self.ledger.forage(0, 50, amount=0))
+        self.assertEqual(0, self.ledger.getAvailable(0, 100))
+        self.assertEqual(0, self.ledger.forage(0, 50))
+        self.assertEqual(100, self.ledger.getAvailable(0, 110))
+        self.assertEqual(100, self.ledger.forage(0, 110))
+        self.assertEqual(0, self.ledger.forage(0, 60, amount=500))
+        self.assertEqual(110, self.ledger.lastForaged[0])
+
+    def testSettleMatchesLazyQueries(self):
+        self.ledger.forage(0, 0)
+        self.ledger.forage(1, 20, amount=100)
+        expected = [self.ledger.getAvailable(i, 50) for i in range(2)]
+        self.assertEqual(expected, self.ledger.getAvailableAll(50).tolist())
+        self.ledger.settle(50)
+        self.assertEqual(expected, [self.ledger.getAvailable(i, 50) for i in range(2)])
+        self.assertEqual(cubrum.forageledger.NEVER_FORAGED, self.ledger.lastForaged[1])
+
+    def testMapLedger(self):
+        roads = cubrum.map.Map()
+        roads.addNodesFromFile(COPPERCOAST_NODES_PATH)
+        roads.addEdgesFromFile(COPPERCOAST_ROADS_PATH)
+        ledger = roads.getForageLedger()
+        edge_id = roads.getEdgeID("Traffra", "Gorolkan")
+        self.assertEqual(edge_id, roads.getEdgeID("Gorolkan", "Traffra"))
+        full_yield = roads.edges[("Traffra", "Gorolkan")]['distance'] * cubrum.forageledger.FORAGE_YIELD_PER_LEAGUE
+        self.assertEqual(full_yield, ledger.forage(edge_id, 0))
+        clone = roads.clone()
+        self.assertEqual(0, clone.getForageLedger().getAvailable(edge_id, 0))
+        clone.getForageLedger().settle(cubrum.forageledger.FORAGE_REGROWTH_HOURS)
+        self.assertEqual(0, ledger.getAvailable(edge_id, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
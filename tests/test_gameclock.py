@@ -0,0 +1,123 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest, datetime
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import cubrum.gameclock
+import cubrum.scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = cubrum.scheduler.Scheduler()
+
+    def testPopDueInOrder(self):
+        self.scheduler.schedule(5, "late")
+        self.scheduler.schedule(1, "early")
+        self.scheduler.schedule(3, "middle")
+        due = self.scheduler.popDue(3)
+        self.assertEqual(["early", "middle"], [event.kind for event in due])
+        self.assertEqual(5, self.scheduler.getNextTime())
+        self.assertEqual(1, len(self.scheduler))
+
+    def testCancel(self):
+        event_id = self.scheduler.schedule(1, "cancelled")
+        self.scheduler.schedule(2, "kept")
+        self.scheduler.cancel(event_id)
+        self.assertEqual(2, self.scheduler.getNextTime())
+        self.assertEqual(1, len(self.scheduler))
+
+    def testCancelAfterFire(self):
+        fired_id = self.scheduler.schedule(1, "fired")
+        self.scheduler.schedule(2, "kept")
+        self.assertEqual(["fired"], [event.kind for event in self.scheduler.popDue(1)])
+        self.scheduler.cancel(fired_id)
+        self.scheduler.cancel(fired_id)
+        self.scheduler.cancel(1000)
+        self.assertEqual(1, len(self.scheduler))
+        self.scheduler.clearTransient()
+        self.assertEqual(["kept"], [event.kind for event in self.scheduler.popDue(2)])
+        self.assertEqual(0, len(self.scheduler))
+
+    def testClearTransient(self):
+        self.scheduler.schedule(1, "prediction", transient=True)
+        self.scheduler.schedule(4, "durable")
+        self.scheduler.clearTransient()
+        self.assertEqual(4, self.scheduler.getNextTime())
+        self.assertEqual(1, len(self.scheduler))
+
+
+class TestGameClock(unittest.TestCase):
+    def setUp(self):
+        self.clock = cubrum.gameclock.GameClock(datetime.datetime(1410, 5, 20, 7))
+
+    def testHoursToDusk(self):
+        self.assertEqual(14, self.clock.getHoursToNextEvent(maxHours=24))
+
+    def testHoursCappedByMax(self):
+        self.assertEqual(6, self.clock.getHoursToNextEvent(maxHours=6))
+
+    def testDaylightEventsRepeat(self):
+        triggers = []
+        for i in range(4):
+            self.clock.incrementGameTime(self.clock.getHoursToNextEvent(maxHours=24))
+            triggers += [dp.trigger for dp in self.clock.popDueEvents()]
+        self.assertEqual(["NightFalls", "DayBreaks", "NightFalls", "DayBreaks"], triggers)
+        self.assertEqual(datetime.datetime(1410, 5, 22, 5), self.clock.gameTime)
+
+    def testTicksFromEpoch(self):
+        self.assertEqual(datetime.datetime(1410, 5, 20), self.clock.epoch)
+        self.assertEqual(7, self.clock.gameTick)
+        self.clock.incrementGameTime(20)
+        self.assertEqual(datetime.datetime(1410, 5, 21, 3), self.clock.gameTime)
+
+    def testDaylightChangeUsesLastBoundary(self):
+        self.assertEqual("DayBreaks", cubrum.gameclock.getDaylightChange(20, 30))
+        self.assertEqual("NightFalls", cubrum.gameclock.getDaylightChange(4, 22))
+        self.assertEqual("NightFalls", cubrum.gameclock.getDaylightChange(7, 21))
+        self.assertIsNone(cubrum.gameclock.getDaylightChange(7, 20))
+        self.assertIsNone(cubrum.gameclock.getDaylightChange(22, 28))
+
+    def testScheduledEventReturned(self):
+        self.clock.scheduleEvent(self.clock.gameTick + 3, "Custom", note="x")
+        self.assertEqual(3, self.clock.getHoursToNextEvent())
+        self.clock.incrementGameTime(3)
+        due = self.clock.popDueEvents()
+        self.assertEqual(1, len(due))
+        self.assertEqual("x", due[0].note)
+
+
+class TestPlayerClocks(unittest.TestCase):
+    def setUp(self):
+        self.clock = cubrum.gameclock.GameClock(datetime.datetime(1410, 5, 20, 7), players=[1, 2, 3])
+
+    def testActivePlayerIsEarliest(self):
+        self.assertEqual(1, self.clock.getActivePlayer())
+        self.clock.incrementPlayerTime(1, 2)
+        self.assertEqual(2, self.clock.getActivePlayer())
+        self.clock.incrementPlayerTime(2, 1)
+        self.clock.incrementPlayerTime(3, 3)
+        self.assertEqual(2, self.clock.getActivePlayer())
+
+    def testMasterTimeIsLatest(self):
+        self.clock.incrementPlayerTime(2, 5)
+        self.clock.incrementPlayerTime(1, 3)
+        self.assertEqual(datetime.datetime(1410, 5, 20, 12), self.clock.getPlayerTime(0))
+
+    def testIncrementReportsNightfall(self):
+        result = self.clock.incrementPlayerTime(3, 14)
+        self.assertEqual("NightFalls", result.trigger)
+        self.assertEqual(3, result.playerID)
+
+    def testManyIncrements(self):
+        for i in range(200):
+            self.clock.incrementPlayerTime(self.clock.getActivePlayer(), 1)
+        self.assertTrue(len(self.clock._playerHeap) <= 2*3 + 64 + 1)
+        times = [self.clock.getPlayerTime(p) for p in [1, 2, 3]]
+        self.assertTrue(max(times) - min(times) <= datetime.timedelta(hours=1))
+
+
+if __name__ == "__main__":
+    unittest.main()
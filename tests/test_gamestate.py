@@ -0,0 +1,214 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+import cubrum
+import cubrum.gamestate
+import cubrum.casualties
+import cubrum.position
+from cubrum.playeraction import Proceed
+from cubrum.army import checkMoraleBatch
+from cubrum.battle import Battle
+from cubrum.weather import Weather
+import cubrum.exceptions
+
+
+class TestCorrespondents(unittest.TestCase):
+    def setUp(self):
+        self.state = cubrum.gamestate.GameState()
+
+    def testGarrisonsRegistered(self):
+        for node in self.state.map.nodes:
+            if self.state.map.nodes[node].get("strongholdType"):
+                self.assertEqual("{} garrison".format(node), self.state.getPlayerName(self.state.map.nodes[node]['id']))
+        self.assertEqual("system", self.state.getPlayerName(0))
+
+    def testRecipients(self):
+        self.assertEqual(0, len(self.state.getRecipients()))
+        player_id = self.state.addPlayer("Giubrin")
+        recipients = self.state.getRecipients()
+        self.assertEqual([player_id], recipients['ID'].tolist())
+        self.assertEqual(["Giubrin"], recipients['name'].tolist())
+        self.assertEqual(len(self.state.correspondents), len(self.state.correspondents.toDataFrame()))
+
+    def testUnknownPlayer(self):
+        with self.assertRaises(cubrum.exceptions.NoSuchPlayerError):
+            self.state.getPlayerName(len(self.state.correspondents))
+
+
+class TestClone(unittest.TestCase):
+    def setUp(self):
+        self.template = cubrum.getStartingState()
+        self.state = self.template.clone()
+
+    def testCloneMatchesTemplate(self):
+        self.assertEqual(self.template.getPlayers(), self.state.getPlayers())
+        self.assertEqual(self.template.clock.gameTick, self.state.clock.gameTick)
+        self.assertEqual(dict(self.template.map.nodes(data=True)), dict(self.state.map.nodes(data=True)))
+        for template_army, army in zip(self.template.armies, self.state.armies):
+            self.assertEqual(template_army.getForces(), army.getForces())
+            self.assertIs(self.state.map, army.position.vanPosition.map)
+
+    def testCloneIsIndependent(self):
+        army = self.state.armies[0]
+        army.setDestination("Gorolkan")
+        army.march(hours=3)
+        army.formations[0].applyCasualties(count=10)
+        self.state.map.nodes["Traffra"]['currentSupply'] = 0
+        self.state.map.nodes["Traffra"]['taxed'] = ["Allakia"]
+        self.state.advance()
+        self.assertNotEqual(self.template.armies[0].position.vanPosition.mapLocation, army.position.vanPosition.mapLocation)
+        self.assertNotEqual(self.template.armies[0].formations[0].warriorCount, army.formations[0].warriorCount)
+        self.assertNotEqual(0, self.template.map.nodes["Traffra"]['currentSupply'])
+        self.assertEqual(("Allakia",), self.state.map.nodes["Traffra"]['taxed'])
+        self.assertEqual((), self.template.map.nodes["Traffra"]['taxed'])
+        self.assertNotEqual(self.template.clock.gameTick, self.state.clock.gameTick)
+
+
+    def testMapTopologyShared(self):
+        self.assertIs(self.template.map.topology, self.state.map.topology)
+        self.assertIsNot(self.template.map.overlay, self.state.map.overlay)
+        edge = ("Traffra", "Gorolkan")
+        self.state.map.edges[edge]['torched'] = True
+        self.assertTrue(self.state.map.edges[edge[::-1]]['torched'])
+        self.assertNotIn('torched', self.template.map.edges[edge])
+        with self.assertRaises(TypeError):
+            self.state.map.nodes["Traffra"]['strongholdType'] = "town"
+        self.assertEqual(self.template.map.getShortestPath("Traffra", "Bemm"), self.state.map.getShortestPath("Traffra", "Bemm"))
+
+
+class TestAdvance(unittest.TestCase):
+    def setUp(self):
+        self.state = cubrum.getStartingState(seed=26)
+        self.armies = self.state.armies
+
+    def testAdvanceToEvents(self):
+        self.armies[0].setDestination("Gorolkan")
+        start_supply = [army.supply for army in self.armies]
+        expected = [(21, ["NightFalls"]), (29, ["DayBreaks"]), (31, ["StrongholdReached"])]
+        for tick, triggers in expected:
+            decision_points = self.state.advance()
+            self.assertEqual(tick, self.state.clock.gameTick)
+            self.assertEqual(triggers, [decision_point.trigger for decision_point in decision_points])
+        self.assertEqual("Gorolkan", decision_points[0].name)
+        self.assertEqual(0, self.armies[0].position.vanPosition.distanceToDestination)
+        # 24 hours have passed since the start, in uneven steps
+        for army, supply in zip(self.armies, start_supply):
+            self.assertEqual(army.getSupplyConsumption(days=1), supply - army.supply)
+
+
+class TestProceedMessages(unittest.TestCase):
+    def setUp(self):
+        self.state = cubrum.getStartingState(seed=33)
+        self.sender, self.recipient = self.state.getPlayers()[:2]
+        self.position = cubrum.position.PointPosition("Traffra", map=self.state.map)
+
+    def testEventVisible(self):
+        event_id = self.state.messages.addEvent("test event", self.state.clock.gameTick, self.position)
+        Proceed(self.sender, 1).apply(self.state)
+        self.assertEqual([event_id], self.state.getMessages(0).index.tolist())
+
+    def testDueLetterVisibleAndReported(self):
+        Proceed(self.recipient, 5).apply(self.state)
+        letter_id = self.state.messages.addLetter("orders", self.sender, self.recipient, self.state.clock.getPlayerTick(self.sender), self.position, self.position, safeDeliveryPercent=100)
+        self.assertEqual([letter_id], self.state.getMessages(self.recipient).index.tolist())
+        decision_points = Proceed(self.recipient, 1).apply(self.state)
+        self.assertEqual([letter_id], [dp.messageID for dp in decision_points if dp.trigger=="LetterRecieved"])
+        self.assertEqual([], Proceed(self.recipient, 1).apply(self.state))
+
+
+class TestRNG(unittest.TestCase):
+    def playBattle(self, state):
+        battle = Battle(Weather(), rng=state.getRNG("battles"))
+        battle.addBelligerent(state.armies[0])
+        battle.addBelligerent(state.armies[1], defending=True)
+        result = battle.generateResult()
+        return result.victoriousSide, result.consequences, state.armies[0].applyCasualties(percent=10).tolist()
+
+    def testSameSeedReplays(self):
+        self.assertEqual(self.playBattle(cubrum.getStartingState(seed=47)), self.playBattle(cubrum.getStartingState(seed=47)))
+        first = cubrum.getStartingState(fromTemplate=False, seed=47)
+        second = cubrum.getStartingState(fromTemplate=False, seed=47)
+        self.assertEqual(dict(first.map.nodes(data=True)), dict(second.map.nodes(data=True)))
+
+    def testGamesIndependent(self):
+        state = cubrum.getStartingState(seed=47)
+        expected = self.playBattle(state.clone())
+        other = cubrum.getStartingState(seed=48)
+        self.playBattle(other)
+        np.random.seed(0)
+        cubrum.casualties.distributeCasualties(100, [1.0, 1.0])
+        self.assertEqual(expected, self.playBattle(state))
+
+    def testCloneContinuesStreams(self):
+        state = cubrum.getStartingState(seed=47)
+        self.playBattle(state)
+        clone = state.clone()
+        self.assertEqual(self.playBattle(state), self.playBattle(clone))
+        clone.reseed(49)
+        self.assertIs(clone.getRNG("armies"), clone.armies[0].rng)
+        self.assertIs(clone.getRNG("map"), clone.map.rng)
+
+    def testSpawnedStreamsDistinct(self):
+        state = cubrum.getStartingState(seed=47)
+        draws = [rng.integers(0, 2**32, size=4).tolist() for rng in state.spawnRNG(3) + [state.getRNG("battles")]]
+        self.assertEqual(4, len(set(map(tuple, draws))))
+
+    def testGlobalFallback(self):
+        draws = []
+        for _ in range(2):
+            np.random.seed(47)
+            draws.append(cubrum.casualties.distributeCasualties(100, [1.0, 2.0, 3.0]).tolist())
+        self.assertEqual(draws[0], draws[1])
+
+    def playCommandersAndWeather(self, state:cubrum.gamestate.GameState) -> tuple:
+        commander = state.armies[0].commander
+        names = [str(state.getSubordinate(commander)) for _ in range(len(commander.culture.names)-1)]
+        weather = [state.weather.changeCurrentWeather() for _ in range(10)]
+        return names, weather
+
+    def testSameSeedReplaysCommandersAndWeather(self):
+        first_names, first_weather = self.playCommandersAndWeather(cubrum.getStartingState(seed=47))
+        # names given in one game must not be withheld from the next
+        second_names, second_weather = self.playCommandersAndWeather(cubrum.getStartingState(seed=47))
+        self.assertEqual(first_names, second_names)
+        self.assertEqual(first_weather, second_weather)
+        self.assertEqual(len(first_names), len(set(name.split(" ")[-1] for name in first_names)))
+        self.assertFalse(any(cubrum.culture.ALLAKIAN.namesUsed))
+
+
+class TestMorale(unittest.TestCase):
+    def setUp(self):
+        self.state = cubrum.getStartingState(seed=49)
+        self.armies = self.state.armies
+
+    def testChangeMorale(self):
+        start = self.state.getMorale()
+        self.assertEqual([army.morale for army in self.armies], start.tolist())
+        self.assertEqual([0]*len(self.armies), self.state.changeMorale(-20).tolist())
+        self.assertEqual([12], self.state.changeMorale(20, armyIndices=[1]).tolist())
+        self.assertEqual([0, 12], [army.morale for army in self.armies[:2]])
+        self.state.changeMorale([3, -4], armyIndices=[True, True])
+        self.assertEqual([3, 8], [army.morale for army in self.armies[:2]])
+        self.armies[0].supply = 0
+        self.assertEqual([2], self.state.changeMorale(-1, where=lambda army: army.supply <= 0).tolist())
+        self.assertEqual([], self.state.getMorale(armyIndices=[]).tolist())
+
+    def testCheckMorale(self):
+        self.state.changeMorale([-12, 12], armyIndices=[0, 1])
+        for _ in range(20):
+            self.assertEqual([0], self.state.checkMorale().tolist())
+        self.assertEqual([], self.state.checkMorale(armyIndices=[1]).tolist())
+        self.armies[0].morale = 7
+        results = checkMoraleBatch([self.armies[0]]*20000)
+        self.assertTrue(((results==0) | ((results > 7) & (results <= 12))).all())
+        self.assertAlmostEqual(15/36, (results > 0).mean(), delta=0.015)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,363 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest, tempfile
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+
+import cubrum.chronicle
+import cubrum.messagehandler
+import cubrum.messagelog
+import cubrum.map
+import cubrum.position
+
+COPPERCOAST_NODES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cubrum", "mapdata", "coppercoast_strongholds.json")
+COPPERCOAST_ROADS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cubrum", "mapdata", "coppercoast_roads.json")
+
+
+def stepDeliveryTick(departureTick:int, travelHours:float) -> int:
+    """Reference implementation stepping one hour at a time"""
+    receipt_tick = departureTick
+    remaining_time = travelHours
+    while remaining_time > 0:
+        receipt_tick += 1
+        remaining_time -= 1
+        while (receipt_tick % 24 >= 21) or (receipt_tick % 24 <= 5):
+            receipt_tick += 1
+    return receipt_tick
+
+
+class TestDeliveryTime(unittest.TestCase):
+    def testSameDay(self):
+        self.assertEqual(10, cubrum.messagehandler.getDeliveryTick(7, 3))
+
+    def testOvernight(self):
+        # leave at 19:00, two hours to 20:00 then 06:00 next day
+        self.assertEqual(24+6, cubrum.messagehandler.getDeliveryTick(19, 2))
+
+    def testDepartAtNight(self):
+        self.assertEqual(24+6, cubrum.messagehandler.getDeliveryTick(22, 1))
+
+    def testNoTravel(self):
+        self.assertEqual(23, cubrum.messagehandler.getDeliveryTick(23, 0))
+
+    def testMatchesHourlyStepping(self):
+        rng = np.random.default_rng(12)
+        departures = rng.integers(0, 24*30, 500)
+        travel_hours = np.round(rng.uniform(0, 60, 500), 2)
+        expected = [stepDeliveryTick(int(d), float(t)) for d, t in zip(departures, travel_hours)]
+        scalar = [cubrum.messagehandler.getDeliveryTick(int(d), float(t)) for d, t in zip(departures, travel_hours)]
+        vectorized = cubrum.messagehandler.getDeliveryTicks(departures, travel_hours)
+        self.assertEqual(expected, scalar)
+        self.assertEqual(expected, vectorized.tolist())
+
+
+class TestBroadcastLetter(unittest.TestCase):
+    def setUp(self):
+        self.roads = cubrum.map.Map()
+        self.roads.addNodesFromFile(COPPERCOAST_NODES_PATH)
+        self.roads.addEdgesFromFile(COPPERCOAST_ROADS_PATH)
+        self.sender_position = cubrum.position.PointPosition(("Orbost", "Ulgis"), orientation="Ulgis", distanceToDestination=1.5, map=self.roads)
+        self.recipient_positions = [
+            cubrum.position.PointPosition("Bemm", map=self.roads),
+            cubrum.position.PointPosition("Ulgis", map=self.roads),
+            cubrum.position.PointPosition(("Oughan Keep", "Smara"), orientation="Oughan Keep", distanceToDestination=1, map=self.roads),
+            cubrum.position.PointPosition(("Orbost", "Ulgis"), orientation="Orbost", distanceToDestination=1, map=self.roads),
+        ]
+
+    def testDistanceFieldMatchesGetDistance(self):
+        distance_field = self.sender_position.getDistanceField()
+        for recipient_position in self.recipient_positions:
+            self.assertEqual(self.sender_position.getDistance(recipient_position), self.sender_position.getDistanceWithField(recipient_position, distance_field))
+
+    def testBroadcastMatchesAddLetter(self):
+        broadcast_handler = cubrum.messagehandler.MessageHandler()
+        single_handler = cubrum.messagehandler.MessageHandler()
+        recipient_ids = [1, 2, 3, 4]
+        broadcast_ids = broadcast_handler.broadcastLetter("march", 5, recipient_ids, 7, self.sender_position, self.recipient_positions, safeDeliveryPercent=100)
+        single_ids = [single_handler.addLetter("march", 5, r, 7, self.sender_position, p, safeDeliveryPercent=100) for r, p in zip(recipient_ids, self.recipient_positions)]
+        self.assertEqual(single_ids, broadcast_ids)
+        self.assertEqual(single_handler.akashicRecords['receiptDate'].tolist(), broadcast_handler.akashicRecords['receiptDate'].tolist())
+
+    def testBroadcastLostLetters(self):
+        handler = cubrum.messagehandler.MessageHandler()
+        message_ids = handler.broadcastLetter("march", 5, [1, 2, 3, 4], 7, self.sender_position, self.recipient_positions, safeDeliveryPercent=0)
+        self.assertEqual([4, 5, 6, 7], message_ids)
+        self.assertEqual(["LETTER"]*4 + ["EVENT"]*4, handler.akashicRecords['messageType'].tolist())
+        self.assertEqual([cubrum.messagehandler.NO_TICK]*4, handler.akashicRecords['receiptDate'].tolist()[:4])
+        self.assertEqual([0, 1, 2, 3], handler.akashicRecords['link'].tolist()[4:])
+
+
+class TestMessageLog(unittest.TestCase):
+    def setUp(self):
+        self.log = cubrum.messagelog.MessageLog(chunkSize=4)
+
+    def appendEvent(self, i:int) -> int:
+        return self.log.append(messageType="EVENT", creationDate=i, creationLocation="in Bemm", receiptDate=i, text="event {}".format(i), senderID=0, recipientID=0)
+
+    def testAppendAcrossChunks(self):
+        for i in range(10):
+            self.assertEqual(i, self.appendEvent(i))
+        records = self.log.toDataFrame()
+        self.assertEqual(list(range(10)), records['creationDate'].tolist())
+        self.assertEqual("event 9", records.loc[9, 'text'])
+        self.assertEqual(["in Bemm"], self.log.locations)
+
+    def testExtendAcrossChunks(self):
+        self.appendEvent(0)
+        first_id = self.log.extend(
+            messageType=["LETTER"]*6,
+            creationDate=list(range(6)),
+            creationLocation=["in Ulgis", "in Bemm"]*3,
+            receiptDate=list(range(10, 16)),
+            text=["letter"]*6,
+            senderID=[1]*6,
+            recipientID=[2]*6,
+            link=[None, 3, None, None, None, None]
+        )
+        self.assertEqual(1, first_id)
+        self.assertEqual(7, len(self.log))
+        self.assertEqual(list(range(10, 16)), self.log.getColumn("receiptDate", 1).tolist())
+        self.assertEqual(3, self.log.getValue(2, "link"))
+        self.assertIsNone(self.log.getValue(3, "link"))
+        self.assertEqual("in Ulgis", self.log.take([5]).loc[5, 'creationLocation'])
+
+    def testSetValueInvalidatesView(self):
+        self.appendEvent(0)
+        self.assertEqual(0, self.log.toDataFrame().loc[0, 'receiptDate'])
+        self.log.setValue(0, "receiptDate", 5)
+        self.assertEqual(5, self.log.toDataFrame().loc[0, 'receiptDate'])
+
+
+class TestInbox(unittest.TestCase):
+    def setUp(self):
+        self.roads = cubrum.map.Map()
+        self.roads.addNodesFromFile(COPPERCOAST_NODES_PATH)
+        self.roads.addEdgesFromFile(COPPERCOAST_ROADS_PATH)
+        self.handler = cubrum.messagehandler.MessageHandler()
+        self.position_orbost = cubrum.position.PointPosition("Orbost", map=self.roads)
+        self.position_ulgis = cubrum.position.PointPosition("Ulgis", map=self.roads)
+
+    def testReceivedInOrderOfReceipt(self):
+        far = self.handler.addLetter("far", 1, 2, 7, cubrum.position.PointPosition("Bemm", map=self.roads), self.position_ulgis, safeDeliveryPercent=100)
+        near = self.handler.addLetter("near", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        self.assertEqual([], self.handler.getMessages(2, 7).index.tolist())
+        self.assertEqual([near], self.handler.getMessages(2, 11).index.tolist())
+        self.assertEqual([near, far], self.handler.getMessages(2, 24*10).index.tolist())
+
+    def testUnreadCursor(self):
+        first = self.handler.addLetter("first", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        self.assertEqual([first], self.handler.getMessages(2, 12, unreadOnly=True).index.tolist())
+        self.assertEqual([], self.handler.getMessages(2, 12, unreadOnly=True).index.tolist())
+        second = self.handler.addLetter("second", 1, 2, 8, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        # sent from behind the cursor, but still reported once
+        late = self.handler.addLetter("late", 1, 2, 6, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        self.assertEqual([late, second], self.handler.getMessages(2, 14, unreadOnly=True).index.tolist())
+        self.assertEqual([], self.handler.getMessages(2, 14, unreadOnly=True).index.tolist())
+
+    def testReleaseDue(self):
+        letter_id = self.handler.addLetter("orders", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        self.assertEqual({2:11}, self.handler.getNextDeliveries())
+        self.assertEqual([], self.handler.releaseDue(10))
+        decision_points = self.handler.releaseDue(11)
+        self.assertEqual(["LetterRecieved"], [dp.trigger for dp in decision_points])
+        self.assertEqual(letter_id, decision_points[0].messageID)
+        self.assertEqual(2, decision_points[0].playerID)
+        self.assertEqual({}, self.handler.getNextDeliveries())
+        self.assertEqual([letter_id], self.handler.getMessages(2, 11).index.tolist())
+
+    def testGetMessagesKeepsDecisionPoints(self):
+        letter_id = self.handler.addLetter("orders", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        self.assertEqual([letter_id], self.handler.getMessages(2, 11).index.tolist())
+        self.assertEqual({}, self.handler.getNextDeliveries())
+        self.assertEqual([], self.handler.releaseDue(10))
+        self.assertEqual([letter_id], [dp.messageID for dp in self.handler.releaseDue(11)])
+        self.assertEqual([], self.handler.releaseDue(11))
+        self.assertEqual([letter_id], self.handler.getMessages(2, 11, unreadOnly=True).index.tolist())
+
+    def testReleaseDueForOneRecipient(self):
+        self.handler.addLetter("a", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        self.handler.addLetter("b", 2, 3, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        self.assertEqual(1, len(self.handler.releaseDue(11, recipientID=3)))
+        self.assertEqual({2:11}, self.handler.getNextDeliveries())
+
+    def testLostLetterNotReceived(self):
+        event_id = self.handler.addLetter("lost", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=0)
+        self.assertEqual([], self.handler.getMessages(2, 24*10).index.tolist())
+        self.assertEqual([event_id], self.handler.getMessages(0, 24*10).index.tolist())
+
+
+class TestSQLiteMessageLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "records.sqlite")
+        self.roads = cubrum.map.Map()
+        self.roads.addNodesFromFile(COPPERCOAST_NODES_PATH)
+        self.roads.addEdgesFromFile(COPPERCOAST_ROADS_PATH)
+        self.position_orbost = cubrum.position.PointPosition("Orbost", map=self.roads)
+        self.position_ulgis = cubrum.position.PointPosition("Ulgis", map=self.roads)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testMatchesInMemoryLog(self):
+        memory_handler = cubrum.messagehandler.MessageHandler()
+        sqlite_handler = cubrum.messagehandler.MessageHandler(storage=cubrum.messagelog.SQLiteMessageLog(self.path, batchSize=2))
+        for handler in [memory_handler, sqlite_handler]:
+            handler.addLetter("delivered", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+            handler.addLetter("lost", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=0)
+            handler.broadcastLetter("march", 1, [2, 3], 8, self.position_orbost, [self.position_ulgis, self.position_orbost], safeDeliveryPercent=100)
+        expected = memory_handler.akashicRecords
+        actual = sqlite_handler.akashicRecords
+        self.assertEqual(expected.index.tolist(), actual.index.tolist())
+        for column in expected.columns:
+            self.assertEqual(expected[column].tolist(), actual[column].tolist(), column)
+            self.assertEqual(expected[column].dtype.name, actual[column].dtype.name, column)
+        self.assertEqual(memory_handler.getMessages(2, 24).index.tolist(), sqlite_handler.getMessages(2, 24).index.tolist())
+
+    def testReopen(self):
+        handler = cubrum.messagehandler.MessageHandler(storage=cubrum.messagelog.SQLiteMessageLog(self.path))
+        read_id = handler.addLetter("read", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        queued_id = handler.addLetter("queued", 1, 2, 20, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        handler.records.close()
+        reopened = cubrum.messagehandler.MessageHandler(storage=cubrum.messagelog.SQLiteMessageLog(self.path))
+        self.assertEqual(2, len(reopened))
+        reopened.restore(12)
+        self.assertEqual([read_id], reopened.getMessages(2, 12).index.tolist())
+        self.assertEqual({2:reopened.records.getValue(queued_id, "receiptDate")}, reopened.getNextDeliveries())
+        self.assertEqual([queued_id], reopened.getMessages(2, 24*2, unreadOnly=True).index.tolist())
+        self.assertEqual(2, reopened.addEvent("resumed", 12, self.position_orbost))
+        reopened.records.close()
+
+    def testColumnCodesMatchInMemoryLog(self):
+        memory_handler = cubrum.messagehandler.MessageHandler()
+        sqlite_handler = cubrum.messagehandler.MessageHandler(storage=cubrum.messagelog.SQLiteMessageLog(self.path, batchSize=2))
+        for handler in [memory_handler, sqlite_handler]:
+            handler.addLetter("letter", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+            handler.addEvent("event", 8, self.position_ulgis)
+            handler.addEvent("reply", 9, self.position_orbost, link=0)
+        for column in ["messageType", "creationLocation", "link"]:
+            expected = memory_handler.records.getColumn(column)
+            actual = sqlite_handler.records.getColumn(column)
+            self.assertEqual(expected.tolist(), actual.tolist(), column)
+            self.assertEqual(expected.dtype, actual.dtype, column)
+
+    def testExtendFillsOptionalColumns(self):
+        memory_log = cubrum.messagelog.MessageLog()
+        sqlite_log = cubrum.messagelog.SQLiteMessageLog(self.path)
+        for log in [memory_log, sqlite_log]:
+            log.extend(messageType=["EVENT"]*2, creationDate=[1, 2], receiptDate=[1, 2], senderID=[0, 0], recipientID=[0, 0])
+        self.assertEqual(memory_log.getRecord(1), sqlite_log.getRecord(1))
+        sqlite_log.close()
+
+    def testFrameCachedUntilWrite(self):
+        handler = cubrum.messagehandler.MessageHandler(storage=cubrum.messagelog.SQLiteMessageLog(self.path))
+        message_id = handler.addEvent("event", 8, self.position_ulgis)
+        frame = handler.akashicRecords
+        self.assertIs(frame, handler.akashicRecords)
+        handler.records.setValue(message_id, "text", "edited")
+        self.assertIsNot(frame, handler.akashicRecords)
+        self.assertEqual(["edited"], handler.akashicRecords['text'].tolist())
+        handler.addEvent("later", 9, self.position_ulgis)
+        self.assertEqual(2, len(handler.akashicRecords))
+
+    def testClone(self):
+        handler = cubrum.messagehandler.MessageHandler(storage=cubrum.messagelog.SQLiteMessageLog(self.path))
+        handler.addLetter("letter", 1, 2, 7, self.position_orbost, self.position_ulgis, safeDeliveryPercent=100)
+        copy = handler.clone()
+        copy.addEvent("only in copy", 9, self.position_ulgis)
+        self.assertEqual(1, len(handler))
+        self.assertEqual(2, len(copy))
+        self.assertEqual(handler.akashicRecords['text'].tolist(), copy.akashicRecords['text'].tolist()[:1])
+        copy_path = os.path.join(self.directory.name, "copy.sqlite")
+        on_disk = handler.records.clone(copy_path)
+        on_disk.close()
+        self.assertEqual(1, len(cubrum.messagelog.SQLiteMessageLog(copy_path)))
+        with self.assertRaises(ValueError):
+            handler.records.clone(copy_path)
+        handler.records.close()
+
+
+class TestChronicleExport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.handler = cubrum.messagehandler.MessageHandler()
+        self.roads = cubrum.map.Map()
+        self.roads.addNodesFromFile(COPPERCOAST_NODES_PATH)
+        self.position_bemm = cubrum.position.PointPosition("Bemm", map=self.roads)
+        for i in range(5):
+            self.handler.addEvent("event {}".format(i), i, self.position_bemm, link=(i-1 if i else None))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def testCSVTail(self):
+        path = os.path.join(self.directory.name, "chronicle.csv")
+        next_id = self.handler.exportChronicle(path, format="csv", chunkSize=2)
+        self.assertEqual(5, next_id)
+        self.handler.addEvent("event 5", 5, self.position_bemm)
+        self.assertEqual(6, self.handler.exportChronicle(path, format="csv", since=next_id))
+        exported = cubrum.chronicle.pd.read_csv(path, index_col="messageID")
+        self.assertEqual(list(range(6)), exported.index.tolist())
+        self.assertEqual(self.handler.akashicRecords['text'].tolist(), exported['text'].tolist())
+
+    def testNPZChunks(self):
+        path = os.path.join(self.directory.name, "chronicle")
+        with cubrum.chronicle.ChronicleExporter(path, format="npz", chunkSize=2) as exporter:
+            self.assertEqual(5, exporter.export(self.handler))
+            self.assertEqual(0, exporter.export(self.handler))
+        self.assertEqual(3, len(os.listdir(path)))
+        exported = cubrum.chronicle.readNPZChronicle(path)
+        self.assertEqual(list(range(5)), exported.index.tolist())
+        self.assertEqual(["EVENT"]*5, exported['messageType'].tolist())
+        self.assertEqual([-1, 0, 1, 2, 3], exported['link'].tolist())
+
+    def testParquetTail(self):
+        pytest.importorskip("pyarrow")
+        path = os.path.join(self.directory.name, "chronicle")
+        next_id = self.handler.exportChronicle(path, format="parquet", chunkSize=2)
+        self.assertEqual(5, next_id)
+        self.handler.addEvent("event 5", 5, self.position_bemm)
+        self.assertEqual(6, self.handler.exportChronicle(path, format="parquet", since=next_id))
+        exported = cubrum.chronicle.readParquetChronicle(path)
+        self.assertEqual(list(range(6)), exported.index.tolist())
+        self.assertEqual(self.handler.akashicRecords['text'].tolist(), exported['text'].tolist())
+
+
+class TestRecordIndexer(unittest.TestCase):
+    def setUp(self):
+        self.handler = cubrum.messagehandler.MessageHandler()
+        self.roads = cubrum.map.Map()
+        self.roads.addNodesFromFile(COPPERCOAST_NODES_PATH)
+        self.position_bemm = cubrum.position.PointPosition("Bemm", map=self.roads)
+        for i in range(3):
+            self.handler.addEvent("event {}".format(i), i, self.position_bemm)
+
+    def testWritesReachStorage(self):
+        self.handler.loc[1, "receiptDate"] = 50
+        self.handler.loc[2, "text"] = "changed"
+        self.handler.iloc[[0, 2], 3] = [60, 70]
+        self.assertEqual([60, 50, 70], self.handler.records.getColumn("receiptDate").tolist())
+        self.assertEqual("changed", self.handler.records.getValue(2, "text"))
+        self.assertEqual(50, self.handler.loc[1, "receiptDate"])
+        self.assertEqual("event 0", self.handler.iloc[0]["text"])
+        with self.assertRaises(TypeError):
+            self.handler.loc[1] = 5
+
+    def testDeliveryChangesReindex(self):
+        self.assertEqual([0, 1, 2], self.handler.getMessages(0, 10).index.tolist())
+        self.handler.loc[1, "receiptDate"] = 50
+        self.assertEqual([0, 2], self.handler.getMessages(0, 10).index.tolist())
+        self.assertEqual([0, 2, 1], self.handler.getMessages(0, 50).index.tolist())
+        self.handler.iloc[2, 6] = 5
+        self.assertEqual([0, 1], self.handler.getMessages(0, 50).index.tolist())
+        self.assertEqual([2], self.handler.getMessages(5, 50).index.tolist())
+        self.handler.loc[0, "receiptDate"] = cubrum.messagehandler.NO_TICK
+        self.assertEqual([1], self.handler.getMessages(0, 50).index.tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import logging, os
+logging.basicConfig(level=os.environ.get("LOGLEVEL","INFO"))
+log = logging.getLogger(__name__)
+
+import sys, unittest
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import cubrum.map
+import cubrum.strongholdtable
+
+COPPERCOAST_NODES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cubrum", "mapdata", "coppercoast_strongholds.json")
+COPPERCOAST_ROADS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "cubrum", "mapdata", "coppercoast_roads.json")
+
+
+class TestStrongholdTable(unittest.TestCase):
+    def setUp(self):
+        self.roads = cubrum.map.Map()
+        self.roads.addNodesFromFile(COPPERCOAST_NODES_PATH)
+        self.roads.addEdgesFromFile(COPPERCOAST_ROADS_PATH)
+        self.expected = {node:dict(attributes) for node, attributes in self.roads.nodes(data=True)}
+        self.table = self.roads.getStrongholds()
+
+    def testMatchesNodeAttributes(self):
+        for node, attributes in self.expected.items():
+            self.assertEqual(attributes, dict(self.roads.nodes[node]))
+        allakia_supply = sum(a['currentSupply'] for a in self.expected.values() if a.get('heldBy')=="Allakia")
+        self.assertEqual(allakia_supply, self.table.getTotal("currentSupply", faction="Allakia"))
+
+    def testRegenerateSupply(self):
+        self.roads.nodes["Traffra"]['currentSupply'] = 0
+        self.table.regenerateSupply(days=2, percent=10)
+        self.assertEqual(self.expected["Traffra"]['maxSupply']//5, self.roads.nodes["Traffra"]['currentSupply'])
+        self.assertEqual(self.expected["Bemm"]['maxSupply'], self.roads.nodes["Bemm"]['currentSupply'])
+
+    def testTaxAndLevy(self):
+        allakia_loot = self.table.getTotal("currentLoot", faction="Allakia")
+        collected = self.table.tax("Allakia", 10)
+        self.assertEqual(allakia_loot - collected, self.table.getTotal("currentLoot", faction="Allakia"))
+        self.assertEqual(("Allakia",), self.roads.nodes["Traffra"]['taxed'])
+        self.assertEqual((), self.roads.nodes["Bemm"]['taxed'])
+        raised = self.table.levy("Allakia", 100)
+        self.assertGreaterEqual(raised['infantryCount'], self.expected["Traffra"]['garrison']['infantryCount'])
+        self.assertEqual(0, self.roads.nodes["Traffra"]['garrison']['infantryCount'])
+        self.assertEqual(self.expected["Bemm"]['garrison'], self.roads.nodes["Bemm"]['garrison'])
+
+    def testCloneHasOwnTable(self):
+        clone = self.roads.clone()
+        self.assertEqual(self.expected["Traffra"]['currentLoot'], clone.getStrongholds().pillage("Traffra"))
+        self.assertEqual(0, clone.nodes["Traffra"]['currentLoot'])
+        self.assertEqual(self.expected["Traffra"]['currentLoot'], self.roads.nodes["Traffra"]['currentLoot'])
+
+    def testValuesImmutable(self):
+        unsplit = cubrum.map.Map()
+        unsplit.addNodesFromFile(COPPERCOAST_NODES_PATH)
+        for roads in [unsplit, self.roads, self.roads.clone()]:
+            with self.assertRaises(AttributeError):
+                roads.nodes["Traffra"]['taxed'].append("Allakia")
+            with self.assertRaises(TypeError):
+                roads.nodes["Traffra"]['garrison']['infantryCount'] = 1
+
+    def testGarrisonKeepsExtraKeys(self):
+        garrison = {'name':"Traffra watch", 'infantryCount':10, 'cavalryCount':0, 'captain':"Golin"}
+        self.roads.nodes["Traffra"]['garrison'] = garrison
+        self.assertEqual("Golin", self.roads.clone().nodes["Traffra"]['garrison']['captain'])
+        self.assertEqual(garrison, dict(self.roads.nodes["Traffra"]['garrison'], cavalryCount=0))
+
+
+if __name__ == "__main__":
+    unittest.main()